@@ -0,0 +1,101 @@
+from threading import Condition, Thread
+from typing import Callable, Optional, Protocol, Sequence
+
+from task import Task
+from taskdiff import ChangeSet
+
+
+class _Serializer(Protocol):
+    def save(self, tasks: Sequence[Task]) -> None: ...
+    # Optional, required by save_changes()
+    # def save_changes(self, changes: ChangeSet) -> None: ...
+
+
+class BackgroundSaver:
+    """Saves tasks on a worker thread, skipping snapshots superseded in time
+
+    Change sets handed to save_changes() while the worker is busy are
+    combined into a single one. Errors raised by the serializer are re-raised
+    by the next call to save(), save_changes(), flush() or close().
+    on_saved is called on the worker thread after each successful save.
+    """
+
+    def __init__(
+            self,
+            serializer: _Serializer,
+            on_saved: Optional[Callable[[], None]] = None) -> None:
+        self._serializer = serializer
+        self._on_saved = on_saved
+        self._condition = Condition()
+        self._pending: Optional[list[Task]] = None
+        self._pending_changes: Optional[ChangeSet] = None
+        self._is_saving = False
+        self._is_closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, tasks: Sequence[Task]) -> None:
+        # Tasks are immutable, copying the sequence is enough for a snapshot
+        snapshot = list(tasks)
+        with self._condition:
+            self._raise_error()
+            self._pending = snapshot
+            self._condition.notify_all()
+
+    def save_changes(self, changes: ChangeSet) -> None:
+        with self._condition:
+            self._raise_error()
+            pending_changes = self._pending_changes
+            self._pending_changes = changes if pending_changes is None \
+                else pending_changes.then(changes)
+            self._condition.notify_all()
+
+    def flush(self) -> None:
+        with self._condition:
+            self._condition.wait_for(
+                lambda: not self._has_pending() and not self._is_saving)
+            self._raise_error()
+
+    def close(self) -> None:
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        error = self._error
+        if error is not None:
+            self._error = None
+            raise error
+
+    def _has_pending(self) -> bool:
+        return self._pending is not None or self._pending_changes is not None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._has_pending() or self._is_closed)
+                if not self._has_pending():
+                    return
+                tasks = self._pending
+                changes = self._pending_changes
+                self._pending = None
+                self._pending_changes = None
+                self._is_saving = True
+            try:
+                if tasks is not None:
+                    self._serializer.save(tasks)
+                if changes is not None:
+                    self._serializer.save_changes(changes)
+                if self._on_saved is not None:
+                    self._on_saved()
+            except Exception as error:
+                with self._condition:
+                    self._error = error
+            finally:
+                with self._condition:
+                    self._is_saving = False
+                    self._condition.notify_all()
@@ -0,0 +1,363 @@
+"""Times the core of the application on synthetic tasks
+
+Run with ``python -m benchmark`` from this directory, see --help for
+options. Results are written as JSON to compare them between releases.
+``--memory`` compares the memory taken by Task and CompactTask instead.
+"""
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser, Namespace
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Sequence, Union
+
+from compacttask import to_compact_task
+from jsonserializer import JsonSerializer
+from mainpresenter import MainPresenter
+from pickleserializer import PickleSerializer
+from task import Task, Importance, sort_tasks_by_relevance
+from taskmanager import TaskManager
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Edits, undos and redos timed together in one run
+_OPERATIONS = 100
+_WORDS = (
+    "call", "email", "review", "write", "plan", "buy", "fix", "clean",
+    "report", "budget", "meeting", "dentist", "garden", "taxes", "slides",
+    "car", "invoice", "backup", "book", "tickets")
+
+
+class Result(NamedTuple):
+    name: str
+    size: int
+    operations: int
+    best: float
+    mean: float
+
+
+class MemoryResult(NamedTuple):
+    size: int
+    task_bytes: int
+    compact_task_bytes: int
+
+
+def generate_tasks(
+        count: int,
+        today: Optional[date] = None,
+        seed: int = 0) -> list[Task]:
+    """Tasks of a file used for years, most of them completed
+
+    Completed tasks spread over the last three years. About half of all
+    tasks have a due date around today and a fifth of the open ones are
+    snoozed.
+    """
+    if today is None:
+        today = date.today()
+    generator = random.Random(seed)
+    tasks = []
+    for id_ in range(1, count + 1):
+        name = " ".join(generator.choices(_WORDS, k=generator.randint(1, 4)))
+        importance = Importance.Important if generator.random() < 0.4 \
+            else Importance.Unimportant
+        completed = due = snooze = None
+        if generator.random() < 0.7:
+            completed = today - timedelta(days=generator.randint(0, 3 * 365))
+        if generator.random() < 0.5:
+            due = today + timedelta(days=round(generator.gauss(7, 30)))
+        if completed is None and generator.random() < 0.2:
+            snooze = today + timedelta(days=generator.randint(1, 60))
+        tasks.append(Task(name, importance, completed, due, snooze, id_))
+    return tasks
+
+
+class _FakeView:
+    def hide_lists(self) -> None:
+        pass
+
+    def set_redoable(self, redoable: bool) -> None:
+        pass
+
+    def set_undoable(self, undoable: bool) -> None:
+        pass
+
+    def setWindowTitle(self, title: str) -> None:
+        pass
+
+    def update_tasks(self, tasks: Sequence[Task]) -> None:
+        pass
+
+
+# Prepares a benchmark for the tasks and returns what is timed
+_SetUp = Callable[[list[Task], random.Random, Path], Callable[[], object]]
+_Mutation = Callable[[TaskManager, Task], object]
+
+_MUTATIONS: dict[str, _Mutation] = {
+    "add": lambda manager, task: manager.add(Task(task.name)),
+    "delete": TaskManager.delete,
+    "replace": lambda manager, task: manager.replace(task, Task("replaced")),
+    "set_complete": TaskManager.set_complete,
+    "schedule_task": lambda manager, task: manager.schedule_task(
+        task, date.today()),
+    "snooze": lambda manager, task: manager.snooze(task, date.today()),
+    "rename": lambda manager, task: manager.rename(task, "renamed"),
+    "remove_due": TaskManager.remove_due,
+    "remove_snooze": TaskManager.remove_snooze,
+    "set_importance": lambda manager, task: manager.set_importance(
+        task, Importance.Important),
+}
+
+
+def _sample(tasks: list[Task], generator: random.Random) -> list[Task]:
+    return generator.sample(tasks, _OPERATIONS)
+
+
+def _serializer_save(serializer_type: type) -> _SetUp:
+    def set_up(
+            tasks: list[Task],
+            _: random.Random,
+            directory: Path) -> Callable[[], object]:
+        serializer = serializer_type(directory / "tasks")
+        return lambda: serializer.save(tasks)
+    return set_up
+
+
+def _serializer_load(serializer_type: type) -> _SetUp:
+    def set_up(
+            tasks: list[Task],
+            _: random.Random,
+            directory: Path) -> Callable[[], object]:
+        serializer = serializer_type(directory / "tasks")
+        serializer.save(tasks)
+        return serializer.load
+    return set_up
+
+
+def _sort_by_relevance(
+        tasks: list[Task],
+        _: random.Random,
+        _2: Path) -> Callable[[], object]:
+    return lambda: sort_tasks_by_relevance(tasks)
+
+
+def _mutation(mutate: _Mutation) -> _SetUp:
+    def set_up(
+            tasks: list[Task],
+            generator: random.Random,
+            _: Path) -> Callable[[], object]:
+        manager = TaskManager(tasks)
+        targets = _sample(tasks, generator)
+        return lambda: [mutate(manager, task) for task in targets]
+    return set_up
+
+
+def _edited_task_manager(
+        tasks: list[Task],
+        generator: random.Random) -> TaskManager:
+    manager = TaskManager(tasks)
+    for task in _sample(tasks, generator):
+        manager.rename(task, "renamed")
+    return manager
+
+
+def _undo_chain(
+        tasks: list[Task],
+        generator: random.Random,
+        _: Path) -> Callable[[], object]:
+    manager = _edited_task_manager(tasks, generator)
+    return lambda: [manager.undo() for _2 in range(_OPERATIONS)]
+
+
+def _redo_chain(
+        tasks: list[Task],
+        generator: random.Random,
+        _: Path) -> Callable[[], object]:
+    manager = _edited_task_manager(tasks, generator)
+    while manager.is_undoable():
+        manager.undo()
+    return lambda: [manager.redo() for _2 in range(_OPERATIONS)]
+
+
+def _loaded_presenter(tasks: list[Task]) -> MainPresenter:
+    class InMemorySerializer:
+        def __init__(self, _: Path) -> None:
+            pass
+
+        def load(self) -> list[Task]:
+            return tasks
+
+        def save(self, _: Sequence[Task]) -> None:
+            pass
+
+    presenter = MainPresenter(_FakeView(), InMemorySerializer)
+    presenter.load_from_file(Path())
+    return presenter
+
+
+def _presenter_load(
+        tasks: list[Task],
+        _: random.Random,
+        _2: Path) -> Callable[[], object]:
+    presenter = _loaded_presenter(tasks)
+    return lambda: presenter.load_from_file(Path())
+
+
+def _presenter_edits(
+        tasks: list[Task],
+        generator: random.Random,
+        _: Path) -> Callable[[], object]:
+    presenter = _loaded_presenter(tasks)
+    targets = _sample(tasks, generator)
+    return lambda: [presenter.rename_task(task, "renamed") for task in targets]
+
+
+def _presenter_undo_redo(
+        tasks: list[Task],
+        generator: random.Random,
+        _: Path) -> Callable[[], object]:
+    presenter = _loaded_presenter(tasks)
+    for task in _sample(tasks, generator):
+        presenter.rename_task(task, "renamed")
+
+    def undo_and_redo() -> None:
+        for _2 in range(_OPERATIONS):
+            presenter.undo()
+        for _2 in range(_OPERATIONS):
+            presenter.redo()
+
+    return undo_and_redo
+
+
+# Name, set-up and number of operations timed by a run
+BENCHMARKS: list[tuple[str, _SetUp, int]] = [
+    ("json.save", _serializer_save(JsonSerializer), 1),
+    ("json.load", _serializer_load(JsonSerializer), 1),
+    ("pickle.save", _serializer_save(PickleSerializer), 1),
+    ("pickle.load", _serializer_load(PickleSerializer), 1),
+    ("sort_tasks_by_relevance", _sort_by_relevance, 1),
+    *((f"taskmanager.{name}", _mutation(mutate), _OPERATIONS)
+      for name, mutate in _MUTATIONS.items()),
+    ("taskmanager.undo", _undo_chain, _OPERATIONS),
+    ("taskmanager.redo", _redo_chain, _OPERATIONS),
+    ("mainpresenter.load_from_file", _presenter_load, 1),
+    ("mainpresenter.rename_task", _presenter_edits, _OPERATIONS),
+    ("mainpresenter.undo_redo", _presenter_undo_redo, 2 * _OPERATIONS),
+]
+
+
+def run_benchmarks(
+        sizes: Sequence[int] = SIZES,
+        repeat: int = 3,
+        names: Optional[Sequence[str]] = None) -> list[Result]:
+    """Best and mean time of each benchmark in seconds per run
+
+    Set-ups are not timed. Runs of edits start from unedited tasks.
+    """
+    if min(sizes) < _OPERATIONS:
+        raise ValueError(f"Sizes must be at least {_OPERATIONS}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            tasks = generate_tasks(size)
+            for name, set_up, operations in BENCHMARKS:
+                if names is not None and name not in names:
+                    continue
+                generator = random.Random(0)
+                times = []
+                for _ in range(repeat):
+                    run = set_up(tasks, generator, Path(directory))
+                    start = time.perf_counter()
+                    run()
+                    times.append(time.perf_counter() - start)
+                results.append(Result(
+                    name,
+                    size,
+                    operations,
+                    min(times),
+                    sum(times) / len(times)))
+    return results
+
+
+def measure_memory(sizes: Sequence[int] = SIZES) -> list[MemoryResult]:
+    """Bytes allocated for generated tasks as Task and as CompactTask
+
+    Both include the list holding the tasks and the names and dates of the
+    tasks not shared with other tasks.
+    """
+    results = []
+    for size in sizes:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            tasks = generate_tasks(size)
+            task_bytes = tracemalloc.get_traced_memory()[0]
+            compact_tasks = [to_compact_task(task) for task in tasks]
+            del tasks
+            gc.collect()
+            compact_task_bytes = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del compact_tasks
+        results.append(MemoryResult(size, task_bytes, compact_task_bytes))
+    return results
+
+
+def results_to_json(
+        results: Sequence[Union[Result, MemoryResult]]) -> str:
+    return json.dumps({
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [result._asdict() for result in results],
+    }, indent=2)
+
+
+def _parse_args(argv: Optional[Sequence[str]]) -> Namespace:
+    parser = ArgumentParser(prog="python -m benchmark", description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=SIZES,
+        help="numbers of tasks to generate")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument(
+        "--only", nargs="+", choices=[name for name, _, _ in BENCHMARKS],
+        help="benchmarks to run, all by default")
+    parser.add_argument(
+        "--memory", action="store_true",
+        help="measure the memory taken by tasks instead of timing")
+    parser.add_argument(
+        "--output", type=Path, help="JSON file, standard output by default")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = _parse_args(argv)
+    results: Sequence[Union[Result, MemoryResult]]
+    if args.memory:
+        results = measure_memory(args.sizes)
+        for memory in results:
+            print(
+                f"{memory.size:>9} tasks {memory.task_bytes / 2**20:>9.1f} "
+                f"MiB as Task {memory.compact_task_bytes / 2**20:>9.1f} "
+                f"MiB as CompactTask",
+                file=sys.stderr)
+    else:
+        results = run_benchmarks(args.sizes, args.repeat, args.only)
+        for result in results:
+            print(
+                f"{result.name:30} {result.size:>9} "
+                f"{result.best * 1000:>12.3f} ms",
+                file=sys.stderr)
+    if args.output is None:
+        print(results_to_json(results))
+    else:
+        args.output.write_text(results_to_json(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union, overload
+
+from jsonserializer import JsonSerializer
+from task import Task, TaskType, Importance
+from tracing import traced
+
+# Layout, all integers little-endian:
+#   header (_HEADER)
+#   ids            int64[count], 0 for tasks without id
+#   names          uint32[count], indices into the string table
+#   completed      int32[count], date ordinals, 0 for no date
+#   due            int32[count]
+#   snooze         int32[count]
+#   importance     bit per task, set if important, padded to 4 bytes
+#   string offsets uint32[string_count + 1] into the UTF-8 string blob
+#   string blob
+_MAGIC = b"EISB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIII4x")
+_NO_DATE = 0
+_COLUMN_TYPES = ("q", "I", "i", "i", "i")
+_IMPORTANCE_BITS = {"1": Importance.Important, "0": Importance.Unimportant}
+
+
+def _padded(size: int) -> int:
+    return (size + 3) & ~3
+
+
+def _to_little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(
+        buffer: memoryview,
+        typecode: str) -> Union[memoryview, array]:
+    if sys.byteorder == "big":
+        column = array(typecode, buffer)
+        column.byteswap()
+        return column
+    return buffer.cast(typecode)
+
+
+def _to_ordinal(date_: Optional[date]) -> int:
+    return _NO_DATE if date_ is None else date_.toordinal()
+
+
+def _from_ordinal(ordinal: int) -> Optional[date]:
+    return None if ordinal == _NO_DATE else date.fromordinal(ordinal)
+
+
+def _dates(ordinals: Union[memoryview, array]) -> Iterator[Optional[date]]:
+    ordinals = ordinals.tolist()
+    dates = {ordinal: _from_ordinal(ordinal) for ordinal in set(ordinals)}
+    return map(dates.__getitem__, ordinals)
+
+
+def _encode(tasks: Sequence[Task]) -> bytes:
+    string_indices: dict[str, int] = {}
+    names = array("I", (
+        string_indices.setdefault(task.name, len(string_indices))
+        for task in tasks))
+    ids = array("q", (task.id or 0 for task in tasks))
+    completed = array("i", (_to_ordinal(task.completed) for task in tasks))
+    due = array("i", (_to_ordinal(task.due) for task in tasks))
+    snooze = array("i", (_to_ordinal(task.snooze) for task in tasks))
+    importance = bytearray(_padded((len(tasks) + 7) // 8))
+    for i, task in enumerate(tasks):
+        if task.importance == Importance.Important:
+            importance[i >> 3] |= 1 << (i & 7)
+    encoded_strings = [string.encode() for string in string_indices]
+    string_offsets = array("I", [0])
+    for encoded_string in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(encoded_string))
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        0,
+        len(tasks),
+        len(encoded_strings),
+        string_offsets[-1])
+    return b"".join((
+        header,
+        *(_to_little_endian(column)
+          for column in (ids, names, completed, due, snooze)),
+        bytes(importance),
+        _to_little_endian(string_offsets),
+        *encoded_strings))
+
+
+class BinaryTasks(Sequence[Task]):
+    """Tasks of a memory-mapped binary task file, decoded on access"""
+
+    def __init__(self, path: Path, task_type: TaskType = Task) -> None:
+        self._task_type = task_type
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        self._buffer = buffer
+        if len(buffer) < _HEADER.size:
+            self.close()
+            raise ValueError("Not a binary task file")
+        magic, version, _, count, string_count, _2 = \
+            _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError("Not a binary task file")
+        if version > _VERSION:
+            self.close()
+            raise ValueError(f"Unsupported binary task file version {version}")
+        self._count = count
+        offset = _HEADER.size
+        columns = []
+        for typecode in _COLUMN_TYPES:
+            size = count * array(typecode).itemsize
+            columns.append(_from_little_endian(
+                buffer[offset:offset + size], typecode))
+            offset += size
+        self._ids, self._names, self._completed, self._due, self._snooze = \
+            columns
+        importance_size = _padded((count + 7) // 8)
+        self._importance = buffer[offset:offset + importance_size]
+        offset += importance_size
+        offsets_size = (string_count + 1) * array("I").itemsize
+        self._string_offsets = _from_little_endian(
+            buffer[offset:offset + offsets_size], "I")
+        self._strings_start = offset + offsets_size
+        self._strings: list[Optional[str]] = [None] * string_count
+
+    def close(self) -> None:
+        for view in vars(self).values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._map.close()
+
+    def __enter__(self) -> "BinaryTasks":
+        return self
+
+    def __exit__(self, _, _2, _3) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, index: int) -> Task: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Task]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        index = range(self._count)[index]
+        id_ = self._ids[index]
+        return self._task_type(
+            self._name(self._names[index]),
+            Importance.Important
+            if self._importance[index >> 3] >> (index & 7) & 1
+            else Importance.Unimportant,
+            _from_ordinal(self._completed[index]),
+            _from_ordinal(self._due[index]),
+            _from_ordinal(self._snooze[index]),
+            id_ if id_ != 0 else None)
+
+    def __iter__(self) -> Iterator[Task]:
+        # Decodes whole columns at once, which is much faster than indexing
+        count = self._count
+        bits = bin(int.from_bytes(self._importance, "little") | 1 << count)
+        importances = map(_IMPORTANCE_BITS.__getitem__, bits[:2:-1])
+        return map(
+            self._task_type,
+            map(self._name, self._names.tolist()),
+            importances,
+            _dates(self._completed),
+            _dates(self._due),
+            _dates(self._snooze),
+            [id_ or None for id_ in self._ids.tolist()])
+
+    def _name(self, string_index: int) -> str:
+        name = self._strings[string_index]
+        if name is None:
+            start = self._strings_start + self._string_offsets[string_index]
+            end = self._strings_start \
+                + self._string_offsets[string_index + 1]
+            name = str(self._buffer[start:end], "utf-8")
+            self._strings[string_index] = name
+        return name
+
+
+class BinarySerializer:
+    def __init__(self, path: Path, task_type: TaskType = Task) -> None:
+        self._path = path
+        # Type tasks are loaded as, e.g. CompactTask to save memory
+        self._task_type = task_type
+
+    @traced
+    def save(self, tasks: Sequence[Task]) -> None:
+        with open(self._path, "wb") as file:
+            file.write(_encode(tasks))
+
+    @traced
+    def load(self) -> list[Task]:
+        return list(self.iter_load())
+
+    def iter_load(self) -> Iterator[Task]:
+        """Yields tasks as they are decoded from the mapped file"""
+        try:
+            with BinaryTasks(self._path, self._task_type) as tasks:
+                yield from tasks
+        except FileNotFoundError:
+            return
+
+
+def json_to_binary(json_path: Path, binary_path: Path) -> None:
+    BinarySerializer(binary_path).save(JsonSerializer(json_path).load())
+
+
+def binary_to_json(binary_path: Path, json_path: Path) -> None:
+    JsonSerializer(json_path).save(BinarySerializer(binary_path).load())
@@ -0,0 +1,116 @@
+import sys
+from dataclasses import FrozenInstanceError
+from datetime import date
+from typing import Any, Optional
+
+from task import Task, Importance
+
+# Dates are packed as ordinals, 0 if not set, next to the id plus one, 0 if
+# not set, into a single int
+_DATE_BITS = 22
+_DATE_MASK = (1 << _DATE_BITS) - 1
+_DUE_SHIFT = _DATE_BITS
+_SNOOZE_SHIFT = 2 * _DATE_BITS
+_ID_SHIFT = 3 * _DATE_BITS
+_DATES_MASK = (1 << _ID_SHIFT) - 1
+
+
+def _to_ordinal(date_: Optional[date]) -> int:
+    return 0 if date_ is None else date_.toordinal()
+
+
+def _from_ordinal(ordinal: int) -> Optional[date]:
+    return None if ordinal == 0 else date.fromordinal(ordinal)
+
+
+class CompactTask:
+    """Task taking a fraction of the memory of a Task
+
+    Names are interned and dates and id are packed into a single int, dates
+    are created on access. Compares and hashes equal to a Task of the same
+    value and can be used in its place, including by dataclasses.replace().
+    """
+
+    # Weakly referenced by the TaskInterner of TaskManager
+    __slots__ = ("name", "importance", "_packed", "__weakref__")
+    # Makes dataclasses.replace(), fields() and asdict() treat it like Task
+    __dataclass_fields__ = Task.__dataclass_fields__
+
+    name: str
+    importance: Importance
+    _packed: int
+
+    def __init__(
+            self,
+            name: str = "Task",
+            importance: Importance = Importance.Unimportant,
+            completed: Optional[date] = None,
+            due: Optional[date] = None,
+            snooze: Optional[date] = None,
+            id: Optional[int] = None) -> None:
+        packed = _to_ordinal(completed) \
+            | _to_ordinal(due) << _DUE_SHIFT \
+            | _to_ordinal(snooze) << _SNOOZE_SHIFT
+        if id is not None:
+            packed |= (id + 1) << _ID_SHIFT
+        object.__setattr__(self, "name", sys.intern(name))
+        object.__setattr__(self, "importance", importance)
+        object.__setattr__(self, "_packed", packed)
+
+    @property
+    def completed(self) -> Optional[date]:
+        return _from_ordinal(self._packed & _DATE_MASK)
+
+    @property
+    def due(self) -> Optional[date]:
+        return _from_ordinal(self._packed >> _DUE_SHIFT & _DATE_MASK)
+
+    @property
+    def snooze(self) -> Optional[date]:
+        return _from_ordinal(self._packed >> _SNOOZE_SHIFT & _DATE_MASK)
+
+    @property
+    def id(self) -> Optional[int]:
+        id_ = self._packed >> _ID_SHIFT
+        return None if id_ == 0 else id_ - 1
+
+    def _value(self) -> tuple:
+        return (self.name, self.importance, self.completed, self.due,
+                self.snooze)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompactTask):
+            return self.name == other.name \
+                and self.importance == other.importance \
+                and self._packed & _DATES_MASK \
+                == other._packed & _DATES_MASK
+        if isinstance(other, Task):
+            return self._value() == (
+                other.name, other.importance, other.completed, other.due,
+                other.snooze)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # Same as the hash of an equal Task
+        return hash(self._value())
+
+    def __repr__(self) -> str:
+        return (f"CompactTask(name={self.name!r}, "
+                f"importance={self.importance!r}, "
+                f"completed={self.completed!r}, due={self.due!r}, "
+                f"snooze={self.snooze!r}, id={self.id!r})")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+    def __delattr__(self, name: str) -> None:
+        raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+    def __reduce__(self) -> tuple:
+        return CompactTask, self._value() + (self.id,)
+
+
+def to_compact_task(task: Task) -> CompactTask:
+    return CompactTask(
+        task.name, task.importance, task.completed, task.due, task.snooze,
+        task.id)
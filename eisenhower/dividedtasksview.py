@@ -1,9 +1,8 @@
-from typing import Sequence, cast
+from typing import AbstractSet, Optional, cast
 from datetime import date
 from PySide6 import QtWidgets, QtCore, QtGui
-from tasksview import (
-    TasksView, TASK_ROLE, build_tree_view_model, Column)
-from task import Task, sort_tasks_by_relevance
+from tasksview import TasksView, Column
+from task import Task, QuadrantTasks
 
 
 class CalendarDelegate(QtWidgets.QStyledItemDelegate):
@@ -48,15 +47,16 @@ class ItemWordWrap(QtWidgets.QStyledItemDelegate):
 
 class DividedTasksView(QtWidgets.QWidget):
     add_task_requested = QtCore.Signal()
-    complete_task_requested = QtCore.Signal(Task)
-    delete_task_requested = QtCore.Signal(Task)
+    complete_tasks_requested = QtCore.Signal(list)
+    delete_tasks_requested = QtCore.Signal(list)
     rename_task_requested = QtCore.Signal(Task, str)
     schedule_task_requested = QtCore.Signal(Task, date)
     snooze_task_requested = QtCore.Signal(Task, date)
-    remove_due_requested = QtCore.Signal(Task)
-    remove_snooze_requested = QtCore.Signal(Task)
-    set_important_requested = QtCore.Signal(Task)
-    set_unimportant_requested = QtCore.Signal(Task)
+    snooze_tasks_requested = QtCore.Signal(list, date)
+    remove_due_requested = QtCore.Signal(list)
+    remove_snooze_requested = QtCore.Signal(list)
+    set_important_requested = QtCore.Signal(list)
+    set_unimportant_requested = QtCore.Signal(list)
 
     def __init__(
             self,
@@ -85,9 +85,12 @@ class DividedTasksView(QtWidgets.QWidget):
             layout.addWidget(task_list)
             task_list.setWordWrap(True)
             task_list.add_task_requested.connect(self.add_task_requested)
-            task_list.complete_task_requested.connect(
-                self.complete_task_requested)
-            task_list.delete_task_requested.connect(self.delete_task_requested)
+            task_list.complete_tasks_requested.connect(
+                self.complete_tasks_requested)
+            task_list.delete_tasks_requested.connect(
+                self.delete_tasks_requested)
+            task_list.snooze_tasks_requested.connect(
+                self.snooze_tasks_requested)
             task_list.set_important_requested.connect(
                 self.set_important_requested)
             task_list.set_unimportant_requested.connect(
@@ -95,57 +98,47 @@ class DividedTasksView(QtWidgets.QWidget):
             task_list.remove_snooze_requested.connect(self.remove_snooze_requested)
             task_list.remove_due_requested.connect(
                 self.remove_due_requested)
+            task_list.task_edited.connect(self._task_edited)
+            _set_up_columns(task_list)
         self._upper_list.sortByColumn(1, QtCore.Qt.SortOrder.AscendingOrder)
         self._lower_list.sortByColumn(2, QtCore.Qt.SortOrder.AscendingOrder)
 
-    def add_tasks(self, tasks: Sequence[Task]) -> None:
-        due_tasks, normal_tasks, snoozed_tasks, _ = \
-            sort_tasks_by_relevance(tasks)
-        _build_model_and_connect(
-            self._upper_list, due_tasks + normal_tasks, self)
-        _build_model_and_connect(self._lower_list, snoozed_tasks, self)
+    def set_tasks(self, tasks: QuadrantTasks, today: date) -> None:
+        self._upper_list.set_tasks(tasks.due + tasks.normal, today)
+        self._lower_list.set_tasks(tasks.snoozed, today)
+
+    def update_tasks(
+            self,
+            tasks: QuadrantTasks,
+            changed_ids: AbstractSet[Optional[int]],
+            today: date) -> None:
+        self._upper_list.update_tasks(
+            tasks.due + tasks.normal, changed_ids, today)
+        self._lower_list.update_tasks(tasks.snoozed, changed_ids, today)
+
+    def filter_tasks(self, ids: Optional[AbstractSet[Optional[int]]]) -> None:
+        self._upper_list.filter_tasks(ids)
+        self._lower_list.filter_tasks(ids)
 
     def show_snoozed_tasks(self, should_show: bool = True) -> None:
         self._lower_list.setVisible(should_show)
 
-    def item_changed(
-            self,
-            task_list: TasksView,
-            item: QtGui.QStandardItem) -> None:
-        task = item.data(TASK_ROLE)
-        column = task_list.columns()[item.column()]
-        self._task_item_changed(item, task, column)
-
-    def _task_item_changed(
-            self,
-            item: QtGui.QStandardItem,
-            task: Task,
-            column: Column) -> None:
+    def _task_edited(self, task: Task, column: Column, value: object) -> None:
         if column == Column.Name:
-            new_name = item.data(QtCore.Qt.DisplayRole)
-            self.rename_task_requested.emit(task, new_name)
+            self.rename_task_requested.emit(task, value)
         elif column == Column.Due:
-            due = item.data(QtCore.Qt.DisplayRole)
-            self.schedule_task_requested.emit(task, _qdate_to_date(due))
+            self.schedule_task_requested.emit(task, _qdate_to_date(value))
         elif column == Column.Snoozed:
-            snoozed = item.data(QtCore.Qt.DisplayRole)
-            self.snooze_task_requested.emit(task, _qdate_to_date(snoozed))
+            self.snooze_task_requested.emit(task, _qdate_to_date(value))
 
 
-def _build_model_and_connect(
-        task_list: TasksView,
-        tasks: Sequence[Task],
-        view: DividedTasksView) -> None:
-    model = build_tree_view_model(task_list.columns(), tasks)
-    task_list.setModel(model)
-    task_list.expandAll()
+def _set_up_columns(task_list: TasksView) -> None:
     header = task_list.header()
     header.setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
     for i in range(1, 3):
         header.setSectionResizeMode(i, QtWidgets.QHeaderView.ResizeMode.Fixed)
         header.resizeSection(i, 80)
     header.setStretchLastSection(False)
-    model.itemChanged.connect(lambda item: view.item_changed(task_list, item))
     task_list.setItemDelegateForColumn(0, ItemWordWrap(task_list))
     for i in (1, 2):
         task_list.setItemDelegateForColumn(i, CalendarDelegate(task_list))
@@ -1,6 +1,8 @@
+from collections import deque
+from operator import index as as_index
+from sys import getsizeof
 from task import Task
-from typing import List
-from copy import copy
+from typing import Callable, Deque, List, NamedTuple, Optional, Sequence
 
 
 Tasks = List[Task]
@@ -10,36 +12,244 @@ class HistoryError(RuntimeError):
     pass
 
 
+class Change(NamedTuple):
+    """Single element edit of the present, old/new is None on insert/delete"""
+    index: int
+    old: Optional[Task]
+    new: Optional[Task]
+
+
+def _approximate_size(task: Optional[Task]) -> int:
+    if task is None:
+        return 0
+    size = getsizeof(task) + getsizeof(task.name)
+    attributes = getattr(task, "__dict__", None)
+    if attributes is not None:
+        size += getsizeof(attributes)
+    return size
+
+
+class _Step(list):
+    """Changes of one history step together with their approximate size"""
+    __slots__ = ("size",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.size = getsizeof(self)
+
+    def append(self, change: Change) -> None:
+        super().append(change)
+        self.size += getsizeof(change) + _approximate_size(change.old) \
+            + _approximate_size(change.new)
+
+
+class _Present(list):
+    """Task list recording each element edit into the currently open step"""
+    __slots__ = ("_step",)
+
+    def __init__(self, tasks: Tasks) -> None:
+        super().__init__(tasks)
+        self._step: Optional[_Step] = None
+
+    def _record(self, change: Change) -> None:
+        if self._step is not None:
+            self._step.append(change)
+
+    def _position(self, index: int) -> int:
+        return range(len(self))[as_index(index)]
+
+    def __setitem__(self, index: int, task: Task) -> None:
+        index = self._position(index)
+        self._record(Change(index, self[index], task))
+        super().__setitem__(index, task)
+
+    def __delitem__(self, index: int) -> None:
+        index = self._position(index)
+        self._record(Change(index, self[index], None))
+        super().__delitem__(index)
+
+    def append(self, task: Task) -> None:
+        self._record(Change(len(self), None, task))
+        super().append(task)
+
+    def extend(self, tasks: Tasks) -> None:
+        for task in tasks:
+            self.append(task)
+
+    def __iadd__(self, tasks: Tasks) -> "_Present":
+        self.extend(tasks)
+        return self
+
+    def insert(self, index: int, task: Task) -> None:
+        index = as_index(index)
+        if index < 0:
+            index += len(self)
+        index = min(max(index, 0), len(self))
+        self._record(Change(index, None, task))
+        super().insert(index, task)
+
+    def pop(self, index: int = -1) -> Task:
+        task = self[index]
+        del self[index]
+        return task
+
+    def remove(self, task: Task) -> None:
+        del self[self.index(task)]
+
+    def clear(self) -> None:
+        while self:
+            del self[-1]
+
+    def _unrecordable(self, *_, **_2) -> None:
+        raise HistoryError("Edit cannot be recorded")
+
+    sort = reverse = __imul__ = _unrecordable
+
+    def apply(self, change: Change) -> None:
+        if change.old is None:
+            super().insert(change.index, change.new)
+        elif change.new is None:
+            super().__delitem__(change.index)
+        else:
+            super().__setitem__(change.index, change.new)
+
+    def revert(self, change: Change) -> None:
+        self.apply(Change(change.index, change.new, change.old))
+
+
 class History:
-    def __init__(self, present: Tasks) -> None:
-        self._tasks: List[Tasks] = [present]
-        self._current = 0
+    """Undo history storing the present plus the changes of every step
+
+    Steps share all unchanged tasks with the present, so each recorded edit
+    costs memory proportional to the edit and not to the number of tasks.
+    The list returned by present() is live and changes when moving in time.
+
+    When max_steps or max_bytes is exceeded, the oldest steps are squashed
+    into the earliest reachable state and can no longer be undone.
+    """
+
+    def __init__(
+            self,
+            present: Tasks,
+            max_steps: Optional[int] = None,
+            max_bytes: Optional[int] = None) -> None:
+        if max_steps is not None and max_steps < 1:
+            raise ValueError("History needs to hold at least one step")
+        self._present = _Present(present)
+        self._past: Deque[_Step] = deque()
+        self._future: List[_Step] = []
+        self._max_steps = max_steps
+        self._max_bytes = max_bytes
+        self._closed_steps_size = 0
 
     def present(self) -> Tasks:
-        return self._tasks[self._current]
+        return self._present
 
     def has_past(self) -> bool:
-        return self._current > 0
+        return len(self._past) > 0
 
     def go_back_in_time(self) -> Tasks:
         if not self.has_past():
             raise HistoryError("No recorded past")
-        self._current -= 1
+        self._close_step()
+        step = self._past.pop()
+        for change in reversed(step):
+            self._present.revert(change)
+        self._future.append(step)
         return self.present()
 
     def has_future(self) -> bool:
-        return self._current < len(self._tasks) - 1
+        return len(self._future) > 0
 
     def go_forward_in_time(self) -> Tasks:
         if not self.has_future():
             raise HistoryError("No recorded future")
-        self._current += 1
+        self._close_step()
+        step = self._future.pop()
+        for change in step:
+            self._present.apply(change)
+        self._past.append(step)
         return self.present()
 
     def advance_history(self) -> Tasks:
-        # No deep copy necessary, all elements are immutable
-        new_present = copy(self.present())
-        self._current += 1
-        del self._tasks[self._current:]
-        self._tasks.append(new_present)
-        return new_present
+        self._close_step()
+        for step in self._future:
+            self._closed_steps_size -= step.size
+        self._future.clear()
+        self._evict()
+        step = _Step()
+        self._past.append(step)
+        self._present._step = step
+        return self._present
+
+    def record_undo(self, undo: Callable[[Tasks], None]) -> Sequence[Change]:
+        """Records the edits undo makes to the present as an undone step
+
+        For undoing steps not recorded here, e.g. ones kept in a file. Unlike
+        advance_history() it keeps the future, the step is redone by
+        go_forward_in_time() as if undone by go_back_in_time(). Returns the
+        changes undo made.
+        """
+        step = self._record(undo)
+        redo_step = _Step()
+        for change in reversed(step):
+            redo_step.append(Change(change.index, change.new, change.old))
+        self._future.append(redo_step)
+        self._closed_steps_size += redo_step.size
+        return step
+
+    def record_redo(self, redo: Callable[[Tasks], None]) -> Sequence[Change]:
+        """Records the edits redo makes to the present as a redone step
+
+        Like record_undo(), the step is undone by go_back_in_time() and the
+        future is kept. Returns the changes redo made.
+        """
+        self._close_step()
+        self._evict()
+        step = self._record(redo)
+        self._past.append(step)
+        self._closed_steps_size += step.size
+        return step
+
+    def undoable_changes(self) -> Sequence[Change]:
+        """Changes reverted by the next go_back_in_time()"""
+        return self._past[-1] if self.has_past() else ()
+
+    def redoable_changes(self) -> Sequence[Change]:
+        """Changes applied by the next go_forward_in_time()"""
+        return self._future[-1] if self.has_future() else ()
+
+    def depth(self) -> int:
+        """Number of recorded steps, both undoable and redoable"""
+        return len(self._past) + len(self._future)
+
+    def memory_footprint(self) -> int:
+        """Approximate number of bytes held by the recorded steps"""
+        open_step = self._present._step
+        open_step_size = 0 if open_step is None else open_step.size
+        return self._closed_steps_size + open_step_size
+
+    def _close_step(self) -> None:
+        step = self._present._step
+        if step is not None:
+            self._closed_steps_size += step.size
+            self._present._step = None
+
+    def _record(self, edit: Callable[[Tasks], None]) -> _Step:
+        self._close_step()
+        step = self._present._step = _Step()
+        try:
+            edit(self._present)
+        finally:
+            self._present._step = None
+        return step
+
+    def _evict(self) -> None:
+        # Leave room for the step about to be opened
+        while self._max_steps is not None \
+                and len(self._past) >= self._max_steps:
+            self._closed_steps_size -= self._past.popleft().size
+        while self._max_bytes is not None \
+                and self._past \
+                and self._closed_steps_size > self._max_bytes:
+            self._closed_steps_size -= self._past.popleft().size
@@ -0,0 +1,196 @@
+import json
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+from task import to_primitive_dicts, tasks_from_primitive_dicts
+from taskdiff import ChangeSet
+from tracing import traced
+
+# Undo steps kept across restarts by default
+DEFAULT_HISTORY_STEPS = 1000
+
+
+def history_path(path: Path) -> Path:
+    """File the undo history of the task file at path is kept in"""
+    return path.with_name(path.name + ".history")
+
+
+def _temporary_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _reversed_lines(
+        file: BinaryIO,
+        chunk_size: int = 1 << 16) -> Iterator[bytes]:
+    """Lines of a file from the last to the first, read in chunks"""
+    end = file.seek(0, os.SEEK_END)
+    rest = b""
+    while end > 0:
+        start = max(0, end - chunk_size)
+        file.seek(start)
+        lines = (file.read(end - start) + rest).split(b"\n")
+        rest = lines.pop(0)
+        end = start
+        yield from reversed(lines)
+    yield rest
+
+
+def _has_undoable_steps(path: Path) -> bool:
+    # Replays the records backwards, only looking at how they start, until
+    # a step is known to be left: every undo needs one more step or redo
+    # before it
+    undone = 0
+    try:
+        with open(path, "rb") as file:
+            lines = _reversed_lines(file)
+            # An interrupted write of the last record lacks the line break
+            next(lines, None)
+            for line in lines:
+                if line.startswith((b'{"step":', b'{"move":"redo"}')):
+                    if undone == 0:
+                        return True
+                    undone -= 1
+                elif line.startswith(b'{"move":"undo"}'):
+                    undone += 1
+                elif line.startswith(b'{"forget":"past"}'):
+                    return False
+    except OSError:
+        pass
+    return False
+
+
+def _to_record(changes: ChangeSet) -> dict:
+    return {
+        "added": to_primitive_dicts(changes.added),
+        "removed": to_primitive_dicts(changes.removed),
+        "replaced": [to_primitive_dicts(pair) for pair in changes.replaced]}
+
+
+def _from_record(record: dict) -> ChangeSet:
+    replaced = []
+    for pair in record["replaced"]:
+        old, new = tasks_from_primitive_dicts(pair)
+        replaced.append((old, new))
+    return ChangeSet(
+        tasks_from_primitive_dicts(record["added"]),
+        tasks_from_primitive_dicts(record["removed"]),
+        replaced)
+
+
+class HistoryFile:
+    """Keeps the undo history of a task file across restarts
+
+    Every step, undo and redo appends one line to a file next to the task
+    file, steps are stored as the change set of their edits. The file is
+    only read by load(), which replays it into the steps that can be undone
+    and redone, keeping the max_steps most recent ones of each, and rewrites
+    it without the rest.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            max_steps: int = DEFAULT_HISTORY_STEPS) -> None:
+        if max_steps < 1:
+            raise ValueError("History needs to hold at least one step")
+        self._path = history_path(path)
+        self._max_steps = max_steps
+        self._has_undoable_steps = _has_undoable_steps(self._path)
+        # Whether records were appended since the file was last compacted
+        self._is_appended = False
+
+    def has_undoable_steps(self) -> bool:
+        """Whether earlier sessions left steps to undo, without loading them
+
+        Only the end of the file is read, up to the last step not undone.
+        Steps recorded since opening it are not counted. The steps may turn
+        out to be invalid once loaded.
+        """
+        return self._has_undoable_steps
+
+    def record_step(self, changes: ChangeSet) -> None:
+        """Records a new step, clearing the steps that could be redone"""
+        self._append({"step": _to_record(changes)})
+
+    def record_undo(self) -> None:
+        self._append({"move": "undo"})
+
+    def record_redo(self) -> None:
+        self._append({"move": "redo"})
+
+    def forget_past(self) -> None:
+        """Drops all steps that could be undone, e.g. as they are invalid"""
+        self._append({"forget": "past"})
+
+    def forget_future(self) -> None:
+        """Drops all steps that could be redone"""
+        self._append({"forget": "future"})
+
+    @traced
+    def load(self) -> tuple[list[ChangeSet], list[ChangeSet]]:
+        """Steps that can be undone and redone, the next one last"""
+        past: list[ChangeSet] = []
+        future: list[ChangeSet] = []
+        records = 0
+        try:
+            with open(self._path, "r") as file:
+                for line in file:
+                    try:
+                        self._replay(json.loads(line), past, future)
+                    except (KeyError, TypeError, ValueError, IndexError):
+                        # Interrupted write of the last record
+                        break
+                    records += 1
+        except FileNotFoundError:
+            pass
+        del past[:-self._max_steps]
+        del future[:-self._max_steps]
+        if records > len(past) + 2 * len(future):
+            self._rewrite(past, future)
+        self._is_appended = False
+        return past, future
+
+    def close(self) -> None:
+        """Compacts the file if records were appended to it"""
+        if self._is_appended:
+            self.load()
+
+    def _replay(
+            self,
+            record: dict,
+            past: list[ChangeSet],
+            future: list[ChangeSet]) -> None:
+        if "step" in record:
+            past.append(_from_record(record["step"]))
+            future.clear()
+        elif "move" in record:
+            if record["move"] == "undo":
+                future.append(past.pop())
+            else:
+                past.append(future.pop())
+        elif record["forget"] == "past":
+            past.clear()
+        else:
+            future.clear()
+
+    def _append(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with open(self._path, "ab") as file:
+            file.write(line.encode())
+        self._is_appended = True
+
+    def _rewrite(
+            self,
+            past: list[ChangeSet],
+            future: list[ChangeSet]) -> None:
+        # The steps to redo are recorded as steps and undone again
+        records = [{"step": _to_record(changes)} for changes in past]
+        records.extend(
+            {"step": _to_record(changes)} for changes in reversed(future))
+        records.extend({"move": "undo"} for _ in future)
+        temporary_path = _temporary_path(self._path)
+        with open(temporary_path, "w") as file:
+            for record in records:
+                file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(temporary_path, self._path)
@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Optional, Sequence
+
+from jsonserializer import JsonSerializer
+from task import (
+    Task, to_primitive_dicts, tasks_from_primitive_dicts, with_unique_ids)
+from taskdiff import ChangeSet, SavedTasks
+from tracing import traced
+
+
+_COMPACTION_THRESHOLD = 1000
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".journal")
+
+
+def _temporary_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def _save_checkpoint(path: Path, tasks: Sequence[Task]) -> None:
+    temporary_path = _temporary_path(path)
+    JsonSerializer(temporary_path).save(tasks)
+    os.replace(temporary_path, path)
+
+
+class JournalSerializer:
+    """Saves tasks as a checkpoint plus a journal of appended changes
+
+    The checkpoint is a regular JsonSerializer file. Every save appends one
+    line holding the tasks put and the ids deleted since the previous save.
+    Once the journal holds compaction_threshold records, a new checkpoint is
+    written on a background thread and the journal is cut down to the records
+    appended in the meantime.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            compaction_threshold: int = _COMPACTION_THRESHOLD) -> None:
+        self._path = path
+        self._journal_path = _journal_path(path)
+        self._compaction_threshold = compaction_threshold
+        self._saved = SavedTasks()
+        self._needs_checkpoint = False
+        self._journal_records = 0
+        self._lock = Lock()
+        self._compaction: Optional[Thread] = None
+
+    @traced
+    def load(self) -> list[Task]:
+        self.wait_for_compaction()
+        loaded_tasks = JsonSerializer(self._path).load()
+        # Files written by JsonSerializer may lack ids and have no journal
+        self._needs_checkpoint = not SavedTasks(loaded_tasks).is_complete()
+        if self._needs_checkpoint:
+            loaded_tasks = with_unique_ids(loaded_tasks)
+        else:
+            tasks = {task.id: task for task in loaded_tasks}
+            self._journal_records = self._replay_journal(tasks)
+            loaded_tasks = list(tasks.values())
+        self._saved = SavedTasks(loaded_tasks)
+        return loaded_tasks
+
+    @traced
+    def save(self, tasks: Sequence[Task]) -> None:
+        diff = self._saved.update(tasks)
+        if self._needs_checkpoint or diff is None:
+            self._write_checkpoint(tasks)
+        else:
+            self._append_record(diff.put, diff.deleted)
+
+    @traced
+    def save_changes(self, changes: ChangeSet) -> None:
+        self._saved.apply(changes)
+        if self._needs_checkpoint:
+            self._write_checkpoint(self._saved.tasks())
+        else:
+            self._append_record(changes.put(), changes.removed_ids())
+
+    def _append_record(
+            self,
+            put: Sequence[Task],
+            deleted: Sequence[int]) -> None:
+        if not put and not deleted:
+            return
+        record = {"put": to_primitive_dicts(put), "delete": deleted}
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self._journal_path, "ab") as file:
+                file.write(line.encode())
+                journal_size = file.tell()
+            self._journal_records += 1
+            if self._journal_records >= self._compaction_threshold \
+                    and self._compaction is None:
+                self._compaction = Thread(
+                    target=self._compact,
+                    args=(
+                        self._saved.tasks(),
+                        journal_size,
+                        self._journal_records))
+                self._compaction.start()
+
+    def wait_for_compaction(self) -> None:
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def _replay_journal(self, tasks: dict[int, Task]) -> int:
+        records = 0
+        try:
+            with open(self._journal_path, "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Interrupted write of the last record
+                        break
+                    for task in tasks_from_primitive_dicts(record["put"]):
+                        tasks[task.id] = task
+                    for id_ in record["delete"]:
+                        tasks.pop(id_, None)
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _write_checkpoint(self, tasks: Sequence[Task]) -> None:
+        self.wait_for_compaction()
+        _save_checkpoint(self._path, tasks)
+        with self._lock:
+            self._journal_path.unlink(missing_ok=True)
+            self._journal_records = 0
+        self._needs_checkpoint = False
+
+    def _compact(
+            self,
+            tasks: Sequence[Task],
+            journal_size: int,
+            journal_records: int) -> None:
+        # Journal records replay idempotently, so the journal stays valid
+        # for the new checkpoint until it is cut down below. A failed
+        # compaction leaves the journal whole and is retried by the next save.
+        try:
+            _save_checkpoint(self._path, tasks)
+            with self._lock:
+                temporary_path = _temporary_path(self._journal_path)
+                with open(self._journal_path, "rb") as file, \
+                        open(temporary_path, "wb") as tail:
+                    file.seek(journal_size)
+                    tail.write(file.read())
+                os.replace(temporary_path, self._journal_path)
+                self._journal_records -= journal_records
+        finally:
+            with self._lock:
+                self._compaction = None
@@ -1,22 +1,105 @@
 import json
 from pathlib import Path
-from typing import Sequence
+from typing import IO, Iterator, Sequence
 
-from task import Task, to_primitive_dicts, tasks_from_primitive_dicts
+from task import (
+    Task, TaskType, to_primitive_dicts, iter_tasks_from_primitive_dicts)
+from tracing import traced
+
+
+_CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+
+
+class _ArrayReader:
+    """Decodes the elements of a JSON array one by one from a file
+
+    Only the current chunk and the element being decoded are held in memory.
+    """
+
+    def __init__(self, file: IO[str]) -> None:
+        self._file = file
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._is_exhausted = False
+
+    def __iter__(self) -> Iterator[object]:
+        if self._next_character() != "[":
+            raise ValueError("Expected JSON array")
+        self._position += 1
+        if self._next_character() == "]":
+            return
+        while True:
+            yield self._decode_element()
+            separator = self._next_character()
+            self._position += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError("Expected ',' or ']' in JSON array")
+
+    def _read_chunk(self) -> bool:
+        chunk = self._file.read(_CHUNK_SIZE)
+        if not chunk:
+            self._is_exhausted = True
+            return False
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def _next_character(self) -> str:
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            self._position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._read_chunk():
+                raise ValueError("Unexpected end of JSON array")
+
+    def _decode_element(self) -> object:
+        self._next_character()
+        while True:
+            try:
+                element, end = self._decoder.raw_decode(
+                    self._buffer, self._position)
+            except json.JSONDecodeError:
+                # Element continues in the next chunk
+                if self._is_exhausted or not self._read_chunk():
+                    raise
+                continue
+            self._position = end
+            return element
 
 
 class JsonSerializer:
-    def __init__(self, path: Path, open_=open) -> None:
+    def __init__(
+            self,
+            path: Path,
+            open_=open,
+            task_type: TaskType = Task) -> None:
         self._path = path
         self._open = open_
+        # Type tasks are loaded as, e.g. CompactTask to save memory
+        self._task_type = task_type
 
+    @traced
     def save(self, tasks: Sequence[Task]) -> None:
         with self._open(self._path, "w") as file:
             json.dump(to_primitive_dicts(tasks), file, indent=4)
 
+    @traced
     def load(self) -> list[Task]:
+        return list(self.iter_load())
+
+    def iter_load(self) -> Iterator[Task]:
+        """Yields tasks as they are decoded without reading the whole file"""
         try:
             with self._open(self._path, "r") as file:
-                return tasks_from_primitive_dicts(json.load(file))
+                yield from iter_tasks_from_primitive_dicts(
+                    _ArrayReader(file), self._task_type)
         except FileNotFoundError:
-            return []
+            return
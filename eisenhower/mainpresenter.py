@@ -1,10 +1,21 @@
+import os
+from contextlib import contextmanager
 from datetime import date
 from pathlib import Path
-from typing import Optional, Protocol, Sequence, Type, TypeVar
+from typing import (
+    Any, Callable, Iterator, NamedTuple, Optional, Protocol, Sequence, Type,
+    TypeVar)
 
-from task import Task, Importance
+from task import Task, Importance, with_unique_ids
+from backgroundsaver import BackgroundSaver
+from historyfile import HistoryFile
 from jsonserializer import JsonSerializer
-from taskmanager import TaskManager
+from pickleserializer import PickleSerializer
+from searchindex import SearchIndex
+from taskdiff import ChangeSet, TaskHashes
+from taskmanager import Batch, TaskManager
+from tracing import span, traced
+from workspaceserializer import WorkspaceSerializer, workspace_paths
 
 
 class _View(Protocol):
@@ -13,82 +24,317 @@ class _View(Protocol):
     def set_undoable(self, undoable: bool) -> None: ...
     def setWindowTitle(self, title: str) -> None: ...
     def update_tasks(self, tasks: Sequence[Task]) -> None: ...
+    # Optional, replaces update_tasks() after edits if implemented
+    # def apply_changes(self, changes: ChangeSet) -> None: ...
 
 
 _Serializer = TypeVar("_Serializer")
 
+# Number of tasks shown while a streamed file is still being loaded
+_PREVIEW_SIZE = 500
+
+
+class LoadedFile(NamedTuple):
+    path: Path
+    serializer: Any
+    tasks: list[Task]
+    search_index: SearchIndex
+
+
+_ShowPreview = Callable[[list[Task]], None]
+_FileSignature = Optional[tuple[int, int]]
+
+
+def _file_signature(path: Path) -> _FileSignature:
+    """Modification time and size, which change whenever a file is written"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_unmigrated(serializer: Any) -> list[Task]:
+    # Migrating rewrites the file, which would trigger another reload
+    if isinstance(serializer, PickleSerializer):
+        return serializer.load(migrate=False)
+    return serializer.load()
+
+
+def _load_tasks(serializer: Any, show_preview: _ShowPreview) -> list[Task]:
+    iter_load = getattr(serializer, "iter_load", None)
+    if iter_load is None:
+        return serializer.load()
+    tasks = []
+    for task in iter_load():
+        tasks.append(task)
+        if len(tasks) == _PREVIEW_SIZE:
+            show_preview(list(tasks))
+    return tasks
+
 
 class MainPresenter:
     def __init__(
             self,
             view: _View,
-            serializer_type: Type[_Serializer] = JsonSerializer) -> None:
+            serializer_type: Type[_Serializer] = JsonSerializer,
+            save_in_background: bool = False,
+            history_steps: int = 0) -> None:
         self._view = view
         self._serializer_type = serializer_type
+        self._save_in_background = save_in_background
+        # Undo steps kept next to task files across restarts, none if 0
+        self._history_steps = history_steps
         self._serializer: Optional[_Serializer] = None
+        self._background_saver: Optional[BackgroundSaver] = None
         self._task_manager: Optional[TaskManager] = None
+        self._history_file: Optional[HistoryFile] = None
+        self._search_index = SearchIndex()
+        self._is_batching = False
+        # File checked for changes by other programs in reload_file()
+        self._watched_path: Optional[Path] = None
+        self._file_signature: _FileSignature = None
+        # Built on the first reload and kept up to date after that
+        self._saved_hashes: Optional[TaskHashes] = None
 
+    @traced
     def load_from_file(self, path: Path) -> None:
-        self._serializer = self._serializer_type(path)
-        self._task_manager = TaskManager(self._serializer.load())
-        self._view.setWindowTitle(path.name)
+        self.show_file(self.read_file(path, self._view.update_tasks))
+
+    @traced
+    def read_file(
+            self,
+            path: Path,
+            show_preview: Optional[_ShowPreview] = None) -> LoadedFile:
+        """Loads the tasks of a file without showing them
+
+        Neither touches the view nor the current tasks, so it can run on a
+        worker thread. The first tasks of streamed files are passed to
+        show_preview while the rest is loaded. Pass the result to
+        show_file().
+        """
+        serializer = self._serializer_type(path)
+        # Ids are given here already as the search index needs them
+        tasks = with_unique_ids(
+            _load_tasks(serializer, show_preview or (lambda _: None)))
+        with span("SearchIndex"):
+            search_index = SearchIndex(tasks)
+        return LoadedFile(path, serializer, tasks, search_index)
+
+    @traced
+    def read_workspace(self, paths: Sequence[Path]) -> LoadedFile:
+        """Loads the task files of the given files and directories as one
+
+        Like read_file(), the result is shown by show_file(). Edits are saved
+        to the files the edited tasks came from.
+        """
+        serializer = WorkspaceSerializer(
+            workspace_paths(paths), self._serializer_type)
+        tasks = serializer.load()
+        with span("SearchIndex"):
+            search_index = SearchIndex(tasks)
+        path = paths[0] if len(paths) == 1 else Path(
+            os.path.commonpath(paths))
+        return LoadedFile(path, serializer, tasks, search_index)
+
+    @traced
+    def show_file(self, loaded_file: LoadedFile) -> None:
+        """Replaces the current tasks by those read by read_file()"""
+        self.close()
+        self._serializer = loaded_file.serializer
+        is_workspace = isinstance(self._serializer, WorkspaceSerializer)
+        # Only checked for steps here, read once undo needs them
+        self._history_file = None \
+            if is_workspace or self._history_steps == 0 \
+            else HistoryFile(loaded_file.path, self._history_steps)
+        self._task_manager = TaskManager(
+            loaded_file.tasks, history_file=self._history_file)
+        self._search_index = loaded_file.search_index
+        self._watched_path = None if is_workspace else loaded_file.path
+        self._saved_hashes = None
+        self._record_file_signature()
+        if self._save_in_background:
+            self._background_saver = BackgroundSaver(
+                self._serializer, self._record_file_signature)
+        self._view.setWindowTitle(loaded_file.path.name)
         self.request_update()
+        self._view.set_undoable(self._task_manager.is_undoable())
+        self._view.set_redoable(False)
+
+    def flush(self) -> None:
+        """Blocks until all edits are saved"""
+        if self._background_saver is not None:
+            self._background_saver.flush()
+
+    def close(self) -> None:
+        """Saves pending edits and releases the serializer"""
+        if self._background_saver is not None:
+            background_saver = self._background_saver
+            self._background_saver = None
+            background_saver.close()
+        close_serializer = getattr(self._serializer, "close", None)
+        if close_serializer is not None:
+            close_serializer()
+        if self._history_file is not None:
+            self._history_file.close()
+
+    def watched_path(self) -> Optional[Path]:
+        """File to pass changes of to reload_file(), None for workspaces"""
+        return self._watched_path
+
+    @traced
+    def reload_file(self) -> None:
+        """Applies changes other programs made to the file as a single step
+
+        Tasks are compared by hash with those last saved, only the changed
+        ones are replaced. Nothing happens until the file is readable, e.g.
+        while it is still being written.
+        """
+        if self._task_manager is None or self._watched_path is None:
+            return
+        self.flush()
+        signature = _file_signature(self._watched_path)
+        if signature is None or signature == self._file_signature:
+            return
+        serializer = self._serializer_type(self._watched_path)
+        try:
+            # Ids are given like read_file() does, files may lack them
+            tasks = with_unique_ids(_load_unmigrated(serializer))
+        except (OSError, ValueError):
+            return
+        finally:
+            close_serializer = getattr(serializer, "close", None)
+            if close_serializer is not None:
+                close_serializer()
+        if self._saved_hashes is None:
+            # All edits are saved, so the file held the current tasks
+            self._saved_hashes = TaskHashes(self._task_manager.tasks())
+        diff = self._saved_hashes.update(tasks)
+        if diff is None:
+            return
+        # Only now, so that files that could not be compared are reloaded
+        # again instead of being overwritten by the next save
+        self._file_signature = signature
+        if not (diff.put or diff.deleted):
+            return
+        self._save_and_update_view(self._task_manager.merge(diff))
 
+    def tasks(self) -> Sequence[Task]:
+        if self._task_manager is None:
+            return []
+        return self._task_manager.tasks()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Saves and shows the edits made in the with block once at its end
+
+        The edits are undone and redone together.
+        """
+        assert self._task_manager is not None
+        batch: Optional[Batch] = None
+        self._is_batching = True
+        try:
+            with self._task_manager.batch() as batch:
+                yield
+        finally:
+            self._is_batching = False
+            if batch is not None:
+                self._save_and_update_view(batch.changes)
+
+    @traced
+    def search(self, query: str) -> set[int]:
+        """Ids of tasks with names containing query, ignoring case"""
+        return self._search_index.search(query)
+
+    @traced
     def request_update(self) -> None:
         if self._task_manager is None:
             self._view.hide_lists()
         else:
             self._view.update_tasks(self._task_manager.tasks())
 
-    def _save_and_update_view(self) -> None:
+    def _save_and_update_view(self, changes: ChangeSet) -> None:
         assert self._task_manager is not None
+        if self._is_batching:
+            # Done once for the whole batch
+            return
         assert self._serializer is not None
-        self._serializer.save(self._task_manager.tasks())
-        self._view.update_tasks(self._task_manager.tasks())
+        saver = self._background_saver or self._serializer
+        with span("MainPresenter.save"):
+            if hasattr(self._serializer, "save_changes"):
+                saver.save_changes(changes)
+            else:
+                saver.save(self._task_manager.tasks())
+        if self._background_saver is None:
+            self._record_file_signature()
+        if self._saved_hashes is not None:
+            self._saved_hashes.apply(changes)
+        self._search_index.apply(changes)
+        apply_changes = getattr(self._view, "apply_changes", None)
+        with span("MainPresenter.update_view"):
+            if apply_changes is None:
+                self._view.update_tasks(self._task_manager.tasks())
+            else:
+                apply_changes(changes)
         self._view.set_undoable(self._task_manager.is_undoable())
         self._view.set_redoable(self._task_manager.is_redoable())
 
+    def _record_file_signature(self) -> None:
+        # Called after saving, possibly on the saving thread, so that
+        # reload_file() skips files written by the application itself
+        if self._watched_path is not None:
+            self._file_signature = _file_signature(self._watched_path)
+
+    @traced
     def add_task(self, task: Task) -> None:
         assert self._task_manager is not None
-        self._task_manager.add(task)
-        self._save_and_update_view()
+        changes = self._task_manager.add(task)
+        self._save_and_update_view(changes)
 
+    @traced
     def complete_task(self, task: Task, completed: bool = True) -> None:
         assert self._task_manager is not None
-        self._task_manager.set_complete(task, completed)
-        self._save_and_update_view()
+        changes = self._task_manager.set_complete(task, completed)
+        self._save_and_update_view(changes)
 
+    @traced
     def delete_task(self, task: Task) -> None:
         assert self._task_manager is not None
-        self._task_manager.delete(task)
-        self._save_and_update_view()
+        changes = self._task_manager.delete(task)
+        self._save_and_update_view(changes)
 
+    @traced
     def rename_task(self, task: Task, name: str) -> None:
         assert self._task_manager is not None
-        self._task_manager.rename(task, name)
-        self._save_and_update_view()
+        changes = self._task_manager.rename(task, name)
+        self._save_and_update_view(changes)
 
+    @traced
     def set_task_due(self, task: Task, due: Optional[date]) -> None:
         assert self._task_manager is not None
-        self._task_manager.schedule_task(task, due)
-        self._save_and_update_view()
+        changes = self._task_manager.schedule_task(task, due)
+        self._save_and_update_view(changes)
 
+    @traced
     def set_task_snooze(self, task: Task, snooze: Optional[date]) -> None:
         assert self._task_manager is not None
-        self._task_manager.snooze(task, snooze)
-        self._save_and_update_view()
+        changes = self._task_manager.snooze(task, snooze)
+        self._save_and_update_view(changes)
 
+    @traced
     def set_importance(self, task: Task, importance: Importance) -> None:
         assert self._task_manager is not None
-        self._task_manager.set_importance(task, importance)
-        self._save_and_update_view()
+        changes = self._task_manager.set_importance(task, importance)
+        self._save_and_update_view(changes)
 
+    @traced
     def undo(self) -> None:
         assert self._task_manager is not None
-        self._task_manager.undo()
-        self._save_and_update_view()
+        changes = self._task_manager.undo()
+        self._save_and_update_view(changes)
 
+    @traced
     def redo(self) -> None:
         assert self._task_manager is not None
-        self._task_manager.redo()
-        self._save_and_update_view()
+        changes = self._task_manager.redo()
+        self._save_and_update_view(changes)
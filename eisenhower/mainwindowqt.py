@@ -1,20 +1,36 @@
+from datetime import datetime, time
+from functools import partial
+from math import ceil
+from operator import attrgetter
 from pathlib import Path
-from itertools import filterfalse
-from typing import Sequence
+from threading import Thread
+from typing import AbstractSet, Callable, Optional, Sequence, Union
 
 from PySide6 import QtWidgets, QtGui, QtCore
 
-from mainpresenter import MainPresenter
-from task import (
-    Task,
-    is_completed,
-    is_urgent,
-    is_important,
-    Importance)
+from compacttask import CompactTask
+from historyfile import DEFAULT_HISTORY_STEPS
+from jsonserializer import JsonSerializer
+from mainpresenter import LoadedFile, MainPresenter
+from task import Task, Importance, classify_tasks, is_completed
+from taskdiff import ChangeSet
 from dividedtasksview import DividedTasksView
-from tasksview import (
-    TasksView, build_tree_view_model, Column)
-from taskcreatordialogqt import TaskCreatorDialogQt
+from tasksview import TasksView, Column
+from tracing import mark, span, traced
+from transitions import Clock, SystemClock, TransitionSchedule
+
+_ARCHIVE_PAGE_SIZE = 200
+_MAX_TIMER_INTERVAL = 2 ** 31 - 1
+# Waits for a file to be written completely before reloading it
+_RELOAD_DELAY = 200
+
+# Reads tasks on the loading thread, passing a preview to the callback
+_Read = Callable[[Callable[[list[Task]], None]], LoadedFile]
+
+
+def _by_completion(tasks: Sequence[Task]) -> list[Task]:
+    """Most recently completed first, the order the archive is paged in"""
+    return sorted(tasks, key=attrgetter("completed"), reverse=True)
 
 
 def _style_button(button: QtWidgets.QPushButton) -> None:
@@ -26,9 +42,47 @@ def _style_button(button: QtWidgets.QPushButton) -> None:
 
 
 class MainWindowQt(QtWidgets.QWidget):
-    def __init__(self) -> None:
+    first_painted = QtCore.Signal()
+    # Emitted by the loading thread with the number of the load
+    _preview_read = QtCore.Signal(int, object)
+    _file_read = QtCore.Signal(int, object)
+
+    def __init__(
+            self,
+            clock: Optional[Clock] = None,
+            history_steps: int = DEFAULT_HISTORY_STEPS,
+            compact_tasks: bool = False) -> None:
         super().__init__()
-        self._presenter = MainPresenter(self)
+        self._clock = clock or SystemClock()
+        self._today = self._clock.now().date()
+        # Tasks move between lists as days pass, a timer wakes up at the
+        # first day a task changes to update just the tasks that changed
+        self._transitions = TransitionSchedule()
+        self._transition_timer = QtCore.QTimer(self)
+        self._transition_timer.setSingleShot(True)
+        self._transition_timer.timeout.connect(self._apply_transitions)
+        self._is_painted = False
+        # Changes of the file by other programs are reloaded once they stop
+        self._file_watcher = QtCore.QFileSystemWatcher(self)
+        self._file_watcher.fileChanged.connect(
+            lambda _: self._reload_timer.start())
+        self._reload_timer = QtCore.QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(_RELOAD_DELAY)
+        self._reload_timer.timeout.connect(self._reload_file)
+        # Loads started, results of all but the last one are dropped
+        self._load_count = 0
+        self._preview_read.connect(self._show_preview)
+        self._file_read.connect(self._show_file)
+        # Compact tasks take less than half the memory, but are slower to
+        # show as their dates are created on access
+        serializer_type = partial(JsonSerializer, task_type=CompactTask) \
+            if compact_tasks else JsonSerializer
+        self._presenter = MainPresenter(
+            self,
+            serializer_type,
+            save_in_background=True,
+            history_steps=history_steps)
         self.showMaximized()
         self.setWindowTitle("Eisenhower")
         self.setAcceptDrops(True)
@@ -44,6 +98,9 @@ class MainWindowQt(QtWidgets.QWidget):
         self._show_archive_button = QtWidgets.QPushButton("Show Archive")
         self._priority_button = QtWidgets.QPushButton("Priority Mode")
         self._priority_button.setCheckable(True)
+        self._search_edit = QtWidgets.QLineEdit(self)
+        self._search_edit.setPlaceholderText("Search")
+        self._search_edit.setClearButtonEnabled(True)
         _style_button(self._undo_button)
         _style_button(self._redo_button)
         _style_button(self._add_task_button)
@@ -51,12 +108,18 @@ class MainWindowQt(QtWidgets.QWidget):
         _style_button(self._priority_button)
         button_layout = QtWidgets.QVBoxLayout()
         layout.addLayout(button_layout)
+        button_layout.addWidget(self._search_edit)
         button_layout.addWidget(self._add_task_button)
         button_layout.addWidget(self._undo_button)
         button_layout.addWidget(self._redo_button)
         button_layout.addWidget(self._show_archive_button)
         button_layout.addWidget(self._priority_button)
         button_layout.addStretch()
+        self._loading_label = QtWidgets.QLabel(self)
+        self._loading_label.setAlignment(QtCore.Qt.AlignCenter)
+        self._loading_label.setStyleSheet("color: white; font-size: 20px")
+        self._loading_label.hide()
+        layout.addWidget(self._loading_label)
         self._do_list = DividedTasksView(
             "Do", QtGui.QColor(240, 98, 146), self)
         self._decide_list = DividedTasksView(
@@ -75,48 +138,143 @@ class MainWindowQt(QtWidgets.QWidget):
                 self._delegate_list,
                 self._drop_list):
             task_layout.addWidget(task_list)
-            task_list.complete_task_requested.connect(
-                self._presenter.complete_task)
-            task_list.delete_task_requested.connect(
-                self._presenter.delete_task)
+            task_list.complete_tasks_requested.connect(
+                lambda tasks: self._edit_each(
+                    tasks, self._presenter.complete_task))
+            task_list.delete_tasks_requested.connect(
+                lambda tasks: self._edit_each(
+                    tasks, self._presenter.delete_task))
             task_list.rename_task_requested.connect(
                 self._presenter.rename_task)
             task_list.schedule_task_requested.connect(
                 self._presenter.set_task_due)
             task_list.snooze_task_requested.connect(
                 self._presenter.set_task_snooze)
+            task_list.snooze_tasks_requested.connect(
+                lambda tasks, snooze: self._edit_each(
+                    tasks,
+                    lambda task: self._presenter.set_task_snooze(
+                        task, snooze)))
             task_list.add_task_requested.connect(self._add_task)
             task_list.remove_due_requested.connect(
-                lambda task: self._presenter.set_task_due(task, None))
+                lambda tasks: self._edit_each(
+                    tasks,
+                    lambda task: self._presenter.set_task_due(task, None)))
             task_list.remove_snooze_requested.connect(
-                lambda task: self._presenter.set_task_snooze(task, None))
+                lambda tasks: self._edit_each(
+                    tasks,
+                    lambda task: self._presenter.set_task_snooze(task, None)))
             task_list.set_important_requested.connect(
-                lambda task: self._presenter.set_importance(
-                    task, Importance.Important))
+                lambda tasks: self._edit_each(
+                    tasks,
+                    lambda task: self._presenter.set_importance(
+                        task, Importance.Important)))
             task_list.set_unimportant_requested.connect(
-                lambda task: self._presenter.set_importance(
-                    task, Importance.Unimportant))
+                lambda tasks: self._edit_each(
+                    tasks,
+                    lambda task: self._presenter.set_importance(
+                        task, Importance.Unimportant)))
         self._undo_button.clicked.connect(self._presenter.undo)
         self._redo_button.clicked.connect(self._presenter.redo)
         self._add_task_button.clicked.connect(self._add_task)
         self._show_archive_button.clicked.connect(self._show_archive)
         self._priority_button.toggled.connect(self._toggle_priority)
-        self._archive_view = TasksView(
-            (Column.Name, Column.Archived),
-            QtGui.QColor(255, 255, 255),
-            self)
-        self._archive_view.setWindowFlag(QtGui.Qt.Window)
-        self._archive_view.setWindowTitle("Task Archive")
-        self._archive_view.sortByColumn(1, QtCore.Qt.SortOrder.DescendingOrder)
-        self._archive_view.hide()
-        self._archive_view.delete_task_requested.connect(
-            self._presenter.delete_task)
-        self._archive_view.unarchive_task_requested.connect(
-            lambda task: self._presenter.complete_task(task, False))
+        self._search_edit.textChanged.connect(
+            lambda _: self._filter_tasks())
+        # Built when first shown
+        self._archive_view: Optional[TasksView] = None
+        # Set when the archive misses edits, as it is hidden or not built
+        self._is_archive_dirty = True
         self._presenter.request_update()
 
     def load_from_file(self, path: Path) -> None:
-        self._presenter.load_from_file(path)
+        """Shows the tasks of the file once a worker thread has loaded them
+
+        The window is disabled while loading. Directories are opened as
+        workspace.
+        """
+        if path.is_dir():
+            self.load_workspace([path])
+            return
+        self._load(
+            path.name,
+            lambda show_preview: self._presenter.read_file(
+                path, show_preview))
+
+    def load_workspace(self, paths: Sequence[Path]) -> None:
+        """Shows the tasks of several files and directories merged"""
+        self._load(
+            ", ".join(path.name for path in paths),
+            lambda _: self._presenter.read_workspace(paths))
+
+    def _load(self, name: str, read: _Read) -> None:
+        self._load_count += 1
+        self.setWindowTitle(f"{name} (loading)")
+        self._loading_label.setText(f"Loading {name}...")
+        self._loading_label.show()
+        self.setEnabled(False)
+        Thread(
+            target=self._read_file,
+            args=(self._load_count, read),
+            daemon=True).start()
+
+    def _read_file(self, load_number: int, read: _Read) -> None:
+        # Runs on the loading thread, signals are received on the GUI thread
+        def show_preview(tasks: list[Task]) -> None:
+            self._preview_read.emit(load_number, tasks)
+
+        result: Union[LoadedFile, Exception]
+        try:
+            result = read(show_preview)
+        except Exception as error:
+            result = error
+        self._file_read.emit(load_number, result)
+
+    def _show_preview(self, load_number: int, tasks: list[Task]) -> None:
+        if load_number == self._load_count:
+            self.update_tasks(tasks)
+
+    def _show_file(
+            self,
+            load_number: int,
+            result: Union[LoadedFile, Exception]) -> None:
+        if load_number != self._load_count:
+            close = getattr(getattr(result, "serializer", None), "close", None)
+            if close is not None:
+                close()
+            return
+        self._loading_label.hide()
+        self.setEnabled(True)
+        if isinstance(result, Exception):
+            self.setWindowTitle("Eisenhower")
+            raise result
+        self._presenter.show_file(result)
+        self._watch_file()
+
+    def _watch_file(self) -> None:
+        watched_files = self._file_watcher.files()
+        if watched_files:
+            self._file_watcher.removePaths(watched_files)
+        path = self._presenter.watched_path()
+        if path is not None and path.exists():
+            self._file_watcher.addPath(str(path))
+
+    def _reload_file(self) -> None:
+        # Files replaced by renaming another one over them are not watched
+        # anymore
+        self._watch_file()
+        self._presenter.reload_file()
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:
+        super().paintEvent(event)
+        if not self._is_painted:
+            self._is_painted = True
+            mark("first paint")
+            self.first_painted.emit()
+
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        self._presenter.close()
+        super().closeEvent(event)
 
     def dragEnterEvent(self, event: QtGui.QDragEnterEvent) -> None:
         mime_data = event.mimeData()
@@ -124,9 +282,11 @@ class MainWindowQt(QtWidgets.QWidget):
             event.acceptProposedAction()
 
     def dropEvent(self, event: QtGui.QDropEvent) -> None:
-        path = event.mimeData().urls()[0]
-        task_manager_path = Path(path.toLocalFile())
-        self.load_from_file(task_manager_path)
+        paths = [Path(url.toLocalFile()) for url in event.mimeData().urls()]
+        if len(paths) == 1:
+            self.load_from_file(paths[0])
+        else:
+            self.load_workspace(paths)
 
     def hide_lists(self) -> None:
         self._do_list.hide()
@@ -136,24 +296,81 @@ class MainWindowQt(QtWidgets.QWidget):
         self._undo_button.hide()
         self._redo_button.hide()
         self._show_archive_button.hide()
+        self._search_edit.hide()
 
+    @traced
     def update_tasks(self, tasks: Sequence[Task]) -> None:
-        non_archived_tasks = list(filterfalse(is_completed, tasks))
-        archived_tasks = filter(is_completed, tasks)
-        for filter_func, task_list in (
-                (_is_do_task, self._do_list),
-                (_is_decide_task, self._decide_list),
-                (_is_delegate_task, self._delegate_list),
-                (_is_drop_task, self._drop_list)):
+        today = self._clock.now().date()
+        self._today = today
+        with span("classify_tasks"):
+            classified = classify_tasks(tasks, today)
+        for quadrant_tasks, task_list in (
+                (classified.do, self._do_list),
+                (classified.decide, self._decide_list),
+                (classified.delegate, self._delegate_list),
+                (classified.drop, self._drop_list)):
             task_list.show()
-            task_list_tasks = list(filter(filter_func, non_archived_tasks))
-            task_list.add_tasks(task_list_tasks)
-        archive_model = build_tree_view_model(
-            self._archive_view.columns(), archived_tasks)
-        self._archive_view.setModel(archive_model)
+            task_list.set_tasks(quadrant_tasks, today)
+        if self._archive_view is not None and self._archive_view.isVisible():
+            self._archive_view.set_tasks(
+                _by_completion(classified.archived), today)
+        else:
+            self._is_archive_dirty = True
         self._undo_button.show()
         self._redo_button.show()
         self._show_archive_button.show()
+        self._search_edit.show()
+        self._refilter_tasks()
+        self._transitions.reset(tasks, today)
+        self._schedule_transitions()
+
+    @traced
+    def apply_changes(self, changes: ChangeSet) -> None:
+        if self._clock.now().date() != self._today:
+            # The timer has not caught up with the day yet
+            self._apply_transitions()
+        put = changes.put()
+        changed_ids = {task.id for task in put}
+        changed_ids.update(changes.removed_ids())
+        self._update_lists(put, changed_ids)
+        self._refilter_tasks()
+        self._transitions.apply(changes, self._today)
+        self._schedule_transitions()
+
+    @traced
+    def _apply_transitions(self) -> None:
+        self._today = self._clock.now().date()
+        tasks = self._transitions.pop_transitioned(self._today)
+        if tasks:
+            self._update_lists(tasks, {task.id for task in tasks})
+        self._schedule_transitions()
+
+    def _schedule_transitions(self) -> None:
+        transition = self._transitions.next_transition()
+        if transition is None:
+            self._transition_timer.stop()
+            return
+        delay = datetime.combine(transition, time()) - self._clock.now()
+        # Long delays are split, the timer is restarted when it fires early
+        self._transition_timer.start(min(
+            max(0, ceil(delay.total_seconds() * 1000)), _MAX_TIMER_INTERVAL))
+
+    def _update_lists(
+            self,
+            tasks: Sequence[Task],
+            changed_ids: AbstractSet[Optional[int]]) -> None:
+        classified = classify_tasks(tasks, self._today)
+        for quadrant_tasks, task_list in (
+                (classified.do, self._do_list),
+                (classified.decide, self._decide_list),
+                (classified.delegate, self._delegate_list),
+                (classified.drop, self._drop_list)):
+            task_list.update_tasks(quadrant_tasks, changed_ids, self._today)
+        if self._archive_view is not None and self._archive_view.isVisible():
+            self._archive_view.update_tasks(
+                classified.archived, changed_ids, self._today)
+        else:
+            self._is_archive_dirty = True
 
     def set_undoable(self, undoable: bool) -> None:
         self._undo_button.setEnabled(undoable)
@@ -161,32 +378,77 @@ class MainWindowQt(QtWidgets.QWidget):
     def set_redoable(self, redoable: bool) -> None:
         self._redo_button.setEnabled(redoable)
 
+    def _edit_each(
+            self,
+            tasks: Sequence[Task],
+            edit: Callable[[Task], None]) -> None:
+        """Edits all tasks as a single step that is saved and shown once"""
+        with self._presenter.batch():
+            for task in tasks:
+                edit(task)
+
     def _add_task(self) -> None:
+        # Imported when first needed to start faster
+        from taskcreatordialogqt import TaskCreatorDialogQt
         task = TaskCreatorDialogQt.ask_new_task(self)
         if task is not None:
             self._presenter.add_task(task)
 
+    @traced
     def _show_archive(self) -> None:
+        if self._archive_view is None:
+            self._archive_view = self._create_archive_view()
+        if self._is_archive_dirty:
+            self._archive_view.set_tasks(
+                _by_completion(
+                    [task for task in self._presenter.tasks()
+                     if is_completed(task)]),
+                self._today)
+            self._is_archive_dirty = False
+        self._archive_view.filter_tasks(self._search_ids())
         self._archive_view.show()
 
+    def _create_archive_view(self) -> TasksView:
+        archive_view = TasksView(
+            (Column.Name, Column.Archived),
+            QtGui.QColor(255, 255, 255),
+            self,
+            _ARCHIVE_PAGE_SIZE)
+        archive_view.setWindowFlag(QtGui.Qt.Window)
+        archive_view.setWindowTitle("Task Archive")
+        archive_view.sortByColumn(1, QtCore.Qt.SortOrder.DescendingOrder)
+        archive_view.delete_tasks_requested.connect(
+            lambda tasks: self._edit_each(tasks, self._presenter.delete_task))
+        archive_view.unarchive_tasks_requested.connect(
+            lambda tasks: self._edit_each(
+                tasks,
+                lambda task: self._presenter.complete_task(task, False)))
+        return archive_view
+
+    def _search_ids(self) -> Optional[set[int]]:
+        query = self._search_edit.text()
+        return self._presenter.search(query) if query else None
+
+    @traced
+    def _filter_tasks(self) -> None:
+        ids = self._search_ids()
+        for task_list in (
+                self._do_list,
+                self._decide_list,
+                self._delegate_list,
+                self._drop_list):
+            task_list.filter_tasks(ids)
+        if self._archive_view is not None and self._archive_view.isVisible():
+            self._archive_view.filter_tasks(ids)
+
+    def _refilter_tasks(self) -> None:
+        """Filters again after edits that may have changed matches"""
+        if self._search_edit.text():
+            self._filter_tasks()
+
     def _toggle_priority(self, is_toggled: bool) -> None:
         self._do_list.show_snoozed_tasks(not is_toggled)
         for task_list in (
                 self._decide_list, self._delegate_list, self._drop_list):
             task_list.setHidden(is_toggled)
 
-
-def _is_do_task(task: Task) -> bool:
-    return is_important(task) and is_urgent(task)
-
-
-def _is_decide_task(task: Task) -> bool:
-    return is_important(task) and (not is_urgent(task))
-
-
-def _is_delegate_task(task: Task) -> bool:
-    return (not is_important(task)) and is_urgent(task)
-
-
-def _is_drop_task(task: Task) -> bool:
-    return (not is_important(task)) and (not is_urgent(task))
@@ -1,27 +1,74 @@
+import os
+import struct
 from datetime import date
 from pathlib import Path
-from pickle import dump, load
-from typing import Optional, cast
-
-from PySide6 import QtCore
+from pickle import dump, load, HIGHEST_PROTOCOL
+from typing import Any, Iterator, Optional, Sequence
 
 from task import Task, SubTask, Importance
+from tracing import traced
+
+# Files start with a header since version 1, files without one are legacy
+# files of pickled tasks that may contain sub tasks and QDates. Version 1
+# pickles a tuple of columns: names, importance bytes (1 if important),
+# completed, due and snooze date ordinals (0 if not set) and ids.
+_MAGIC = b"EISP"
+_VERSION = 1
+_HEADER = struct.Struct("<4sH")
+_NO_DATE = 0
+_IMPORTANCES = (Importance.Unimportant, Importance.Important)
+
+
+def _to_date(date_: Any) -> Optional[date]:
+    if date_ is None or type(date_) == date:
+        return date_
+    # A QDate of files written by old versions
+    return date(date_.year(), date_.month(), date_.day())
+
+
+def _to_ordinal(date_: Optional[date]) -> int:
+    return _NO_DATE if date_ is None else date_.toordinal()
+
+
+def _dates(ordinals: Sequence[int]) -> Iterator[Optional[date]]:
+    dates = {
+        ordinal: None if ordinal == _NO_DATE else date.fromordinal(ordinal)
+        for ordinal in set(ordinals)}
+    return map(dates.__getitem__, ordinals)
+
+
+def _to_columns(tasks: Sequence[Task]) -> tuple:
+    return (
+        [task.name for task in tasks],
+        bytes(task.importance == Importance.Important for task in tasks),
+        [_to_ordinal(task.completed) for task in tasks],
+        [_to_ordinal(task.due) for task in tasks],
+        [_to_ordinal(task.snooze) for task in tasks],
+        [task.id for task in tasks])
+
+
+def _from_columns(columns: tuple) -> list[Task]:
+    names, importances, completed, due, snooze, ids = columns
+    return list(map(
+        Task,
+        names,
+        map(_IMPORTANCES.__getitem__, importances),
+        _dates(completed),
+        _dates(due),
+        _dates(snooze),
+        ids))
 
 
 def sanitize_sub_task(
         sub_task: SubTask,
         importance: Importance,
         completed: Optional[date]) -> Task:
-    due = sub_task.due
-    if sub_task.due is not None and type(sub_task.due) != date:
-        qdate_due = cast(QtCore.QDate, due)
-        due: date = date(qdate_due.year(), qdate_due.month(), qdate_due.day())
     return Task(
         sub_task.name,
         importance,
         completed,
-        due,
-        sub_task.snooze)
+        _to_date(sub_task.due),
+        _to_date(sub_task.snooze))
 
 
 def _sanitize_task(task: Task) -> list[Task]:
@@ -32,21 +79,59 @@ def _sanitize_task(task: Task) -> list[Task]:
         return [task]
 
 
+def _sanitize_tasks(legacy_tasks: list) -> list[Task]:
+    tasks = []
+    for task in legacy_tasks:
+        tasks.extend(_sanitize_task(task))
+    return tasks
+
+
 class PickleSerializer:
+    """Pickles tasks after a header with the format version
+
+    Loading a legacy file converts its tasks once and rewrites it in the
+    current format, later loads unpickle the tasks as they are. Pass
+    migrate=False to load() to leave the file as it is.
+    """
+
     def __init__(self, path: Path):
         self._path = path
 
+    @traced
     def save(self, tasks: list[Task]) -> None:
         with open(self._path, "wb") as file:
-            dump(tasks, file)
+            file.write(_HEADER.pack(_MAGIC, _VERSION))
+            dump(_to_columns(tasks), file, HIGHEST_PROTOCOL)
 
-    def load(self) -> list[Task]:
+    @traced
+    def load(self, migrate: bool = True) -> list[Task]:
         try:
             with open(self._path, "rb") as file:
-                tasks = load(file)
+                header = file.read(_HEADER.size)
+                if len(header) == _HEADER.size:
+                    magic, version = _HEADER.unpack(header)
+                    if magic == _MAGIC:
+                        if version > _VERSION:
+                            raise ValueError(
+                                f"Unsupported pickle file version {version}")
+                        return _from_columns(load(file))
+                file.seek(0)
+                legacy_tasks = load(file)
         except FileNotFoundError:
-            tasks = []
-        sanitized_tasks = []
-        for task in tasks:
-            sanitized_tasks.extend(_sanitize_task(task))
-        return sanitized_tasks
+            return []
+        if not migrate:
+            return _sanitize_tasks(legacy_tasks)
+        return self._migrate(legacy_tasks)
+
+    @traced
+    def _migrate(self, legacy_tasks: list) -> list[Task]:
+        tasks = _sanitize_tasks(legacy_tasks)
+        # Replaces the legacy file only once the new one is complete
+        temporary_path = self._path.with_name(self._path.name + ".migrated")
+        try:
+            PickleSerializer(temporary_path).save(tasks)
+            os.replace(temporary_path, self._path)
+        except OSError:
+            # Read-only files are migrated again by the next load
+            pass
+        return tasks
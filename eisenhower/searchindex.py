@@ -0,0 +1,67 @@
+from typing import Iterable, Optional
+
+from task import Task
+from taskdiff import ChangeSet
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram index of task names for case-insensitive substring search
+
+    Tasks are identified by id, tasks without one are not indexed.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()) -> None:
+        self._names: dict[int, str] = {}
+        self._ids_by_trigram: dict[str, set[int]] = {}
+        for task in tasks:
+            self._add(task)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def apply(self, changes: ChangeSet) -> None:
+        for id_ in changes.removed_ids():
+            self._remove(id_)
+        for task in changes.put():
+            self._remove(task.id)
+            self._add(task)
+
+    def search(self, query: str) -> set[int]:
+        """Ids of tasks with names containing query"""
+        query = query.casefold()
+        if len(query) < 3:
+            # Too short for trigrams and matching too many tasks to gain
+            # much from an index anyway
+            return {id_ for id_, name in self._names.items() if query in name}
+        id_sets = sorted(
+            (self._ids_by_trigram.get(trigram, set())
+             for trigram in _trigrams(query)),
+            key=len)
+        ids = id_sets[0].intersection(*id_sets[1:])
+        if len(query) == 3:
+            return ids
+        # Names with all trigrams of the query may still not contain it
+        names = self._names
+        return {id_ for id_ in ids if query in names[id_]}
+
+    def _add(self, task: Task) -> None:
+        if task.id is None:
+            return
+        name = task.name.casefold()
+        self._names[task.id] = name
+        for trigram in _trigrams(name):
+            self._ids_by_trigram.setdefault(trigram, set()).add(task.id)
+
+    def _remove(self, id_: Optional[int]) -> None:
+        name = self._names.pop(id_, None)
+        if name is None:
+            return
+        for trigram in _trigrams(name):
+            ids = self._ids_by_trigram[trigram]
+            ids.discard(id_)
+            if not ids:
+                del self._ids_by_trigram[trigram]
@@ -0,0 +1,143 @@
+import sqlite3
+from datetime import date
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+from task import Task, Importance
+from taskdiff import ChangeSet, SavedTasks
+from tracing import traced
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    importance TEXT NOT NULL,
+    completed TEXT,
+    due TEXT,
+    snooze TEXT);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due);
+CREATE INDEX IF NOT EXISTS tasks_snooze ON tasks (snooze);
+"""
+_COLUMNS = "id, name, importance, completed, due, snooze"
+_UPSERT = f"""INSERT INTO tasks ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name,
+    importance = excluded.importance,
+    completed = excluded.completed,
+    due = excluded.due,
+    snooze = excluded.snooze
+"""
+
+
+def _date_to_string(date_: Optional[date]) -> Optional[str]:
+    return date_.isoformat() if date_ is not None else None
+
+
+def _date_from_string(string: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(string) if string is not None else None
+
+
+def _to_row(task: Task) -> tuple:
+    return (
+        task.id,
+        task.name,
+        task.importance.name,
+        _date_to_string(task.completed),
+        _date_to_string(task.due),
+        _date_to_string(task.snooze))
+
+
+def _rows_with_unique_ids(tasks: Iterable[Task]) -> list[tuple]:
+    ids: set[Optional[int]] = {None}
+    rows = []
+    rows_without_id = []
+    for task in tasks:
+        row = _to_row(task)
+        if task.id in ids:
+            # Let SQLite assign a new id after all given ids are taken
+            rows_without_id.append((None,) + row[1:])
+        else:
+            rows.append(row)
+        ids.add(task.id)
+    return rows + rows_without_id
+
+
+def _from_rows(rows: Iterable[tuple]) -> list[Task]:
+    return [
+        Task(
+            name,
+            Importance[importance],
+            _date_from_string(completed),
+            _date_from_string(due),
+            _date_from_string(snooze),
+            id_)
+        for id_, name, importance, completed, due, snooze in rows]
+
+
+class SqliteSerializer:
+    """Stores tasks as rows of an SQLite database in WAL mode
+
+    A save only writes the rows of tasks put or deleted since the previous
+    save or load, all in one transaction.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._saved = SavedTasks()
+
+    @traced
+    def load(self) -> list[Task]:
+        tasks = _from_rows(self._connect().execute(
+            f"SELECT {_COLUMNS} FROM tasks ORDER BY rowid"))
+        self._saved = SavedTasks(tasks)
+        return tasks
+
+    @traced
+    def save(self, tasks: Sequence[Task]) -> None:
+        connection = self._connect()
+        diff = self._saved.update(tasks)
+        with connection:
+            if diff is None:
+                connection.execute("DELETE FROM tasks")
+                connection.executemany(
+                    f"INSERT INTO tasks ({_COLUMNS}) "
+                    f"VALUES (?, ?, ?, ?, ?, ?)",
+                    _rows_with_unique_ids(tasks))
+            else:
+                self._write_rows(diff.put, diff.deleted)
+
+    @traced
+    def save_changes(self, changes: ChangeSet) -> None:
+        connection = self._connect()
+        self._saved.apply(changes)
+        with connection:
+            self._write_rows(changes.put(), changes.removed_ids())
+
+    def archived_tasks(self, offset: int = 0, limit: int = -1) -> list[Task]:
+        """Completed tasks, most recently completed first"""
+        return _from_rows(self._connect().execute(
+            f"SELECT {_COLUMNS} FROM tasks WHERE completed IS NOT NULL "
+            f"ORDER BY completed DESC LIMIT ? OFFSET ?",
+            (limit, offset)))
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _write_rows(self, put: Sequence[Task], deleted: Sequence[int]) -> None:
+        connection = self._connect()
+        connection.executemany(_UPSERT, map(_to_row, put))
+        connection.executemany(
+            "DELETE FROM tasks WHERE id = ?", ((id_,) for id_ in deleted))
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            # Saves may run on a background thread, see BackgroundSaver
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
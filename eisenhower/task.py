@@ -1,7 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from datetime import date, timedelta
 from enum import Enum, auto
-from typing import Optional, Iterable, Sequence
+from typing import (
+    Callable, Optional, Iterable, Iterator, NamedTuple, Sequence)
+from weakref import WeakValueDictionary
 
 
 class Importance(Enum):
@@ -24,19 +26,94 @@ class Task:
     completed: Optional[date] = None
     due: Optional[date] = None
     snooze: Optional[date] = None
+    # Identifies a task across edits, not part of its value
+    id: Optional[int] = field(default=None, compare=False)
 
+    def _value(self) -> tuple:
+        return (self.name, self.importance, self.completed, self.due,
+                self.snooze)
 
-def is_urgent(task: Task) -> bool:
+    def __hash__(self) -> int:
+        # Cached outside of the fields, tasks are hashed again and again by
+        # sets, dicts and TaskHashes
+        hash_ = self.__dict__.get("_hash")
+        if hash_ is None:
+            hash_ = self.__dict__["_hash"] = hash(self._value())
+        return hash_
+
+    def __getstate__(self) -> dict:
+        # String hashes differ between processes
+        state = dict(self.__dict__)
+        state.pop("_hash", None)
+        return state
+
+
+class TaskInterner:
+    """Shares a single instance between tasks of the same value and id
+
+    Tasks are held weakly and released once they are not used elsewhere.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: WeakValueDictionary[tuple, Task] = WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def intern(self, task: Task) -> Task:
+        return self._tasks.setdefault((task.id,) + task._value(), task)
+
+
+_URGENCY = timedelta(days=14)
+
+
+def with_unique_ids(tasks: Sequence[Task]) -> list[Task]:
+    """Gives tasks without id or with a duplicate id a new one"""
+    next_id = 1 + max(
+        (task.id for task in tasks if task.id is not None), default=0)
+    ids: set[int] = set()
+    unique_tasks = []
+    for task in tasks:
+        if task.id is None or task.id in ids:
+            task = replace(task, id=next_id)
+            next_id += 1
+        ids.add(task.id)
+        unique_tasks.append(task)
+    return unique_tasks
+
+
+def is_urgent(task: Task, today: Optional[date] = None) -> bool:
     due = task.due
     if due is None:
         return False
-    return (due - date.today()) < timedelta(days=14)
+    return (due - (today or date.today())) < _URGENCY
 
 
-def has_snoozed_date(task: Task) -> bool:
+def has_snoozed_date(task: Task, today: Optional[date] = None) -> bool:
     if task.snooze is None:
         return False
-    return task.snooze > date.today()
+    return task.snooze > (today or date.today())
+
+
+def next_transition(task: Task, today: date) -> Optional[date]:
+    """First day after today on which the task shows differently
+
+    That is when it becomes urgent or overdue or its snooze ends.
+    """
+    if task.completed is not None:
+        return None
+    transitions = []
+    due = task.due
+    if due is not None:
+        # is_urgent() turns true once less than _URGENCY is left
+        transitions.append(date.fromordinal(
+            max(1, due.toordinal() - _URGENCY.days + 1)))
+        transitions.append(due)
+    if task.snooze is not None:
+        transitions.append(task.snooze)
+    return min(
+        (transition for transition in transitions if transition > today),
+        default=None)
 
 
 def is_completed(task: Task) -> bool:
@@ -48,8 +125,11 @@ def is_important(task: Task) -> bool:
 
 
 def sort_tasks_by_relevance(
-        tasks: Iterable[Task]) -> \
+        tasks: Iterable[Task],
+        today: Optional[date] = None) -> \
         tuple[list[Task], list[Task], list[Task], list[Task]]:
+    if today is None:
+        today = date.today()
     completed_tasks: list[Task] = []
     snoozed_tasks: list[Task] = []
     due_tasks: list[Task] = []
@@ -57,26 +137,69 @@ def sort_tasks_by_relevance(
     for task in tasks:
         if is_completed(task):
             completed_tasks.append(task)
-        elif has_snoozed_date(task):
+        elif has_snoozed_date(task, today):
             snoozed_tasks.append(task)
-        elif is_urgent(task):
+        elif is_urgent(task, today):
             due_tasks.append(task)
         else:
             normal_tasks.append(task)
     return due_tasks, normal_tasks, snoozed_tasks, completed_tasks
 
 
+class QuadrantTasks(NamedTuple):
+    due: list[Task]
+    normal: list[Task]
+    snoozed: list[Task]
+
+
+class ClassifiedTasks(NamedTuple):
+    do: QuadrantTasks
+    decide: QuadrantTasks
+    delegate: QuadrantTasks
+    drop: QuadrantTasks
+    archived: list[Task]
+
+
+def classify_tasks(tasks: Iterable[Task], today: date) -> ClassifiedTasks:
+    """Sorts tasks into quadrants and relevance in a single pass"""
+    classified = ClassifiedTasks(
+        *(QuadrantTasks([], [], []) for _ in range(4)), [])
+    do, decide, delegate, drop, archived = classified
+    urgency_limit = today + _URGENCY
+    for task in tasks:
+        if task.completed is not None:
+            archived.append(task)
+            continue
+        due = task.due
+        is_urgent_ = due is not None and due < urgency_limit
+        if task.importance == Importance.Important:
+            quadrant = do if is_urgent_ else decide
+        else:
+            quadrant = delegate if is_urgent_ else drop
+        snooze = task.snooze
+        if snooze is not None and snooze > today:
+            quadrant.snoozed.append(task)
+        elif is_urgent_:
+            quadrant.due.append(task)
+        else:
+            quadrant.normal.append(task)
+    return classified
+
+
 def _date_to_string(date_: Optional[date]) -> Optional[str]:
     return date_.isoformat() if date_ is not None else None
 
 
 def _to_primitive_dict(task: Task) -> dict:
-    return {
+    primitive_dict = {
         "name": task.name,
         "importance": task.importance.name,
         "completed": _date_to_string(task.completed),
         "due": _date_to_string(task.due),
         "snooze": _date_to_string(task.snooze)}
+    if task.id is not None:
+        primitive_dict["id"] = task.id
+    return primitive_dict
 
 
 def to_primitive_dicts(tasks: Sequence[Task]) -> list[dict]:
@@ -87,14 +210,34 @@ def _date_from_string(string: Optional[str]) -> Optional[date]:
     return date.fromisoformat(string) if string is not None else None
 
 
-def _task_from_primitive_dict(from_dict: dict) -> Task:
-    return Task(
-        from_dict["name"],
-        Importance[from_dict["importance"]],
-        _date_from_string(from_dict["completed"]),
-        _date_from_string(from_dict["due"]),
-        _date_from_string(from_dict["snooze"]))
+# Creates tasks from their fields, e.g. CompactTask for very large files
+TaskType = Callable[..., Task]
+
+
+def iter_tasks_from_primitive_dicts(
+        dicts: Iterable[dict],
+        task_type: TaskType = Task) -> Iterator[Task]:
+    # Task files repeat few distinct dates, parse each of them only once
+    dates: dict[Optional[str], Optional[date]] = {None: None}
+
+    def date_from_string(string: Optional[str]) -> Optional[date]:
+        try:
+            return dates[string]
+        except KeyError:
+            date_ = dates[string] = _date_from_string(string)
+            return date_
+
+    for from_dict in dicts:
+        yield task_type(
+            from_dict["name"],
+            Importance[from_dict["importance"]],
+            date_from_string(from_dict["completed"]),
+            date_from_string(from_dict["due"]),
+            date_from_string(from_dict["snooze"]),
+            from_dict.get("id"))
 
 
-def tasks_from_primitive_dicts(dicts: list[dict]) -> list[Task]:
-    return [_task_from_primitive_dict(i) for i in dicts]
+def tasks_from_primitive_dicts(
+        dicts: Iterable[dict],
+        task_type: TaskType = Task) -> list[Task]:
+    return list(iter_tasks_from_primitive_dicts(dicts, task_type))
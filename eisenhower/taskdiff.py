@@ -0,0 +1,195 @@
+from typing import Iterable, NamedTuple, Optional, Sequence
+
+from history import Change
+from task import Task
+
+
+class TaskDiff(NamedTuple):
+    put: list[Task]
+    deleted: list[int]
+
+
+class SavedTasks:
+    """Remembers saved tasks by id to find what changed in a later save
+
+    Tasks are compared by identity, which is cheap and exact for tasks kept
+    by TaskManager as it replaces every edited task with a new instance.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()) -> None:
+        self._tasks = {task.id: task for task in tasks}
+
+    def is_complete(self) -> bool:
+        """Whether every saved task has an id"""
+        return None not in self._tasks
+
+    def update(self, tasks: Sequence[Task]) -> Optional[TaskDiff]:
+        """Records tasks as saved and returns their changes
+
+        Returns None if tasks cannot be told apart by id.
+        """
+        saved = self._tasks
+        current = {task.id: task for task in tasks}
+        self._tasks = current
+        if None in current or len(current) != len(tasks):
+            return None
+        put = [task for id_, task in current.items()
+               if saved.get(id_) is not task]
+        deleted = [id_ for id_ in saved if id_ not in current]
+        return TaskDiff(put, deleted)
+
+    def apply(self, changes: "ChangeSet") -> None:
+        """Records the changes as saved"""
+        for id_ in changes.removed_ids():
+            self._tasks.pop(id_, None)
+        for task in changes.put():
+            self._tasks[task.id] = task
+
+    def tasks(self) -> list[Task]:
+        return list(self._tasks.values())
+
+
+class TaskHashes:
+    """Remembers hashes of saved tasks by id to find what a reload changed
+
+    Unlike SavedTasks it works with tasks decoded anew from a file, which
+    are never identical to the saved ones.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()) -> None:
+        self._hashes = {task.id: hash(task) for task in tasks}
+
+    def update(self, tasks: Sequence[Task]) -> Optional[TaskDiff]:
+        """Records the hashes of tasks and returns their changes
+
+        Returns None if tasks cannot be told apart by id.
+        """
+        hashes = self._hashes
+        current = {task.id: hash(task) for task in tasks}
+        if None in current or len(current) != len(tasks):
+            return None
+        self._hashes = current
+        put = [task for task in tasks
+               if hashes.get(task.id) != current[task.id]]
+        deleted = [id_ for id_ in hashes if id_ not in current]
+        return TaskDiff(put, deleted)
+
+    def apply(self, changes: "ChangeSet") -> None:
+        """Records the changes as saved"""
+        for id_ in changes.removed_ids():
+            self._hashes.pop(id_, None)
+        for task in changes.put():
+            self._hashes[task.id] = hash(task)
+
+
+class ChangeSet(NamedTuple):
+    """Tasks added, removed and replaced as (old, new) by an edit"""
+    added: list[Task]
+    removed: list[Task]
+    replaced: list[tuple[Task, Task]]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.replaced)
+
+    def put(self) -> list[Task]:
+        """Tasks present after the edit that were not before"""
+        return self.added + [new for _, new in self.replaced]
+
+    def removed_ids(self) -> list[Optional[int]]:
+        return [task.id for task in self.removed]
+
+    def then(self, later: "ChangeSet") -> "ChangeSet":
+        """Combines this change set with one made after it"""
+        states = _states_by_id(self)
+        for id_, (old, new) in _states_by_id(later).items():
+            if id_ in states:
+                old = states[id_][0]
+            states[id_] = (old, new)
+        return _from_states(states.values())
+
+
+_State = tuple[Optional[Task], Optional[Task]]
+
+
+def _states_by_id(change_set: ChangeSet) -> dict[Optional[int], _State]:
+    states: dict[Optional[int], _State] = {}
+    for task in change_set.added:
+        states[task.id] = (None, task)
+    for task in change_set.removed:
+        states[task.id] = (task, None)
+    for old, new in change_set.replaced:
+        states[new.id] = (old, new)
+    return states
+
+
+def _from_states(states: Iterable[_State]) -> ChangeSet:
+    change_set = ChangeSet([], [], [])
+    for old, new in states:
+        if old is None:
+            if new is not None:
+                change_set.added.append(new)
+        elif new is None:
+            change_set.removed.append(old)
+        elif old is not new:
+            change_set.replaced.append((old, new))
+    return change_set
+
+
+def _shifted(
+        placed: dict[int, Optional[int]],
+        index: int,
+        offset: int) -> dict[int, Optional[int]]:
+    return {
+        i + offset if i >= index else i: id_ for i, id_ in placed.items()}
+
+
+def change_set_of(changes: Iterable[Change]) -> ChangeSet:
+    """Net effect of history changes on the tasks, identified by id"""
+    balances: dict[Optional[int], int] = {}
+    # First task removed and last task inserted for every id
+    states: dict[Optional[int], list[Optional[Task]]] = {}
+    # Ids present before the changes, that is removed from a position they
+    # were not put at by an earlier change. Moving a task puts it at its new
+    # position before removing it from the old one.
+    initial_ids: set[Optional[int]] = set()
+    placed: dict[int, Optional[int]] = {}
+    for change in changes:
+        index = change.index
+        if change.old is not None:
+            id_ = change.old.id
+            balances[id_] = balances.get(id_, 0) - 1
+            state = states.setdefault(id_, [None, None])
+            if state[0] is None:
+                state[0] = change.old
+            if index not in placed or placed[index] != id_:
+                initial_ids.add(id_)
+            if change.new is None and placed:
+                placed.pop(index, None)
+                placed = _shifted(placed, index + 1, -1)
+        elif placed:
+            placed = _shifted(placed, index, 1)
+        if change.new is not None:
+            id_ = change.new.id
+            balances[id_] = balances.get(id_, 0) + 1
+            states.setdefault(id_, [None, None])[1] = change.new
+            placed[index] = id_
+    net_states = []
+    for id_, balance in balances.items():
+        old, new = states[id_]
+        was_present = id_ in initial_ids
+        is_present = was_present + balance > 0
+        if was_present and is_present:
+            # Possibly moved within the tasks and replaced on the way
+            net_states.append((old, new))
+        elif was_present:
+            net_states.append((old, None))
+        elif is_present:
+            net_states.append((None, new))
+    return _from_states(net_states)
+
+
+def reverted(change_set: ChangeSet) -> ChangeSet:
+    return ChangeSet(
+        list(change_set.removed),
+        list(change_set.added),
+        [(new, old) for old, new in change_set.replaced])
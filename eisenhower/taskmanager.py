@@ -1,95 +1,333 @@
-from typing import Optional
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
 from datetime import date
 from dataclasses import replace
 
-from task import Task, Importance
-from history import History, Tasks
+from task import Task, Importance, TaskInterner, with_unique_ids
+from history import History, Tasks, Change
+from historyfile import HistoryFile
+from taskdiff import ChangeSet, TaskDiff, change_set_of, reverted
+from tracing import traced
+
+
+class Batch:
+    """Edits of a TaskManager.batch(), their changes are set when it ends"""
+
+    def __init__(self) -> None:
+        self.changes = ChangeSet([], [], [])
 
 
 class TaskManager:
-    def __init__(self, tasks: Tasks) -> None:
-        self._history = History(tasks)
+    """Edits tasks by id, keeping an index from id to position in tasks()
+
+    Tasks without an id, e.g. freshly created ones, are looked up by value.
+    Deleting swaps the last task into the freed position, so the order of
+    tasks() is not preserved across deletions. Every edit, undo and redo
+    returns the resulting ChangeSet. Tasks created by edits are interned, so
+    an edit restoring an earlier version of a task shares its instance.
+
+    With a history_file, steps are recorded to it as well. Its steps of
+    earlier sessions are only loaded once undo() runs out of steps recorded
+    in memory, each of them is checked against the tasks before it is
+    applied.
+    """
+
+    @traced
+    def __init__(
+            self,
+            tasks: Tasks,
+            max_history_steps: Optional[int] = None,
+            max_history_bytes: Optional[int] = None,
+            history_file: Optional[HistoryFile] = None) -> None:
+        tasks = with_unique_ids(tasks)
+        self._next_id = 1 + max((task.id for task in tasks), default=0)
+        self._history = History(tasks, max_history_steps, max_history_bytes)
+        self._positions: dict[int, int] = {
+            task.id: i for i, task in enumerate(self.tasks())}
+        self._batch: Optional[Batch] = None
+        self._interner = TaskInterner()
+        self._history_file = history_file
+        # Steps of the history file preceding and following the steps in
+        # memory, loaded on demand
+        self._file_past: Optional[list[ChangeSet]] = None
+        self._file_future: list[ChangeSet] = []
 
     def tasks(self) -> Tasks:
         return self._history.present()
 
-    def add(self, task: Task) -> None:
-        tasks = self._history.advance_history()
-        tasks.append(task)
-
-    def delete(self, task: Task) -> None:
-        tasks = self._history.advance_history()
-        _delete(tasks, task)
-
-    def replace(self, old_task: Task, new_task: Task) -> None:
-        tasks = self._history.advance_history()
-        _delete(tasks, old_task)
-        tasks.append(new_task)
-
-    def set_complete(self, task: Task, is_complete: bool = True) -> None:
-        tasks = self._history.advance_history()
-        _complete(tasks, task, is_complete)
-
-    def schedule_task(self, task: Task, due: Optional[date]) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, due=due)
-        _replace(tasks, task, new_task)
-
-    def snooze(self, task: Task, snooze: Optional[date]) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, snooze=snooze)
-        _replace(tasks, task, new_task)
-
-    def rename(self, task: Task, new_name: str) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, name=new_name)
-        _replace(tasks, task, new_task)
-
-    def remove_due(self, task: Task) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, due=None)
-        _replace(tasks, task, new_task)
-
-    def remove_snooze(self, task: Task) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, snooze=None)
-        _replace(tasks, task, new_task)
-
-    def set_importance(self, task: Task, importance: Importance) -> None:
-        tasks = self._history.advance_history()
-        new_task = replace(task, importance=importance)
-        _replace(tasks, task, new_task)
+    @traced
+    def add(self, task: Task) -> ChangeSet:
+        tasks = self._edited_tasks()
+        task = self._identified(task)
+        self._positions[task.id] = len(tasks)
+        tasks.append(self._interner.intern(task))
+        return self._recorded_changes()
+
+    @traced
+    def delete(self, task: Task) -> ChangeSet:
+        tasks = self._edited_tasks()
+        position = self._find(task)
+        if position is not None:
+            self._delete_at(tasks, position)
+        return self._recorded_changes()
+
+    @traced
+    def replace(self, old_task: Task, new_task: Task) -> ChangeSet:
+        tasks = self._edited_tasks()
+        position = self._find(old_task)
+        if position is None:
+            new_task = self._identified(new_task)
+            self._positions[new_task.id] = len(tasks)
+            tasks.append(self._interner.intern(new_task))
+        else:
+            self._replace_at(
+                tasks, position, replace(new_task, id=tasks[position].id))
+        return self._recorded_changes()
+
+    @traced
+    def set_complete(self, task: Task, is_complete: bool = True) -> ChangeSet:
+        tasks = self._edited_tasks()
+        position = self._find(task)
+        if position is not None:
+            completed = date.today() if is_complete else None
+            self._replace_at(
+                tasks, position, replace(tasks[position], completed=completed))
+        return self._recorded_changes()
+
+    @traced
+    def schedule_task(self, task: Task, due: Optional[date]) -> ChangeSet:
+        return self._replace_field(task, due=due)
+
+    @traced
+    def snooze(self, task: Task, snooze: Optional[date]) -> ChangeSet:
+        return self._replace_field(task, snooze=snooze)
+
+    @traced
+    def rename(self, task: Task, new_name: str) -> ChangeSet:
+        return self._replace_field(task, name=new_name)
+
+    @traced
+    def remove_due(self, task: Task) -> ChangeSet:
+        return self._replace_field(task, due=None)
+
+    @traced
+    def remove_snooze(self, task: Task) -> ChangeSet:
+        return self._replace_field(task, snooze=None)
+
+    @traced
+    def set_importance(
+            self,
+            task: Task,
+            importance: Importance) -> ChangeSet:
+        return self._replace_field(task, importance=importance)
+
+    @traced
+    def merge(self, diff: TaskDiff) -> ChangeSet:
+        """Puts and deletes tasks by id, e.g. those changed in a file"""
+        tasks = self._edited_tasks()
+        for id_ in diff.deleted:
+            position = self._positions.get(id_)
+            if position is not None:
+                self._delete_at(tasks, position)
+        for task in diff.put:
+            position = self._find(task)
+            if position is None:
+                task = self._identified(task)
+                self._positions[task.id] = len(tasks)
+                tasks.append(self._interner.intern(task))
+            else:
+                self._replace_at(tasks, position, task)
+        return self._recorded_changes()
+
+    @contextmanager
+    def batch(self) -> Iterator[Batch]:
+        """Records all edits made in the with block as a single step
+
+        Edits in the block return empty change sets, the yielded batch
+        holds their combined changes once the block is left.
+        """
+        assert self._batch is None, "Batches cannot be nested"
+        self._advance_history()
+        batch = self._batch = Batch()
+        try:
+            yield batch
+        finally:
+            self._batch = None
+            batch.changes = self._recorded_changes()
 
     def is_undoable(self) -> bool:
-        return self._history.has_past()
+        if self._history.has_past():
+            return True
+        if self._file_past is None:
+            return self._history_file is not None \
+                and self._history_file.has_undoable_steps()
+        return len(self._file_past) > 0
 
     def is_redoable(self) -> bool:
-        return self._history.has_future()
+        return self._history.has_future() or len(self._file_future) > 0
 
-    def undo(self) -> None:
+    @traced
+    def undo(self) -> ChangeSet:
+        """Undoes the last step, nothing if a step of the file is invalid"""
+        assert self._batch is None
+        if not self._history.has_past():
+            return self._undo_file_step()
+        changes = self._history.undoable_changes()
         self._history.go_back_in_time()
+        self._reindex(changes)
+        if self._history_file is not None:
+            self._history_file.record_undo()
+        return reverted(change_set_of(changes))
 
-    def redo(self) -> None:
+    @traced
+    def redo(self) -> ChangeSet:
+        assert self._batch is None
+        if not self._history.has_future():
+            return self._redo_file_step()
+        changes = self._history.redoable_changes()
         self._history.go_forward_in_time()
+        self._reindex(changes)
+        if self._history_file is not None:
+            self._history_file.record_redo()
+        return change_set_of(changes)
 
+    def history_depth(self) -> int:
+        return self._history.depth()
 
-def _delete(tasks: Tasks, task: Task) -> None:
-    try:
-        tasks.remove(task)
-    except ValueError:
-        pass
+    def history_footprint(self) -> int:
+        return self._history.memory_footprint()
 
+    def _new_id(self) -> int:
+        id_ = self._next_id
+        self._next_id += 1
+        return id_
 
-def _complete(tasks: Tasks, old_task: Task, is_complete: bool) -> None:
-    for i, task in enumerate(tasks):
-        if task == old_task:
-            if is_complete:
-                tasks[i] = replace(task, completed=date.today())
-            else:
-                tasks[i] = replace(task, completed=None)
-            break
+    def _identified(self, task: Task) -> Task:
+        if task.id is None or task.id in self._positions:
+            return replace(task, id=self._new_id())
+        self._next_id = max(self._next_id, task.id + 1)
+        return task
+
+    def _find(self, task: Task) -> Optional[int]:
+        if task.id is not None:
+            return self._positions.get(task.id)
+        try:
+            return self.tasks().index(task)
+        except ValueError:
+            return None
+
+    def _delete_at(self, tasks: Tasks, position: int) -> None:
+        deleted_id = tasks[position].id
+        last_position = len(tasks) - 1
+        if position != last_position:
+            last_task = tasks[last_position]
+            tasks[position] = last_task
+            self._positions[last_task.id] = position
+        tasks.pop()
+        del self._positions[deleted_id]
+
+    def _replace_field(self, task: Task, **changes) -> ChangeSet:
+        # Looked up first, so that no step is opened for a missing task
+        position = self._find(task)
+        if position is None:
+            raise ValueError("Task not found")
+        tasks = self._edited_tasks()
+        self._replace_at(tasks, position, replace(tasks[position], **changes))
+        return self._recorded_changes()
+
+    def _replace_at(self, tasks: Tasks, position: int, task: Task) -> None:
+        # The replaced task is interned to be shared by an edit restoring it
+        self._interner.intern(tasks[position])
+        tasks[position] = self._interner.intern(task)
+
+    def _advance_history(self) -> Tasks:
+        self._file_future.clear()
+        return self._history.advance_history()
+
+    def _edited_tasks(self) -> Tasks:
+        if self._batch is None:
+            return self._advance_history()
+        # Recorded into the step opened by batch()
+        return self.tasks()
+
+    def _recorded_changes(self) -> ChangeSet:
+        if self._batch is not None:
+            return ChangeSet([], [], [])
+        changes = change_set_of(self._history.undoable_changes())
+        if self._history_file is not None:
+            self._history_file.record_step(changes)
+        return changes
+
+    def _load_history_file(self) -> list[ChangeSet]:
+        if self._file_past is None:
+            past: list[ChangeSet] = []
+            future: list[ChangeSet] = []
+            if self._history_file is not None:
+                past, future = self._history_file.load()
+            # The file holds the steps in memory as well. All of them are
+            # undone when this is called, so they are the last ones of its
+            # future.
+            self._file_past = past
+            self._file_future = future[
+                :max(0, len(future) - self._history.depth())]
+        return self._file_past
+
+    def _undo_file_step(self) -> ChangeSet:
+        file_past = self._load_history_file()
+        if not file_past:
+            return ChangeSet([], [], [])
+        assert self._history_file is not None
+        undone = reverted(file_past.pop())
+        if not self._can_apply(undone):
+            # Tasks were changed outside of the history, e.g. while closed
+            file_past.clear()
+            self._history_file.forget_past()
+            return ChangeSet([], [], [])
+        changes = self._history.record_undo(
+            lambda tasks: self._apply(tasks, undone))
+        self._history_file.record_undo()
+        return change_set_of(changes)
+
+    def _redo_file_step(self) -> ChangeSet:
+        if not self._file_future:
+            return ChangeSet([], [], [])
+        assert self._history_file is not None
+        redone = self._file_future.pop()
+        if not self._can_apply(redone):
+            self._file_future.clear()
+            self._history_file.forget_future()
+            return ChangeSet([], [], [])
+        changes = self._history.record_redo(
+            lambda tasks: self._apply(tasks, redone))
+        self._history_file.record_redo()
+        return change_set_of(changes)
+
+    def _can_apply(self, changes: ChangeSet) -> bool:
+        # Tasks removed or replaced need to be present unchanged, added ones
+        # absent
+        tasks = self.tasks()
+        for task in changes.removed + [old for old, _ in changes.replaced]:
+            position = self._positions.get(task.id)
+            if position is None or tasks[position] != task:
+                return False
+        return all(task.id not in self._positions for task in changes.added)
 
+    def _apply(self, tasks: Tasks, changes: ChangeSet) -> None:
+        for task in changes.removed:
+            self._delete_at(tasks, self._positions[task.id])
+        for old, new in changes.replaced:
+            self._replace_at(tasks, self._positions[old.id], new)
+        for task in changes.added:
+            task = self._identified(task)
+            self._positions[task.id] = len(tasks)
+            tasks.append(self._interner.intern(task))
 
-def _replace(tasks: Tasks, old_task: Task, new_task: Task) -> None:
-    index = tasks.index(old_task)
-    tasks[index] = new_task
+    def _reindex(self, changes: Sequence[Change]) -> None:
+        tasks = self.tasks()
+        for change in changes:
+            for task in (change.old, change.new):
+                if task is not None:
+                    self._positions.pop(task.id, None)
+        for change in changes:
+            if change.index < len(tasks):
+                self._positions[tasks[change.index].id] = change.index
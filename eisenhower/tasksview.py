@@ -1,6 +1,6 @@
-from datetime import date
+from datetime import date, timedelta
 from enum import Enum, auto
-from typing import Optional, Iterable, Sequence
+from typing import AbstractSet, Iterator, Optional, Sequence
 from PySide6 import QtWidgets, QtCore, QtGui
 from task import (
     Task,
@@ -8,8 +8,11 @@ from task import (
     has_snoozed_date,
     is_completed,
     Importance)
+from tracing import traced
 
 TASK_ROLE = QtCore.Qt.UserRole + 1
+_ITEM_FLAGS = QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEnabled \
+    | QtCore.Qt.ItemNeverHasChildren
 
 
 class Column(Enum):
@@ -21,23 +24,33 @@ class Column(Enum):
 
 class TasksView(QtWidgets.QTreeView):
     add_task_requested = QtCore.Signal()
-    complete_task_requested = QtCore.Signal(Task)
-    unarchive_task_requested = QtCore.Signal(Task)
-    delete_task_requested = QtCore.Signal(Task)
-    remove_due_requested = QtCore.Signal(Task)
-    remove_snooze_requested = QtCore.Signal(Task)
-    set_important_requested = QtCore.Signal(Task)
-    set_unimportant_requested = QtCore.Signal(Task)
+    # Requests from the context menu for all selected tasks, list[Task]
+    complete_tasks_requested = QtCore.Signal(list)
+    unarchive_tasks_requested = QtCore.Signal(list)
+    delete_tasks_requested = QtCore.Signal(list)
+    remove_due_requested = QtCore.Signal(list)
+    remove_snooze_requested = QtCore.Signal(list)
+    snooze_tasks_requested = QtCore.Signal(list, date)
+    set_important_requested = QtCore.Signal(list)
+    set_unimportant_requested = QtCore.Signal(list)
+    task_edited = QtCore.Signal(Task, object, object)
 
     def __init__(
             self,
             displayed_columns: Sequence[Column],
             color: QtGui.QColor,
-            parent: QtWidgets.QWidget) -> None:
+            parent: QtWidgets.QWidget,
+            page_size: Optional[int] = None) -> None:
         super().__init__(parent)
         self._displayed_columns = displayed_columns
+        self._model = TaskModel(displayed_columns, self, page_size)
+        self._model.task_edited.connect(self.task_edited)
+        self._sorted_model = _TaskFilterModel(self)
+        self._sorted_model.setSourceModel(self._model)
+        self.setModel(self._sorted_model)
         self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        self.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.setSelectionMode(
+            QtWidgets.QAbstractItemView.ExtendedSelection)
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self._open_context_menu)
         self.setRootIsDecorated(False)
@@ -61,36 +74,92 @@ class TasksView(QtWidgets.QTreeView):
         self.header().setSectionsClickable(True)
         self.setSortingEnabled(True)
         self.setItemsExpandable(False)
+        # Rows are laid out without asking for the size of each one
+        self.setUniformRowHeights(True)
 
     def columns(self) -> Sequence[Column]:
         return self._displayed_columns
 
+    def set_tasks(self, tasks: Sequence[Task], today: date) -> None:
+        self._model.set_tasks(tasks, today)
+
+    def update_tasks(
+            self,
+            tasks: Sequence[Task],
+            changed_ids: AbstractSet[Optional[int]],
+            today: date) -> None:
+        self._model.update_tasks(tasks, changed_ids, today)
+
+    def filter_tasks(self, ids: Optional[AbstractSet[Optional[int]]]) -> None:
+        """Shows only tasks with the given ids or all tasks if ids is None"""
+        self._sorted_model.set_ids(ids)
+
+    def _selected_tasks(self, index: QtCore.QModelIndex) -> list[Task]:
+        """Tasks a context menu opened at index applies to"""
+        selection_model = self.selectionModel()
+        if not selection_model.isSelected(index):
+            return [index.data(TASK_ROLE)]
+        return [row.data(TASK_ROLE) for row in selection_model.selectedRows()]
+
     def _open_context_menu(self, point: QtCore.QPoint) -> None:
         actions: list[QtGui.QAction] = []
 
-        def add_action(name: str, signal: QtCore.Signal) -> None:
-            set_unimportant_task = QtGui.QAction(name)
-            set_unimportant_task.triggered.connect(lambda: signal.emit(task))
-            actions.append(set_unimportant_task)
+        def add_action(
+                name: str,
+                signal: QtCore.Signal,
+                tasks: list[Task],
+                *args: object) -> None:
+            if not tasks:
+                return
+            action = QtGui.QAction(name)
+            action.triggered.connect(lambda: signal.emit(tasks, *args))
+            actions.append(action)
 
         if (index := self.indexAt(point)).isValid():
-            task: Task = index.data(TASK_ROLE)
-            if task.importance == Importance.Important:
-                add_action("Make Unimportant", self.set_unimportant_requested)
-            else:
-                add_action("Make Important", self.set_important_requested)
+            tasks = self._selected_tasks(index)
+            add_action(
+                "Make Unimportant",
+                self.set_unimportant_requested,
+                [task for task in tasks
+                 if task.importance == Importance.Important])
+            add_action(
+                "Make Important",
+                self.set_important_requested,
+                [task for task in tasks
+                 if task.importance != Importance.Important])
             if Column.Due in self._displayed_columns:
-                if is_urgent(task):
-                    add_action("Remove Due", self.remove_due_requested)
-            if has_snoozed_date(
-                    task) and Column.Snoozed in self._displayed_columns:
-                add_action("Remove Snooze", self.remove_snooze_requested)
-            if is_completed(task):
-                if Column.Archived in self._displayed_columns:
-                    add_action("Unarchive", self.unarchive_task_requested)
-            else:
-                add_action("Complete", self.complete_task_requested)
-            add_action("Delete", self.delete_task_requested)
+                add_action(
+                    "Remove Due",
+                    self.remove_due_requested,
+                    [task for task in tasks if is_urgent(task)])
+            if Column.Snoozed in self._displayed_columns:
+                today = date.today()
+                open_tasks = [
+                    task for task in tasks if not is_completed(task)]
+                add_action(
+                    "Snooze for a Day",
+                    self.snooze_tasks_requested,
+                    open_tasks,
+                    today + timedelta(days=1))
+                add_action(
+                    "Snooze for a Week",
+                    self.snooze_tasks_requested,
+                    open_tasks,
+                    today + timedelta(weeks=1))
+                add_action(
+                    "Remove Snooze",
+                    self.remove_snooze_requested,
+                    [task for task in tasks if has_snoozed_date(task)])
+            if Column.Archived in self._displayed_columns:
+                add_action(
+                    "Unarchive",
+                    self.unarchive_tasks_requested,
+                    [task for task in tasks if is_completed(task)])
+            add_action(
+                "Complete",
+                self.complete_tasks_requested,
+                [task for task in tasks if not is_completed(task)])
+            add_action("Delete", self.delete_tasks_requested, tasks)
         context_menu = QtWidgets.QMenu(self)
         context_menu.exec(actions, self.viewport().mapToGlobal(point))
 
@@ -103,65 +172,256 @@ def _date_to_qdate(task_date: Optional[date]) -> QtCore.QDate:
     return QtCore.QDate(task_date.year, task_date.month, task_date.day)
 
 
-def _build_date_item(date_: Optional[date]) -> QtGui.QStandardItem:
-    qdate = _date_to_qdate(date_)
-    item = QtGui.QStandardItem()
-    item.setData(qdate, QtCore.Qt.DisplayRole)
-    return item
-
-
-def _build_due_date_item(date_: Optional[date]) -> QtGui.QStandardItem:
-    item = _build_date_item(date_)
-    if date_ is not None and date_ <= date.today():
-        font = item.font()
-        font.setBold(True)
-        item.setFont(font)
-    return item
-
-
-def _build_row(
-        task: Task,
-        columns: Sequence[Column]) -> Sequence[QtGui.QStandardItem]:
-    items = []
-    for column in columns:
-        if column == Column.Name:
-            item = QtGui.QStandardItem(task.name)
-        elif column == Column.Due:
-            item = _build_due_date_item(task.due)
-        elif column == Column.Snoozed:
-            item = _build_date_item(
-                task.snooze if has_snoozed_date(task) else None)
-        elif column == Column.Archived:
-            item = _build_date_item(task.completed)
-            item.setEditable(False)
-        else:
+def _row_ranges(rows: Sequence[int]) -> Iterator[tuple[int, int]]:
+    """Yields ranges of consecutive rows given in descending order"""
+    if not rows:
+        return
+    first = last = rows[0]
+    for row in rows[1:]:
+        if row != first - 1:
+            yield first, last
+            last = row
+        first = row
+    yield first, last
+
+
+class _TaskFilterModel(QtCore.QSortFilterProxyModel):
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self._ids: Optional[AbstractSet[Optional[int]]] = None
+
+    def set_ids(self, ids: Optional[AbstractSet[Optional[int]]]) -> None:
+        if ids == self._ids:
+            return
+        self._ids = ids
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(
+            self,
+            source_row: int,
+            source_parent: QtCore.QModelIndex) -> bool:
+        ids = self._ids
+        if ids is None:
+            return True
+        return self.sourceModel().task_at(source_row).id in ids
+
+
+class TaskModel(QtCore.QAbstractTableModel):
+    """Table of tasks updated by the difference to the previous tasks
+
+    Rows are matched by task id. Edits are not applied to the model but
+    requested through task_edited and arrive with the next set_tasks().
+    With a page_size, views fetch rows in pages of that size as they scroll,
+    and rows not fetched yet are updated without notifying views. Rows added
+    later are inserted on top and shown right away.
+    """
+    task_edited = QtCore.Signal(Task, object, object)
+
+    def __init__(
+            self,
+            columns: Sequence[Column],
+            parent: Optional[QtCore.QObject] = None,
+            page_size: Optional[int] = None) -> None:
+        super().__init__(parent)
+        self._columns = columns
+        self._flags = tuple(
+            _ITEM_FLAGS if column == Column.Archived
+            else _ITEM_FLAGS | QtCore.Qt.ItemIsEditable
+            for column in columns)
+        self._page_size = page_size
+        self._tasks: list[Task] = []
+        self._rows: dict[Optional[int], int] = {}
+        # Number of rows known to views, the first ones of _tasks
+        self._fetched = 0
+        self._today = date.today()
+        self._bold_font = QtGui.QFont()
+        self._bold_font.setBold(True)
+
+    @traced
+    def set_tasks(self, tasks: Sequence[Task], today: date) -> None:
+        new_tasks = {task.id: task for task in tasks}
+        if None in new_tasks or len(new_tasks) != len(tasks) \
+                or len(self._rows) != len(self._tasks) or not self._tasks:
+            self.beginResetModel()
+            self._tasks = list(tasks)
+            # Without unique ids rows cannot be matched to later tasks
+            self._rows = {} if None in new_tasks \
+                or len(new_tasks) != len(tasks) \
+                else dict(zip(new_tasks, range(len(tasks))))
+            self._today = today
+            self._fetched = len(tasks) if self._page_size is None \
+                else min(len(tasks), self._page_size)
+            self.endResetModel()
+            return
+        self._remove_rows(sorted(
+            (row for id_, row in self._rows.items() if id_ not in new_tasks),
+            reverse=True))
+        is_new_day = today != self._today
+        self._today = today
+        for row, task in enumerate(self._tasks):
+            new_task = new_tasks[task.id]
+            if new_task is not task:
+                self._tasks[row] = new_task
+                self._row_changed(row)
+        self._add_rows(
+            [task for task in tasks if task.id not in self._rows])
+        if is_new_day and self._fetched:
+            # Bold due dates and shown snoozes depend on the day
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(self._fetched - 1, len(self._columns) - 1))
+
+    @traced
+    def update_tasks(
+            self,
+            tasks: Sequence[Task],
+            changed_ids: AbstractSet[Optional[int]],
+            today: date) -> None:
+        """Shows tasks and removes other rows of tasks with changed_ids
+
+        Only touches the rows of changed tasks, unlike set_tasks() which
+        goes through all of them. If the day changed, tasks that show
+        differently on it must be passed as changed, see next_transition().
+        """
+        assert len(self._rows) == len(self._tasks), "Rows without ids"
+        self._today = today
+        shown_ids = {task.id for task in tasks}
+        rows = self._rows
+        self._remove_rows(sorted(
+            (rows[id_] for id_ in changed_ids
+             if id_ not in shown_ids and id_ in rows),
+            reverse=True))
+        new_tasks = []
+        for task in tasks:
+            row = rows.get(task.id)
+            if row is None:
+                new_tasks.append(task)
+            elif self._tasks[row] is not task:
+                self._tasks[row] = task
+                self._row_changed(row)
+        self._add_rows(new_tasks)
+
+    def task_at(self, row: int) -> Task:
+        return self._tasks[row]
+
+    def rowCount(
+            self,
+            parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._fetched
+
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        return not parent.isValid() and self._fetched < len(self._tasks)
+
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        if parent.isValid():
+            return
+        count = len(self._tasks) - self._fetched
+        if self._page_size is not None:
+            count = min(count, self._page_size)
+        if count <= 0:
+            return
+        self.beginInsertRows(
+            QtCore.QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    def columnCount(
+            self,
+            parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._columns)
+
+    def headerData(
+            self,
+            section: int,
+            orientation: QtCore.Qt.Orientation,
+            role: int = QtCore.Qt.DisplayRole) -> object:
+        if orientation == QtCore.Qt.Horizontal \
+                and role == QtCore.Qt.DisplayRole:
+            return self._columns[section].name
+        return None
+
+    def flags(self, index: QtCore.QModelIndex) -> QtCore.Qt.ItemFlags:
+        if not index.isValid():
+            return super().flags(index)
+        # Asked for every row on each layout of the view
+        return self._flags[index.column()]
+
+    def data(
+            self,
+            index: QtCore.QModelIndex,
+            role: int = QtCore.Qt.DisplayRole) -> object:
+        task = self._tasks[index.row()]
+        if role == TASK_ROLE:
+            return task
+        column = self._columns[index.column()]
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            if column == Column.Name:
+                return task.name
+            if column == Column.Due:
+                return _date_to_qdate(task.due)
+            if column == Column.Snoozed:
+                return _date_to_qdate(
+                    task.snooze if has_snoozed_date(task, self._today)
+                    else None)
+            if column == Column.Archived:
+                return _date_to_qdate(task.completed)
             raise RuntimeError("Unhandled column")
-        item.setData(task, role=TASK_ROLE)
-        items.append(item)
-    return items
-
-
-def _set_rows(
-        model: QtGui.QStandardItemModel,
-        columns: Sequence[Column],
-        tasks: Iterable[Task]) -> None:
-    root_item = model.invisibleRootItem()
-    for task in tasks:
-        row = _build_row(task, columns)
-        root_item.appendRow(row)
-
-
-def _set_header(
-        model: QtGui.QStandardItemModel,
-        columns: Sequence[Column]) -> None:
-    header_labels = list([column.name for column in columns])
-    model.setHorizontalHeaderLabels(header_labels)
-
-
-def build_tree_view_model(
-        columns: Sequence[Column],
-        tasks: Iterable[Task]) -> QtGui.QStandardItemModel:
-    model = QtGui.QStandardItemModel()
-    _set_header(model, columns)
-    _set_rows(model, columns, tasks)
-    return model
+        if role == QtCore.Qt.FontRole and column == Column.Due:
+            if task.due is not None and task.due <= self._today:
+                return self._bold_font
+        return None
+
+    def setData(
+            self,
+            index: QtCore.QModelIndex,
+            value: object,
+            role: int = QtCore.Qt.EditRole) -> bool:
+        if role != QtCore.Qt.EditRole:
+            return False
+        self.task_edited.emit(
+            self._tasks[index.row()], self._columns[index.column()], value)
+        return True
+
+    def _remove_rows(self, rows: Sequence[int]) -> None:
+        """Removes rows given in descending order"""
+        if not rows:
+            return
+        for first, last in _row_ranges(rows):
+            fetched_last = min(last, self._fetched - 1)
+            is_fetched = first <= fetched_last
+            if is_fetched:
+                self.beginRemoveRows(QtCore.QModelIndex(), first, fetched_last)
+            for task in self._tasks[first:last + 1]:
+                del self._rows[task.id]
+            del self._tasks[first:last + 1]
+            if is_fetched:
+                self._fetched -= fetched_last - first + 1
+                self.endRemoveRows()
+        # Only rows after the first removed one have moved
+        for row in range(rows[-1], len(self._tasks)):
+            self._rows[self._tasks[row].id] = row
+
+    def _add_rows(self, tasks: Sequence[Task]) -> None:
+        if not tasks:
+            return
+        if self._page_size is None:
+            first = len(self._tasks)
+            self.beginInsertRows(
+                QtCore.QModelIndex(), first, first + len(tasks) - 1)
+            self._tasks.extend(tasks)
+            for row, task in enumerate(tasks, first):
+                self._rows[task.id] = row
+        else:
+            # Paged tasks are given newest first, e.g. the archive, so new
+            # ones go on top where they are shown without fetching all pages
+            self.beginInsertRows(QtCore.QModelIndex(), 0, len(tasks) - 1)
+            self._tasks[:0] = tasks
+            for row, task in enumerate(self._tasks):
+                self._rows[task.id] = row
+        self._fetched += len(tasks)
+        self.endInsertRows()
+
+    def _row_changed(self, row: int) -> None:
+        if row < self._fetched:
+            self.dataChanged.emit(
+                self.index(row, 0), self.index(row, len(self._columns) - 1))
@@ -0,0 +1,128 @@
+from array import array
+from datetime import date, timedelta
+from itertools import compress
+from operator import and_, not_
+from typing import Any, NamedTuple, Optional, Sequence
+
+from task import Task, Importance
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+_URGENCY = timedelta(days=14)
+# Dates are stored as ordinals. Missing dates use values that never pass
+# the comparisons below, so no separate "is set" columns are needed.
+_NO_DUE = 2 ** 31 - 1
+_NO_SNOOZE = 0
+_NO_COMPLETED = 0
+
+
+class Classification(NamedTuple):
+    """Positions of tasks in a TaskTable
+
+    The quadrants hold all tasks not completed, snoozed ones included.
+    """
+    do: Sequence[int]
+    decide: Sequence[int]
+    delegate: Sequence[int]
+    drop: Sequence[int]
+    snoozed: Sequence[int]
+    completed: Sequence[int]
+
+
+def _ordinal(date_: Optional[date], missing: int) -> int:
+    return missing if date_ is None else date_.toordinal()
+
+
+class TaskTable:
+    """Tasks stored column by column for classifying all of them at once
+
+    Uses NumPy if it is installed and arrays of the standard library
+    otherwise.
+    """
+
+    def __init__(
+            self,
+            tasks: Sequence[Task],
+            use_numpy: bool = numpy is not None) -> None:
+        if use_numpy and numpy is None:
+            raise RuntimeError("NumPy is not installed")
+        self._tasks = tasks
+        self._use_numpy = use_numpy
+        due = array("i", (_ordinal(task.due, _NO_DUE) for task in tasks))
+        snooze = array(
+            "i", (_ordinal(task.snooze, _NO_SNOOZE) for task in tasks))
+        completed = array(
+            "i", (_ordinal(task.completed, _NO_COMPLETED) for task in tasks))
+        important = array("b", (
+            task.importance == Importance.Important for task in tasks))
+        if use_numpy:
+            self._due: Any = numpy.frombuffer(due, numpy.int32)
+            self._snooze: Any = numpy.frombuffer(snooze, numpy.int32)
+            self._completed: Any = numpy.frombuffer(completed, numpy.int32)
+            self._important: Any = numpy.frombuffer(important, numpy.bool_)
+        else:
+            self._due = due
+            self._snooze = snooze
+            self._completed = completed
+            self._important = important
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def tasks_at(self, positions: Sequence[int]) -> list[Task]:
+        tasks = self._tasks
+        return [tasks[i] for i in positions]
+
+    def classify(self, today: Optional[date] = None) -> Classification:
+        if today is None:
+            today = date.today()
+        urgency_limit = (today + _URGENCY).toordinal()
+        if self._use_numpy:
+            return self._classify_with_numpy(today.toordinal(), urgency_limit)
+        return self._classify_with_arrays(today.toordinal(), urgency_limit)
+
+    def _classify_with_numpy(
+            self,
+            today: int,
+            urgency_limit: int) -> Classification:
+        is_open = self._completed == _NO_COMPLETED
+        is_urgent = self._due < urgency_limit
+        is_important = self._important
+        is_unimportant = ~is_important
+        is_not_urgent = ~is_urgent
+        return Classification(
+            numpy.flatnonzero(is_open & is_important & is_urgent),
+            numpy.flatnonzero(is_open & is_important & is_not_urgent),
+            numpy.flatnonzero(is_open & is_unimportant & is_urgent),
+            numpy.flatnonzero(is_open & is_unimportant & is_not_urgent),
+            numpy.flatnonzero(is_open & (self._snooze > today)),
+            numpy.flatnonzero(~is_open))
+
+    def _classify_with_arrays(
+            self,
+            today: int,
+            urgency_limit: int) -> Classification:
+        positions = range(len(self))
+
+        def select(mask: Sequence[bool]) -> array:
+            return array("q", compress(positions, mask))
+
+        def both(first: Sequence[bool], second: Sequence[bool]) -> list:
+            return list(map(and_, first, second))
+
+        is_completed = list(map(bool, self._completed))
+        is_open = list(map(not_, is_completed))
+        is_urgent = list(map(urgency_limit.__gt__, self._due))
+        is_not_urgent = list(map(not_, is_urgent))
+        is_important = both(is_open, self._important)
+        is_unimportant = both(is_open, map(not_, self._important))
+        return Classification(
+            select(both(is_important, is_urgent)),
+            select(both(is_important, is_not_urgent)),
+            select(both(is_unimportant, is_urgent)),
+            select(both(is_unimportant, is_not_urgent)),
+            select(both(is_open, map(today.__lt__, self._snooze))),
+            select(is_completed))
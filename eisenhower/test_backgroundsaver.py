@@ -0,0 +1,117 @@
+from threading import Event
+from typing import Sequence
+
+import pytest
+
+from backgroundsaver import BackgroundSaver
+from task import Task
+from taskdiff import ChangeSet
+
+
+class BlockingSerializer:
+    def __init__(self) -> None:
+        self.saves: list[list[Task]] = []
+        self.started = Event()
+        self.release = Event()
+
+    def save(self, tasks: Sequence[Task]) -> None:
+        self.started.set()
+        self.release.wait()
+        self.saves.append(list(tasks))
+
+
+def test_flush_waits_for_save() -> None:
+    serializer = BlockingSerializer()
+    serializer.release.set()
+    saver = BackgroundSaver(serializer)
+    saver.save([Task("plm")])
+    saver.flush()
+    assert serializer.saves == [[Task("plm")]]
+    saver.close()
+
+
+def test_saves_are_coalesced() -> None:
+    serializer = BlockingSerializer()
+    saver = BackgroundSaver(serializer)
+    saver.save([Task("okn")])
+    serializer.started.wait()
+    saver.save([Task("ijb")])
+    saver.save([Task("uhv")])
+    serializer.release.set()
+    saver.flush()
+    assert serializer.saves == [[Task("okn")], [Task("uhv")]]
+    saver.close()
+
+
+def test_save_takes_snapshot() -> None:
+    serializer = BlockingSerializer()
+    saver = BackgroundSaver(serializer)
+    tasks = [Task("ygc")]
+    saver.save(tasks)
+    tasks.append(Task("tfx"))
+    serializer.release.set()
+    saver.close()
+    assert serializer.saves == [[Task("ygc")]]
+
+
+def test_close_saves_pending_tasks() -> None:
+    serializer = BlockingSerializer()
+    serializer.release.set()
+    saver = BackgroundSaver(serializer)
+    saver.save([Task("rdz")])
+    saver.close()
+    assert serializer.saves[-1] == [Task("rdz")]
+
+
+class FailingSerializer:
+    def save(self, _: Sequence[Task]) -> None:
+        raise OSError
+
+
+def test_flush_raises_save_error() -> None:
+    saver = BackgroundSaver(FailingSerializer())
+    saver.save([Task("esx")])
+    with pytest.raises(OSError):
+        saver.flush()
+    saver.close()
+
+
+class ChangeSavingSerializer(BlockingSerializer):
+    def __init__(self) -> None:
+        super().__init__()
+        self.saved_changes: list[ChangeSet] = []
+
+    def save_changes(self, changes: ChangeSet) -> None:
+        self.started.set()
+        self.release.wait()
+        self.saved_changes.append(changes)
+
+
+def test_pending_changes_are_combined() -> None:
+    serializer = ChangeSavingSerializer()
+    saver = BackgroundSaver(serializer)
+    first = Task("rty", id=1)
+    saver.save_changes(ChangeSet([first], [], []))
+    serializer.started.wait()
+    second = Task("fgh", id=2)
+    saver.save_changes(ChangeSet([second], [], []))
+    saver.save_changes(ChangeSet([], [second], [(first, Task("vbn", id=1))]))
+    serializer.release.set()
+    saver.flush()
+    assert serializer.saved_changes == [
+        ChangeSet([first], [], []),
+        ChangeSet([], [], [(first, Task("vbn"))])]
+    saver.close()
+
+
+def test_on_saved_is_called_after_each_save() -> None:
+    serializer = BlockingSerializer()
+    serializer.release.set()
+    saved_counts: list[int] = []
+    saver = BackgroundSaver(
+        serializer, lambda: saved_counts.append(len(serializer.saves)))
+    saver.save([Task("rdx")])
+    saver.flush()
+    saver.save([Task("tfc")])
+    saver.close()
+    assert saved_counts == [1, 2]
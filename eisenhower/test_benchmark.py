@@ -0,0 +1,33 @@
+import json
+from datetime import date
+
+from benchmark import BENCHMARKS, generate_tasks, main
+from task import is_completed
+
+
+def test_generate_tasks() -> None:
+    tasks = generate_tasks(1000, date(2021, 3, 4))
+    assert tasks == generate_tasks(1000, date(2021, 3, 4))
+    assert len({task.id for task in tasks}) == 1000
+    completed = sum(map(is_completed, tasks))
+    assert 600 < completed < 800
+    assert all(task.completed <= date(2021, 3, 4)
+               for task in tasks if task.completed is not None)
+
+
+def test_benchmarks_write_json(tmp_path) -> None:
+    output = tmp_path / "results.json"
+    main(["--sizes", "200", "--repeat", "1", "--output", str(output)])
+    results = json.loads(output.read_text())["results"]
+    assert [result["name"] for result in results] \
+        == [name for name, _, _ in BENCHMARKS]
+    assert all(result["size"] == 200 for result in results)
+    assert all(0 <= result["best"] <= result["mean"] for result in results)
+
+
+def test_compact_tasks_take_less_memory(tmp_path) -> None:
+    output = tmp_path / "memory.json"
+    main(["--memory", "--sizes", "2000", "--output", str(output)])
+    result, = json.loads(output.read_text())["results"]
+    assert result["size"] == 2000
+    assert 0 < result["compact_task_bytes"] < result["task_bytes"]
@@ -0,0 +1,64 @@
+from datetime import date
+
+import pytest
+
+from binaryserializer import (
+    BinarySerializer, BinaryTasks, json_to_binary, binary_to_json)
+from jsonserializer import JsonSerializer
+from task import Task, Importance
+
+
+def test_save_and_load(tmp_path) -> None:
+    tasks = [
+        Task("vgz", Importance.Important, date(1, 2, 3), id=4),
+        Task("äöü", due=date(9999, 12, 31), snooze=date(2020, 2, 29)),
+        Task("vgz", id=9)]
+    serializer = BinarySerializer(tmp_path / "tasks.bin")
+    serializer.save(tasks)
+    loaded = serializer.load()
+    assert loaded == tasks
+    assert [task.id for task in loaded] == [4, None, 9]
+
+
+def test_load_when_file_not_exists(tmp_path) -> None:
+    assert BinarySerializer(tmp_path / "tasks.bin").load() == []
+
+
+def test_save_and_load_without_tasks(tmp_path) -> None:
+    serializer = BinarySerializer(tmp_path / "tasks.bin")
+    serializer.save([])
+    assert serializer.load() == []
+
+
+def test_binary_tasks_decodes_single_tasks(tmp_path) -> None:
+    path = tmp_path / "tasks.bin"
+    BinarySerializer(path).save([Task(str(i)) for i in range(20)])
+    with BinaryTasks(path) as tasks:
+        assert len(tasks) == 20
+        assert tasks[13] == Task("13")
+        assert tasks[-1] == Task("19")
+        assert tasks[2:4] == [Task("2"), Task("3")]
+
+
+def test_load_other_file_throws(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save([Task("hzt")])
+    with pytest.raises(ValueError):
+        BinarySerializer(path).load()
+
+
+def test_convert_to_binary_and_back(tmp_path) -> None:
+    tasks = [Task("lkj", due=date(2001, 3, 4)), Task("mnb", id=3)]
+    JsonSerializer(tmp_path / "a.json").save(tasks)
+    json_to_binary(tmp_path / "a.json", tmp_path / "tasks.bin")
+    binary_to_json(tmp_path / "tasks.bin", tmp_path / "b.json")
+    assert JsonSerializer(tmp_path / "b.json").load() == tasks
+
+
+def test_iter_load_decodes_tasks_as_they_are_taken(tmp_path) -> None:
+    path = tmp_path / "tasks.bin"
+    BinarySerializer(path).save([Task("a"), Task("b"), Task("c")])
+    tasks = BinarySerializer(path).iter_load()
+    assert next(tasks) == Task("a")
+    assert list(tasks) == [Task("b"), Task("c")]
+    assert list(BinarySerializer(tmp_path / "other.bin").iter_load()) == []
@@ -0,0 +1,80 @@
+import pickle
+from dataclasses import FrozenInstanceError, asdict, replace
+from datetime import date
+
+import pytest
+
+from binaryserializer import BinarySerializer
+from compacttask import CompactTask, to_compact_task
+from jsonserializer import JsonSerializer
+from task import Task, Importance
+from taskmanager import TaskManager
+
+
+def test_compact_task_has_the_values_of_the_task() -> None:
+    task = Task(
+        "lynx", Importance.Important, date(2021, 1, 2), date(1, 1, 1),
+        date(9999, 12, 31), 123456789)
+    compact_task = to_compact_task(task)
+    assert compact_task.name == "lynx"
+    assert compact_task.importance == Importance.Important
+    assert compact_task.completed == date(2021, 1, 2)
+    assert compact_task.due == date(1, 1, 1)
+    assert compact_task.snooze == date(9999, 12, 31)
+    assert compact_task.id == 123456789
+    assert asdict(compact_task) == asdict(task)
+    empty = CompactTask()
+    assert (empty.name, empty.completed, empty.due, empty.snooze, empty.id) \
+        == ("Task", None, None, None, None)
+    assert CompactTask(id=0).id == 0
+
+
+def test_compact_task_equals_task_of_same_value() -> None:
+    task = Task("puma", due=date(2021, 5, 6), id=1)
+    compact_task = to_compact_task(task)
+    assert compact_task == task and task == compact_task
+    assert compact_task == CompactTask("puma", due=date(2021, 5, 6), id=2)
+    assert compact_task != CompactTask("puma", due=date(2021, 5, 7))
+    assert hash(compact_task) == hash(task)
+    assert len({task, compact_task}) == 1
+    assert compact_task in [Task("wolf"), task]
+
+
+def test_compact_task_is_frozen_but_replaceable() -> None:
+    compact_task = CompactTask("orca", snooze=date(2021, 2, 3), id=4)
+    with pytest.raises(FrozenInstanceError):
+        compact_task.name = "seal"
+    assert not hasattr(compact_task, "__dict__")
+    renamed = replace(compact_task, name="seal")
+    assert isinstance(renamed, CompactTask)
+    assert renamed == Task("seal", snooze=date(2021, 2, 3))
+    assert renamed.id == 4
+    assert replace(compact_task, id=None).id is None
+
+
+def test_compact_task_is_picklable_and_interns_names() -> None:
+    compact_task = CompactTask("".join(["ot", "ter"]), id=5)
+    assert compact_task.name is CompactTask("otter").name
+    unpickled = pickle.loads(pickle.dumps(compact_task))
+    assert unpickled == compact_task and unpickled.id == 5
+
+
+def test_serializers_load_compact_tasks_for_task_manager(tmp_path) -> None:
+    tasks = [Task("ibex", due=date(2021, 3, 4), id=1), Task("oryx", id=2)]
+    for serializer_type in (JsonSerializer, BinarySerializer):
+        path = tmp_path / f"tasks.{serializer_type.__name__}"
+        serializer_type(path).save(tasks)
+        serializer = serializer_type(path, task_type=CompactTask)
+        loaded = serializer.load()
+        assert all(isinstance(task, CompactTask) for task in loaded)
+        assert loaded == tasks
+        manager = TaskManager(loaded)
+        manager.rename(Task("ibex", due=date(2021, 3, 4), id=1), "eland")
+        manager.remove_due(Task("eland", due=date(2021, 3, 4), id=1))
+        manager.add(Task("kudu"))
+        manager.undo()
+        assert manager.tasks() == [Task("eland", id=1), Task("oryx", id=2)]
+        assert isinstance(manager.tasks()[0], CompactTask)
+        serializer.save(manager.tasks())
+        assert serializer_type(path).load() \
+            == [Task("eland", id=1), Task("oryx", id=2)]
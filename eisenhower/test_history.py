@@ -60,3 +60,102 @@ def test_advance_history_deletes_old_future() -> None:
     history.advance_history()[0] = Task("jgio")
     history.go_back_in_time()
     assert history.advance_history() == [Task("cmap")]
+
+
+def test_go_back_in_time_reverts_every_change_of_a_step() -> None:
+    history = History([Task("a"), Task("b"), Task("c")])
+    tasks = history.advance_history()
+    tasks.remove(Task("a"))
+    tasks.append(Task("d"))
+    tasks[0] = Task("e")
+    tasks.insert(1, Task("f"))
+    assert history.present() == [Task("e"), Task("f"), Task("c"), Task("d")]
+    assert history.go_back_in_time() == [Task("a"), Task("b"), Task("c")]
+    assert history.go_forward_in_time() \
+        == [Task("e"), Task("f"), Task("c"), Task("d")]
+
+
+def test_go_back_in_time_over_several_steps() -> None:
+    history = History([])
+    history.advance_history().append(Task("uzt"))
+    history.advance_history().append(Task("rew"))
+    history.advance_history().pop(0)
+    assert history.present() == [Task("rew")]
+    assert history.go_back_in_time() == [Task("uzt"), Task("rew")]
+    assert history.go_back_in_time() == [Task("uzt")]
+    assert history.go_back_in_time() == []
+    assert history.go_forward_in_time() == [Task("uzt")]
+
+
+def test_unrecordable_edit_throws() -> None:
+    history = History([Task("xyu")])
+    with pytest.raises(HistoryError):
+        history.advance_history().sort()
+
+
+def test_depth() -> None:
+    history = History([])
+    assert history.depth() == 0
+    history.advance_history().append(Task("lki"))
+    history.advance_history().append(Task("nbv"))
+    history.go_back_in_time()
+    assert history.depth() == 2
+
+
+def test_max_steps_evicts_oldest_steps() -> None:
+    history = History([], max_steps=2)
+    for name in ("a", "b", "c"):
+        history.advance_history().append(Task(name))
+    assert history.depth() == 2
+    history.go_back_in_time()
+    assert history.go_back_in_time() == [Task("a")]
+    assert not history.has_past()
+
+
+def test_max_steps_has_to_be_positive() -> None:
+    with pytest.raises(ValueError):
+        History([], max_steps=0)
+
+
+def test_memory_footprint_grows_with_recorded_changes() -> None:
+    history = History([])
+    assert history.memory_footprint() == 0
+    history.advance_history().append(Task("poi"))
+    one_step = history.memory_footprint()
+    assert one_step > 0
+    history.advance_history().append(Task("zui"))
+    assert history.memory_footprint() > one_step
+
+
+def test_max_bytes_evicts_oldest_steps() -> None:
+    history = History([])
+    history.advance_history().append(Task("qay"))
+    step_size = history.memory_footprint()
+    history = History([], max_bytes=step_size)
+    for name in ("a", "b", "c"):
+        history.advance_history().append(Task(name))
+    assert history.depth() == 2
+    assert history.memory_footprint() <= 2 * step_size
+
+
+def test_record_undo_keeps_future_and_is_redone() -> None:
+    history = History([Task("wsx")])
+    history.advance_history()[0] = Task("edc")
+    history.go_back_in_time()
+    changes = history.record_undo(lambda tasks: tasks.append(Task("rfv")))
+    assert [change.new for change in changes] == [Task("rfv")]
+    assert history.present() == [Task("wsx"), Task("rfv")]
+    assert history.go_forward_in_time() == [Task("wsx")]
+    assert history.go_forward_in_time() == [Task("edc")]
+    assert history.go_back_in_time() == [Task("wsx")]
+    assert history.go_back_in_time() == [Task("wsx"), Task("rfv")]
+
+
+def test_record_redo_keeps_future_and_is_undone() -> None:
+    history = History([Task("tgb")])
+    history.advance_history()[0] = Task("yhn")
+    history.go_back_in_time()
+    history.record_redo(lambda tasks: tasks.pop())
+    assert history.present() == []
+    assert history.has_future()
+    assert history.go_back_in_time() == [Task("tgb")]
@@ -0,0 +1,119 @@
+import io
+
+from historyfile import HistoryFile, _reversed_lines, history_path
+from task import Task
+from taskdiff import ChangeSet
+import pytest
+
+
+def _renamed(old: str, new: str) -> ChangeSet:
+    return ChangeSet([], [], [(Task(old, id=1), Task(new, id=1))])
+
+
+def test_load_when_file_not_exists(tmp_path) -> None:
+    history_file = HistoryFile(tmp_path / "tasks.json")
+    assert not history_file.has_undoable_steps()
+    assert history_file.load() == ([], [])
+
+
+def test_load_replays_steps_undos_and_redos(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    history_file = HistoryFile(path)
+    history_file.record_step(ChangeSet([Task("qwe", id=1)], [], []))
+    history_file.record_step(_renamed("qwe", "asd"))
+    history_file.record_step(_renamed("asd", "zxc"))
+    history_file.record_undo()
+    history_file.record_undo()
+    history_file.record_redo()
+    assert not history_file.has_undoable_steps()
+    reopened = HistoryFile(path)
+    assert reopened.has_undoable_steps()
+    past, future = reopened.load()
+    assert past == [
+        ChangeSet([Task("qwe", id=1)], [], []), _renamed("qwe", "asd")]
+    assert past[1].replaced[0][1].id == 1
+    assert future == [_renamed("asd", "zxc")]
+
+
+def test_reversed_lines_across_chunks() -> None:
+    file = io.BytesIO(b"first\nsecond line\n\nthird\n")
+    assert list(_reversed_lines(file, chunk_size=4)) \
+        == [b"", b"third", b"", b"second line", b"first"]
+
+
+def test_has_undoable_steps_replays_file_backwards(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    history_file = HistoryFile(path)
+    history_file.record_step(_renamed("a", "b"))
+    history_file.record_step(_renamed("b", "c"))
+    history_file.record_undo()
+    assert HistoryFile(path).has_undoable_steps()
+    history_file.record_undo()
+    assert not HistoryFile(path).has_undoable_steps()
+    history_file.record_redo()
+    assert HistoryFile(path).has_undoable_steps()
+    history_file.forget_future()
+    history_file.close()
+    assert HistoryFile(path).has_undoable_steps()
+    history_file.forget_past()
+    assert not HistoryFile(path).has_undoable_steps()
+    history_file.record_step(_renamed("b", "c"))
+    with open(history_path(path), "a") as file:
+        file.write('{"move":"undo"}')
+    assert HistoryFile(path).has_undoable_steps()
+
+
+def test_step_clears_future(tmp_path) -> None:
+    history_file = HistoryFile(tmp_path / "tasks.json")
+    history_file.record_step(_renamed("qwe", "asd"))
+    history_file.record_undo()
+    history_file.record_step(_renamed("qwe", "wer"))
+    assert history_file.load() == ([_renamed("qwe", "wer")], [])
+
+
+def test_forget_drops_steps(tmp_path) -> None:
+    history_file = HistoryFile(tmp_path / "tasks.json")
+    history_file.record_step(_renamed("qwe", "asd"))
+    history_file.record_step(_renamed("asd", "zxc"))
+    history_file.record_undo()
+    history_file.forget_past()
+    assert history_file.load() == ([], [_renamed("asd", "zxc")])
+    history_file.forget_future()
+    assert history_file.load() == ([], [])
+
+
+def test_load_keeps_max_steps_and_compacts(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    history_file = HistoryFile(path, max_steps=2)
+    for old, new in [("a", "b"), ("b", "c"), ("c", "d"), ("d", "e")]:
+        history_file.record_step(_renamed(old, new))
+    history_file.record_undo()
+    history_file.record_redo()
+    history_file.record_undo()
+    expected = ([_renamed("b", "c"), _renamed("c", "d")], [_renamed("d", "e")])
+    assert history_file.load() == expected
+    assert len(history_path(path).read_text().splitlines()) == 4
+    assert HistoryFile(path, max_steps=2).load() == expected
+
+
+def test_close_compacts_appended_file(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    history_file = HistoryFile(path)
+    history_file.record_step(_renamed("a", "b"))
+    history_file.record_undo()
+    history_file.close()
+    assert len(history_path(path).read_text().splitlines()) == 2
+
+
+def test_load_stops_at_interrupted_record(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    history_file = HistoryFile(path)
+    history_file.record_step(_renamed("a", "b"))
+    with open(history_path(path), "a") as file:
+        file.write('{"step": {"added": [')
+    assert history_file.load() == ([_renamed("a", "b")], [])
+
+
+def test_max_steps_has_to_be_positive(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        HistoryFile(tmp_path / "tasks.json", max_steps=0)
@@ -0,0 +1,105 @@
+from datetime import date
+
+import pytest
+
+from jsonserializer import JsonSerializer
+from journalserializer import JournalSerializer
+from task import Task
+from taskdiff import ChangeSet
+
+
+def test_load_when_files_not_exist(tmp_path) -> None:
+    serializer = JournalSerializer(tmp_path / "tasks.json")
+    assert serializer.load() == []
+
+
+def test_save_appends_changes_to_journal(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path)
+    serializer.load()
+    first = Task("vfr", id=1)
+    second = Task("bgt", id=2)
+    serializer.save([first, second])
+    serializer.save([Task("nhz", due=date(3, 4, 5), id=1)])
+    journal = (tmp_path / "tasks.json.journal").read_text().splitlines()
+    assert len(journal) == 2
+    assert JournalSerializer(path).load() \
+        == [Task("nhz", due=date(3, 4, 5), id=1)]
+
+
+def test_save_without_changes_writes_nothing(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path)
+    tasks = [Task("mju", id=1)]
+    serializer.save(tasks)
+    serializer.save(tasks)
+    assert len((tmp_path / "tasks.json.journal").read_text().splitlines()) \
+        == 1
+
+
+def test_load_json_file_without_ids_writes_checkpoint(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save([Task("cde"), Task("vgz")])
+    serializer = JournalSerializer(path)
+    assert serializer.load() == [Task("cde"), Task("vgz")]
+    serializer.save([Task("cde", id=1), Task("xsw", id=2)])
+    assert not (tmp_path / "tasks.json.journal").exists()
+    assert JsonSerializer(path).load() == [Task("cde"), Task("xsw")]
+
+
+def test_compaction(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path, compaction_threshold=3)
+    serializer.load()
+    tasks = []
+    for i in range(1, 6):
+        tasks = tasks + [Task(str(i), id=i)]
+        serializer.save(tasks)
+        serializer.wait_for_compaction()
+    journal = (tmp_path / "tasks.json.journal").read_text().splitlines()
+    assert len(journal) == 2
+    assert len(JsonSerializer(path).load()) == 3
+    assert JournalSerializer(path).load() == tasks
+
+
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_failed_compaction_is_retried(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path, compaction_threshold=2)
+    serializer.load()
+    # Makes writing the checkpoint fail
+    (tmp_path / "tasks.json.tmp").mkdir()
+    tasks = [Task("1", id=1)]
+    serializer.save(tasks)
+    tasks = tasks + [Task("2", id=2)]
+    serializer.save(tasks)
+    serializer.wait_for_compaction()
+    assert not path.exists()
+    (tmp_path / "tasks.json.tmp").rmdir()
+    tasks = tasks + [Task("3", id=3)]
+    serializer.save(tasks)
+    serializer.wait_for_compaction()
+    assert (tmp_path / "tasks.json.journal").read_text() == ""
+    assert JsonSerializer(path).load() == tasks
+    assert JournalSerializer(path).load() == tasks
+
+
+def test_load_ignores_interrupted_record(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path)
+    serializer.save([Task("lop", id=1)])
+    with open(tmp_path / "tasks.json.journal", "a") as file:
+        file.write('{"put": [{"na')
+    assert JournalSerializer(path).load() == [Task("lop")]
+
+
+def test_save_changes(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    serializer = JournalSerializer(path)
+    first = Task("okm", id=1)
+    second = Task("ijn", id=2)
+    serializer.save([first, second])
+    serializer.save_changes(
+        ChangeSet([Task("uhb", id=3)], [second], [(first, Task("ygv", id=1))]))
+    assert JournalSerializer(path).load() == [Task("ygv"), Task("uhb")]
@@ -1,7 +1,10 @@
+from datetime import date
 from io import StringIO
 from pathlib import Path
 from typing import IO, Type
 
+import pytest
+
 from jsonserializer import JsonSerializer
 from task import Task
 
@@ -69,3 +72,32 @@ class FileNotFoundMockOpen:
 def test_load_when_file_not_exists() -> None:
     serializer = JsonSerializer(Path("path"), FileNotFoundMockOpen)
     assert serializer.load() == []
+
+
+def test_iter_load_across_chunks() -> None:
+    tasks = [Task(f"task{i}", due=date(2000, 1, 1 + i % 28))
+             for i in range(5000)]
+    file, mock_open = build_mock_open()
+    JsonSerializer(Path("path"), mock_open).save(tasks)
+    file, mock_open = build_mock_open(file.getvalue())
+    assert list(JsonSerializer(Path("path"), mock_open).iter_load()) == tasks
+
+
+def test_load_shares_equal_dates() -> None:
+    file, mock_open = build_mock_open()
+    JsonSerializer(Path("path"), mock_open).save(
+        [Task("a", due=date(2003, 4, 5)), Task("b", snooze=date(2003, 4, 5))])
+    file, mock_open = build_mock_open(file.getvalue())
+    first, second = JsonSerializer(Path("path"), mock_open).load()
+    assert first.due is second.snooze
+
+
+def test_load_empty_array() -> None:
+    file, mock_open = build_mock_open(" [ ] ")
+    assert JsonSerializer(Path("path"), mock_open).load() == []
+
+
+def test_load_invalid_file_throws() -> None:
+    file, mock_open = build_mock_open('[{"name": "a"')
+    with pytest.raises(ValueError):
+        JsonSerializer(Path("path"), mock_open).load()
@@ -1,9 +1,15 @@
+import pickle
 from datetime import date
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import Iterator, Optional, Sequence
 
+from binaryserializer import BinarySerializer
+from jsonserializer import JsonSerializer
+from pickleserializer import PickleSerializer
+from sqliteserializer import SqliteSerializer
 from mainpresenter import MainPresenter
 from task import Task, Importance
+from taskdiff import ChangeSet
 
 
 class MockView:
@@ -30,6 +36,17 @@ class MockView:
         self.redoable = redoable
 
 
+class ChangeView(MockView):
+    """Records the changes edits are shown by"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.applied_changes: list[ChangeSet] = []
+
+    def apply_changes(self, changes: ChangeSet) -> None:
+        self.applied_changes.append(changes)
+
+
 class MockSerializerWrapper:
     def __init__(self, tasks: list[Task]) -> None:
         self.path: Optional[Path] = None
@@ -183,3 +200,263 @@ def test_redo() -> None:
     assert serializer_wrapper.tasks == [Task("new"), Task("adaptive")]
     assert view.undoable
     assert not view.redoable
+
+
+def test_save_in_background() -> None:
+    view = MockView()
+    serializer_wrapper = MockSerializerWrapper([Task("crane")])
+    presenter = MainPresenter(
+        view, serializer_wrapper.serializer, save_in_background=True)
+    presenter.load_from_file(Path())
+    presenter.add_task(Task("heron"))
+    presenter.flush()
+    assert serializer_wrapper.tasks == [Task("crane"), Task("heron")]
+    presenter.add_task(Task("stork"))
+    presenter.close()
+    assert serializer_wrapper.tasks \
+        == [Task("crane"), Task("heron"), Task("stork")]
+
+
+def test_load_from_file_shows_preview_of_streamed_tasks() -> None:
+    view = MockView()
+    tasks = [Task(str(i)) for i in range(1000)]
+
+    class StreamingSerializer:
+        def __init__(self, _: Path) -> None:
+            pass
+
+        def iter_load(self) -> Iterator[Task]:
+            yield from tasks
+
+    presenter = MainPresenter(view, StreamingSerializer)
+    presenter.load_from_file(Path())
+    assert len(view.update_tasks_calls) == 2
+    preview = view.update_tasks_calls[0]
+    assert preview == tasks[:len(preview)]
+    assert view.update_tasks_calls[-1] == tasks
+
+
+def test_load_from_binary_file_shows_preview(tmp_path: Path) -> None:
+    path = tmp_path / "tasks.bin"
+    tasks = [Task(str(i), id=i + 1) for i in range(1000)]
+    BinarySerializer(path).save(tasks)
+    view = MockView()
+    presenter = MainPresenter(view, BinarySerializer)
+    presenter.load_from_file(path)
+    assert len(view.update_tasks_calls) == 2
+    assert view.update_tasks_calls[-1] == tasks
+
+
+def test_edits_are_saved_and_shown_as_changes() -> None:
+    saved_changes: list[ChangeSet] = []
+
+    class ChangeSerializer:
+        def __init__(self, _: Path) -> None:
+            pass
+
+        def load(self) -> list[Task]:
+            return [Task("wren", id=1)]
+
+        def save(self, _: Sequence[Task]) -> None:
+            raise AssertionError("Full save")
+
+        def save_changes(self, changes: ChangeSet) -> None:
+            saved_changes.append(changes)
+
+    view = ChangeView()
+    presenter = MainPresenter(view, ChangeSerializer)
+    presenter.load_from_file(Path())
+    presenter.rename_task(Task("wren"), "robin")
+    expected = ChangeSet([], [], [(Task("wren"), Task("robin"))])
+    assert saved_changes == [expected]
+    assert view.applied_changes == [expected]
+    assert len(view.update_tasks_calls) == 1
+
+
+def test_read_file_leaves_view_to_show_file() -> None:
+    view = MockView()
+    serializer_wrapper = MockSerializerWrapper([Task("plover")])
+    presenter = MainPresenter(view, serializer_wrapper.serializer)
+    loaded_file = presenter.read_file(Path("read_path"))
+    assert loaded_file.tasks == [Task("plover")]
+    assert view.update_tasks_calls == []
+    assert presenter.tasks() == []
+    presenter.show_file(loaded_file)
+    assert view.update_tasks_calls == [[Task("plover")]]
+    assert view.window_title == "read_path"
+
+
+def test_search_follows_edits_and_undo() -> None:
+    view = MockView()
+    task = Task("Water plants", id=1)
+    serializer_wrapper = MockSerializerWrapper([task, Task("Pay rent", id=2)])
+    presenter = MainPresenter(view, serializer_wrapper.serializer)
+    presenter.load_from_file(Path("search_path"))
+    assert presenter.search("plant") == {1}
+    presenter.rename_task(task, "Water flowers")
+    assert presenter.search("plant") == set()
+    presenter.undo()
+    assert presenter.search("PLANT") == {1}
+
+
+def test_batch_is_saved_and_shown_once() -> None:
+    view = ChangeView()
+    tasks = [Task("kite", id=1), Task("lark", id=2), Task("swan", id=3)]
+    serializer_wrapper = MockSerializerWrapper(tasks)
+    presenter = MainPresenter(view, serializer_wrapper.serializer)
+    presenter.load_from_file(Path("batch_path"))
+    with presenter.batch():
+        for task in tasks[:2]:
+            presenter.set_importance(task, Importance.Important)
+        presenter.delete_task(tasks[2])
+        assert view.applied_changes == []
+    assert len(view.applied_changes) == 1
+    assert len(view.applied_changes[0].replaced) == 2
+    assert view.applied_changes[0].removed == [Task("swan")]
+    assert [task.importance for task in serializer_wrapper.tasks] \
+        == [Importance.Important] * 2
+    assert view.undoable
+    presenter.undo()
+    assert len(serializer_wrapper.tasks) == 3
+    assert not view.undoable
+
+
+def test_read_workspace_merges_files(tmp_path: Path) -> None:
+    JsonSerializer(tmp_path / "home.json").save([Task("mop", id=1)])
+    JsonSerializer(tmp_path / "work.json").save([Task("memo", id=1)])
+    view = MockView()
+    presenter = MainPresenter(view)
+    presenter.show_file(presenter.read_workspace([tmp_path]))
+    assert view.update_tasks_calls == [[Task("mop"), Task("memo")]]
+    assert view.window_title == tmp_path.name
+    presenter.rename_task(presenter.tasks()[1], "report")
+    presenter.close()
+    assert JsonSerializer(tmp_path / "work.json").load() \
+        == [Task("report", id=1)]
+    assert JsonSerializer(tmp_path / "home.json").load() == [Task("mop")]
+
+
+def test_reload_file_applies_changes_of_other_programs(
+        tmp_path: Path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save(
+        [Task("heron", id=1), Task("egret", id=2), Task("stork", id=3)])
+
+    view = ChangeView()
+    presenter = MainPresenter(view, save_in_background=True)
+    presenter.load_from_file(path)
+    assert presenter.watched_path() == path
+    presenter.rename_task(presenter.tasks()[0], "crane")
+    presenter.reload_file()
+    assert len(view.applied_changes) == 1
+    # Written by another program
+    JsonSerializer(path).save(
+        [Task("crane", id=1), Task("ibis", id=2), Task("avocets", id=4)])
+    presenter.reload_file()
+    changes = view.applied_changes[-1]
+    assert changes.removed == [Task("stork")]
+    assert changes.added == [Task("avocets")]
+    assert changes.replaced == [(Task("egret"), Task("ibis"))]
+    assert sorted(task.name for task in presenter.tasks()) \
+        == ["avocets", "crane", "ibis"]
+    presenter.reload_file()
+    assert len(view.applied_changes) == 2
+    presenter.undo()
+    presenter.close()
+    assert sorted(task.name for task in JsonSerializer(path).load()) \
+        == ["crane", "egret", "stork"]
+
+
+class ClosedSerializer(JsonSerializer):
+    """Counts the instances that were not closed"""
+    open_count = 0
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        ClosedSerializer.open_count += 1
+
+    def close(self) -> None:
+        ClosedSerializer.open_count -= 1
+
+
+def test_reload_file_closes_serializer(tmp_path: Path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save([Task("avocet", id=1)])
+    presenter = MainPresenter(MockView(), serializer_type=ClosedSerializer)
+    presenter.load_from_file(path)
+    JsonSerializer(path).save([Task("avocet", id=1), Task("snipe", id=2)])
+    presenter.reload_file()
+    assert len(presenter.tasks()) == 2
+    presenter.close()
+    assert ClosedSerializer.open_count == 0
+
+
+def test_reload_file_does_not_migrate_legacy_file(tmp_path: Path) -> None:
+    path = tmp_path / "tasks.pickle"
+    PickleSerializer(path).save([Task("teal", id=1)])
+    presenter = MainPresenter(MockView(), serializer_type=PickleSerializer)
+    presenter.load_from_file(path)
+    # Written by an old version of another program, with the same tasks
+    with open(path, "wb") as file:
+        pickle.dump([Task("teal", id=1)], file)
+    legacy_file = path.read_bytes()
+    presenter.reload_file()
+    assert path.read_bytes() == legacy_file
+    assert presenter.tasks() == [Task("teal", id=1)]
+    presenter.close()
+
+
+def test_history_is_kept_across_restarts(tmp_path: Path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save([Task("grebe", id=1)])
+    view = MockView()
+    presenter = MainPresenter(view, history_steps=10)
+    presenter.load_from_file(path)
+    assert not view.undoable
+    presenter.rename_task(presenter.tasks()[0], "loon")
+    presenter.close()
+    restarted_view = MockView()
+    restarted = MainPresenter(restarted_view, history_steps=10)
+    restarted.load_from_file(path)
+    assert restarted_view.undoable
+    restarted.undo()
+    assert not restarted_view.undoable
+    assert restarted_view.redoable
+    restarted.close()
+    assert JsonSerializer(path).load() == [Task("grebe", id=1)]
+
+
+def test_reload_file_without_ids_keeps_external_changes(
+        tmp_path: Path) -> None:
+    path = tmp_path / "tasks.json"
+    JsonSerializer(path).save([Task("plover"), Task("curlew")])
+    view = MockView()
+    presenter = MainPresenter(view)
+    presenter.load_from_file(path)
+    # Written by another program, without ids
+    JsonSerializer(path).save(
+        [Task("plover"), Task("curlew"), Task("dunlin")])
+    presenter.reload_file()
+    assert sorted(task.name for task in presenter.tasks()) \
+        == ["curlew", "dunlin", "plover"]
+    presenter.rename_task(presenter.tasks()[0], "knot")
+    presenter.close()
+    assert sorted(task.name for task in JsonSerializer(path).load()) \
+        == ["curlew", "dunlin", "knot"]
+
+
+def test_batch_adding_and_deleting_task_changes_nothing(
+        tmp_path: Path) -> None:
+    path = tmp_path / "tasks.sqlite"
+    SqliteSerializer(path).save([Task("gull", id=1)])
+    view = ChangeView()
+    presenter = MainPresenter(view, SqliteSerializer)
+    presenter.load_from_file(path)
+    with presenter.batch():
+        presenter.add_task(Task("tern"))
+        presenter.rename_task(presenter.tasks()[1], "skua")
+        presenter.delete_task(presenter.tasks()[1])
+    assert view.applied_changes == [ChangeSet([], [], [])]
+    assert presenter.tasks() == [Task("gull")]
+    presenter.close()
+    assert SqliteSerializer(path).load() == [Task("gull", id=1)]
@@ -1,13 +1,83 @@
+import pickle
+import subprocess
+import sys
+from pathlib import Path
+from dataclasses import dataclass
 from datetime import date
 
+import pytest
 from PySide6 import QtCore
 
-from pickleserializer import sanitize_sub_task
+from pickleserializer import sanitize_sub_task, PickleSerializer
 from task import SubTask, Importance, Task
 
 
+@dataclass
+class LegacyTask:
+    name: str
+    importance: Importance
+    completed: date
+    sub_tasks: list[SubTask]
+
+
 def test_sanitize_sub_task() -> None:
     # noinspection PyTypeChecker
     sub_task = SubTask("Name", QtCore.QDate(2001, 12, 24))
     assert sanitize_sub_task(sub_task, Importance.Important, None) \
         == Task("Name", importance=Importance.Important, due=date(2001, 12, 24))
+
+
+def test_save_and_load_keep_ids(tmp_path) -> None:
+    serializer = PickleSerializer(tmp_path / "tasks.pickle")
+    serializer.save([Task("Name", id=5)])
+    assert serializer.load()[0].id == 5
+
+
+def test_load_migrates_legacy_file(tmp_path) -> None:
+    path = tmp_path / "tasks.pickle"
+    legacy_tasks = [
+        Task("Plain"),
+        LegacyTask(
+            "Parent",
+            Importance.Important,
+            date(3, 4, 5),
+            [SubTask("Sub", due=date(6, 7, 8))])]
+    with open(path, "wb") as file:
+        pickle.dump(legacy_tasks, file)
+    tasks = [
+        Task("Plain"),
+        Task("Sub", Importance.Important, date(3, 4, 5), date(6, 7, 8))]
+    assert PickleSerializer(path).load() == tasks
+    assert path.read_bytes().startswith(b"EISP")
+    assert PickleSerializer(path).load() == tasks
+
+
+def test_load_without_migrating_keeps_legacy_file(tmp_path) -> None:
+    path = tmp_path / "tasks.pickle"
+    with open(path, "wb") as file:
+        pickle.dump([Task("Plain")], file)
+    legacy_file = path.read_bytes()
+    assert PickleSerializer(path).load(migrate=False) == [Task("Plain")]
+    assert path.read_bytes() == legacy_file
+
+
+def test_load_does_not_import_qt(tmp_path) -> None:
+    path = tmp_path / "tasks.pickle"
+    PickleSerializer(path).save([Task("Name", due=date(2, 3, 4))])
+    code = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from pickleserializer import PickleSerializer\n"
+        f"assert PickleSerializer(Path({str(path)!r})).load()\n"
+        "assert 'PySide6' not in sys.modules\n")
+    subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        cwd=Path(__file__).parent)
+
+
+def test_load_rejects_newer_version(tmp_path) -> None:
+    path = tmp_path / "tasks.pickle"
+    path.write_bytes(b"EISP\xff\xff")
+    with pytest.raises(ValueError):
+        PickleSerializer(path).load()
@@ -0,0 +1,38 @@
+from task import Task
+from taskdiff import ChangeSet
+from searchindex import SearchIndex
+
+
+def test_search_finds_substrings_ignoring_case() -> None:
+    index = SearchIndex([
+        Task("Call Mom", id=1),
+        Task("recall meeting", id=2),
+        Task("Buy milk", id=3),
+        Task("no id")])
+    assert len(index) == 3
+    assert index.search("CALL") == {1, 2}
+    assert index.search("call m") == {1, 2}
+    assert index.search("all mo") == {1}
+    assert index.search("mi") == {3}
+    assert index.search("") == {1, 2, 3}
+    assert index.search("xyz") == set()
+
+
+def test_search_checks_order_of_trigrams() -> None:
+    index = SearchIndex([Task("abcd bcde", id=1)])
+    assert index.search("bcde") == {1}
+    assert index.search("abcde") == set()
+
+
+def test_apply_indexes_changes() -> None:
+    renamed = Task("write report", id=1)
+    removed = Task("write letter", id=2)
+    index = SearchIndex([renamed, removed])
+    index.apply(ChangeSet(
+        [Task("write tests", id=3)],
+        [removed],
+        [(renamed, Task("read report", id=1))]))
+    assert index.search("write") == {3}
+    assert index.search("report") == {1}
+    assert index.search("letter") == set()
+    assert len(index) == 2
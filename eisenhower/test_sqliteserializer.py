@@ -0,0 +1,84 @@
+import sqlite3
+from datetime import date
+
+from sqliteserializer import SqliteSerializer
+from task import Task, Importance
+from taskdiff import ChangeSet
+
+
+def test_load_new_database(tmp_path) -> None:
+    serializer = SqliteSerializer(tmp_path / "tasks.db")
+    assert serializer.load() == []
+    serializer.close()
+
+
+def test_save_and_load(tmp_path) -> None:
+    tasks = [
+        Task("qwe", Importance.Important, date(1, 2, 3), id=3),
+        Task("rtz", due=date(2001, 2, 3), snooze=date(2002, 3, 4), id=5)]
+    serializer = SqliteSerializer(tmp_path / "tasks.db")
+    serializer.load()
+    serializer.save(tasks)
+    serializer.close()
+    loaded = SqliteSerializer(tmp_path / "tasks.db").load()
+    assert loaded == tasks
+    assert [task.id for task in loaded] == [3, 5]
+
+
+def test_save_writes_changed_rows_only(tmp_path) -> None:
+    path = tmp_path / "tasks.db"
+    serializer = SqliteSerializer(path)
+    kept = Task("uio", id=1)
+    serializer.save([kept, Task("pas", id=2), Task("dfg", id=3)])
+    statements = []
+    serializer._connect().set_trace_callback(statements.append)
+    serializer.save([kept, Task("hjk", id=3)])
+    serializer.close()
+    changes = [statement for statement in statements
+               if statement.startswith(("INSERT", "DELETE", "UPDATE"))]
+    assert len(changes) == 2
+    assert SqliteSerializer(path).load() == [kept, Task("hjk")]
+
+
+def test_save_tasks_without_ids(tmp_path) -> None:
+    serializer = SqliteSerializer(tmp_path / "tasks.db")
+    serializer.save([Task("lkj"), Task("lkj"), Task("mnb", id=1)])
+    tasks = serializer.load()
+    assert sorted(task.name for task in tasks) == ["lkj", "lkj", "mnb"]
+    assert len({task.id for task in tasks}) == 3
+
+
+def test_archived_tasks(tmp_path) -> None:
+    serializer = SqliteSerializer(tmp_path / "tasks.db")
+    serializer.save([
+        Task("a", completed=date(2001, 1, 1), id=1),
+        Task("b", id=2),
+        Task("c", completed=date(2003, 1, 1), id=3),
+        Task("d", completed=date(2002, 1, 1), id=4)])
+    assert serializer.archived_tasks() == [
+        Task("c", completed=date(2003, 1, 1)),
+        Task("d", completed=date(2002, 1, 1)),
+        Task("a", completed=date(2001, 1, 1))]
+    assert serializer.archived_tasks(1, 1) \
+        == [Task("d", completed=date(2002, 1, 1))]
+
+
+def test_database_uses_wal_mode(tmp_path) -> None:
+    serializer = SqliteSerializer(tmp_path / "tasks.db")
+    serializer.load()
+    connection = sqlite3.connect(tmp_path / "tasks.db")
+    assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    connection.close()
+    serializer.close()
+
+
+def test_save_changes(tmp_path) -> None:
+    path = tmp_path / "tasks.db"
+    serializer = SqliteSerializer(path)
+    first = Task("tfc", id=1)
+    second = Task("rdx", id=2)
+    serializer.save([first, second])
+    serializer.save_changes(
+        ChangeSet([Task("esz", id=3)], [second], [(first, Task("wax", id=1))]))
+    serializer.close()
+    assert SqliteSerializer(path).load() == [Task("wax"), Task("esz")]
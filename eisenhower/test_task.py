@@ -1,3 +1,5 @@
+import pickle
+from dataclasses import replace
 from datetime import date, timedelta
 
 from task import (
@@ -7,7 +9,8 @@ from task import (
     is_completed,
     is_important,
     Importance,
-    to_primitive_dicts, tasks_from_primitive_dicts, sort_tasks_by_relevance)
+    to_primitive_dicts, tasks_from_primitive_dicts, sort_tasks_by_relevance,
+    classify_tasks, QuadrantTasks, next_transition, TaskInterner)
 
 
 def test_snooze_empty_task() -> None:
@@ -133,3 +136,81 @@ def test_sort_tasks_by_relevance() -> None:
         [Task("snoozed", snooze=date(9999, 9, 9))],
         [Task("completed", completed=date(1, 1, 1))])
     assert sorted_tasks == expected
+
+
+def test_id_is_not_part_of_value() -> None:
+    assert Task("zgb", id=1) == Task("zgb", id=2)
+    assert hash(Task("zgb", id=1)) == hash(Task("zgb"))
+
+
+def test_id_survives_primitive_dicts() -> None:
+    tasks = tasks_from_primitive_dicts(to_primitive_dicts([Task("mju", id=7)]))
+    assert tasks[0].id == 7
+
+
+def test_is_urgent_with_given_today() -> None:
+    task = Task(due=date(2000, 1, 14))
+    assert is_urgent(task, date(2000, 1, 1))
+    assert not is_urgent(task, date(1999, 12, 31))
+
+
+def test_has_snoozed_date_with_given_today() -> None:
+    task = Task(snooze=date(2000, 1, 2))
+    assert has_snoozed_date(task, date(2000, 1, 1))
+    assert not has_snoozed_date(task, date(2000, 1, 2))
+
+
+def test_classify_tasks() -> None:
+    today = date(2000, 1, 1)
+    tasks = [
+        Task("do", Importance.Important, due=date(2000, 1, 5)),
+        Task("do snoozed", Importance.Important, due=date(2000, 1, 5),
+             snooze=date(2000, 1, 2)),
+        Task("decide", Importance.Important),
+        Task("decide due", Importance.Important, due=date(2000, 1, 15)),
+        Task("delegate", due=date(1999, 1, 1)),
+        Task("drop", snooze=date(2000, 1, 1)),
+        Task("drop snoozed", snooze=date(2000, 2, 1)),
+        Task("archived", Importance.Important, date(1999, 1, 1))]
+    classified = classify_tasks(tasks, today)
+    assert classified.do == QuadrantTasks([tasks[0]], [], [tasks[1]])
+    assert classified.decide == QuadrantTasks([], tasks[2:4], [])
+    assert classified.delegate == QuadrantTasks([tasks[4]], [], [])
+    assert classified.drop == QuadrantTasks([], [tasks[5]], [tasks[6]])
+    assert classified.archived == [tasks[7]]
+
+
+def test_next_transition() -> None:
+    today = date(2021, 6, 1)
+    due = date(2021, 6, 20)
+    assert next_transition(Task(due=due), today) == date(2021, 6, 7)
+    assert not is_urgent(Task(due=due), date(2021, 6, 6))
+    assert is_urgent(Task(due=due), date(2021, 6, 7))
+    assert next_transition(Task(due=due), date(2021, 6, 7)) == due
+    assert next_transition(Task(due=due), due) is None
+    assert next_transition(
+        Task(due=due, snooze=date(2021, 6, 3)), today) == date(2021, 6, 3)
+    assert next_transition(
+        Task(due=due, completed=date(2021, 5, 1)), today) is None
+
+
+def test_hash_is_cached_but_not_pickled() -> None:
+    task = Task("fern", due=date(2021, 2, 3), id=1)
+    assert hash(task) == hash(replace(task, id=2)) == hash(task)
+    assert task == replace(task, id=2)
+    assert task != replace(task, due=None)
+    unpickled = pickle.loads(pickle.dumps(task))
+    assert "_hash" not in unpickled.__dict__
+    assert unpickled == task and unpickled.id == 1
+
+
+def test_interner_shares_tasks_of_same_value_and_id() -> None:
+    interner = TaskInterner()
+    task = interner.intern(Task("moss", id=1))
+    assert interner.intern(Task("moss", id=1)) is task
+    other_tasks = [interner.intern(Task("moss", id=2)),
+                   interner.intern(Task("moss"))]
+    assert all(other_task is not task for other_task in other_tasks)
+    assert len(interner) == 3
+    del task
+    assert len(interner) == 2
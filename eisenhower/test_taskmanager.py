@@ -1,6 +1,10 @@
 from datetime import date
 
+import pytest
+
+from historyfile import HistoryFile
 from task import Task, Importance
+from taskdiff import ChangeSet, TaskDiff
 from taskmanager import TaskManager
 
 
@@ -104,3 +108,198 @@ def test_redo() -> None:
     assert not manager.tasks()
     manager.redo()
     assert manager.tasks() == [Task("sop")]
+
+
+def test_max_history_steps() -> None:
+    manager = TaskManager([], max_history_steps=1)
+    manager.add(Task("wsx"))
+    manager.add(Task("edc"))
+    assert manager.history_depth() == 1
+    manager.undo()
+    assert not manager.is_undoable()
+    assert manager.tasks() == [Task("wsx")]
+    assert manager.history_footprint() > 0
+
+
+def test_tasks_get_unique_ids() -> None:
+    manager = TaskManager([Task("ikm"), Task("ikm", id=3), Task("ujm", id=3)])
+    manager.add(Task("tgb"))
+    ids = [task.id for task in manager.tasks()]
+    assert None not in ids
+    assert len(set(ids)) == 4
+
+
+def test_delete_identical_task_by_id() -> None:
+    manager = TaskManager([Task("rfv", id=1), Task("rfv", id=2)])
+    manager.set_importance(Task("rfv", id=2), Importance.Important)
+    manager.delete(Task("rfv", id=1))
+    assert manager.tasks() == [Task("rfv", importance=Importance.Important)]
+    assert manager.tasks()[0].id == 2
+
+
+def test_edits_by_id_after_undo_and_redo() -> None:
+    manager = TaskManager([Task("a", id=1), Task("b", id=2), Task("c", id=3)])
+    manager.delete(Task("a", id=1))
+    manager.undo()
+    manager.rename(Task("a", id=1), "d")
+    manager.undo()
+    manager.redo()
+    manager.delete(Task("c", id=3))
+    manager.rename(Task("b", id=2), "e")
+    assert sorted(task.name for task in manager.tasks()) == ["d", "e"]
+
+
+def test_edits_return_changes() -> None:
+    manager = TaskManager([Task("qaz", id=1), Task("wsx", id=2)])
+    added = manager.add(Task("edc"))
+    assert added.added == [Task("edc")] and added.added[0].id == 3
+    renamed = manager.rename(Task("qaz", id=1), "rfv")
+    assert renamed.replaced == [(Task("qaz"), Task("rfv"))]
+    assert manager.delete(Task("qaz")).is_empty()
+    deleted = manager.delete(Task("rfv"))
+    assert deleted.removed == [Task("rfv")]
+    assert deleted.added == [] and deleted.replaced == []
+
+
+def test_undo_and_redo_return_changes() -> None:
+    manager = TaskManager([Task("tgb", id=1), Task("yhn", id=2)])
+    manager.delete(Task("tgb", id=1))
+    undone = manager.undo()
+    assert undone.added == [Task("tgb")]
+    assert undone.removed == [] and undone.replaced == []
+    redone = manager.redo()
+    assert redone.removed == [Task("tgb")]
+    assert redone.added == [] and redone.replaced == []
+
+
+def test_batch_is_undone_as_one_step() -> None:
+    manager = TaskManager(
+        [Task("ujm", id=1), Task("ik", id=2), Task("ol", id=3)])
+    with manager.batch() as batch:
+        assert manager.set_complete(Task("ujm", id=1)).is_empty()
+        manager.snooze(Task("ik", id=2), date(2021, 3, 4))
+        manager.delete(Task("ol", id=3))
+        assert batch.changes.is_empty()
+    assert len(batch.changes.replaced) == 2
+    assert batch.changes.removed == [Task("ol")]
+    assert manager.history_depth() == 1
+    undone = manager.undo()
+    assert sorted(task.name for task in manager.tasks()) == ["ik", "ol", "ujm"]
+    assert all(task.completed is None and task.snooze is None
+               for task in manager.tasks())
+    assert undone.added == [Task("ol")]
+    manager.redo()
+    assert [task.name for task in manager.tasks()] == ["ujm", "ik"]
+
+
+def test_merge_puts_and_deletes_by_id() -> None:
+    manager = TaskManager([Task("wer", id=1), Task("sdf", id=2)])
+    changes = manager.merge(TaskDiff(
+        [Task("xcv", id=2), Task("rty", id=7)], [1]))
+    assert changes.removed == [Task("wer")]
+    assert changes.added == [Task("rty")]
+    assert changes.replaced == [(Task("sdf"), Task("xcv"))]
+    assert manager.add(Task("fgh")).added[0].id == 8
+    manager.undo()
+    manager.undo()
+    assert [task.name for task in manager.tasks()] == ["wer", "sdf"]
+
+
+def test_edit_restoring_a_task_shares_its_instance() -> None:
+    manager = TaskManager([Task("yui", id=1)])
+    original = manager.tasks()[0]
+    manager.rename(original, "hjk")
+    manager.rename(Task("hjk", id=1), "yui")
+    assert manager.tasks()[0] is original
+    assert manager.rename(original, "yui").is_empty()
+
+
+def test_history_file_keeps_steps_across_restarts(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    manager = TaskManager(
+        [Task("bnm", id=1), Task("ghj", id=2)],
+        history_file=HistoryFile(path))
+    manager.rename(Task("bnm", id=1), "vbn")
+    manager.delete(Task("ghj", id=2))
+    manager.add(Task("tyu"))
+    manager.undo()
+    tasks = list(manager.tasks())
+    restarted = TaskManager(tasks, history_file=HistoryFile(path))
+    assert restarted.is_undoable()
+    assert not restarted.is_redoable()
+    assert restarted.undo().added == [Task("ghj")]
+    assert restarted.is_redoable()
+    restarted.undo()
+    assert sorted(task.name for task in restarted.tasks()) == ["bnm", "ghj"]
+    assert not restarted.is_undoable()
+    assert restarted.redo().replaced == [(Task("bnm"), Task("vbn"))]
+    restarted.redo()
+    assert restarted.redo().added == [Task("tyu", id=3)]
+    assert not restarted.is_redoable()
+    restarted.undo()
+    assert restarted.tasks() == tasks
+
+
+def test_history_file_steps_are_undone_after_steps_in_memory(
+        tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    manager = TaskManager([Task("iop", id=1)], history_file=HistoryFile(path))
+    manager.rename(Task("iop", id=1), "jkl")
+    restarted = TaskManager(manager.tasks(), history_file=HistoryFile(path))
+    restarted.add(Task("uio"))
+    restarted.undo()
+    restarted.undo()
+    assert restarted.tasks() == [Task("iop")]
+    restarted.redo()
+    restarted.redo()
+    assert restarted.tasks() == [Task("jkl"), Task("uio")]
+
+
+def test_invalid_history_file_steps_are_dropped(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    manager = TaskManager([Task("qaz", id=1)], history_file=HistoryFile(path))
+    manager.rename(Task("qaz", id=1), "wsx")
+    # Changed while the application was closed
+    restarted = TaskManager(
+        [Task("edc", id=1)], history_file=HistoryFile(path))
+    assert restarted.is_undoable()
+    assert restarted.undo().is_empty()
+    assert restarted.tasks() == [Task("edc")]
+    assert not restarted.is_undoable()
+    assert HistoryFile(path).load() == ([], [])
+
+
+def test_edit_of_missing_task_records_no_step(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    manager = TaskManager([], history_file=HistoryFile(path))
+    manager.add(Task("wsx"))
+    with pytest.raises(ValueError):
+        manager.rename(Task("rfv", id=7), "tgb")
+    assert manager.history_depth() == 1
+    manager.undo()
+    assert manager.tasks() == []
+    assert HistoryFile(path).load() == ([], [ChangeSet([Task("wsx")], [], [])])
+
+
+def test_history_file_of_undone_steps_is_not_undoable(tmp_path) -> None:
+    path = tmp_path / "tasks.json"
+    manager = TaskManager([Task("ujm", id=1)], history_file=HistoryFile(path))
+    manager.rename(Task("ujm", id=1), "ikl")
+    manager.undo()
+    restarted = TaskManager(manager.tasks(), history_file=HistoryFile(path))
+    assert not restarted.is_undoable()
+
+
+def test_batch_nets_tasks_added_and_deleted() -> None:
+    manager = TaskManager([Task("a", id=1), Task("b", id=2)])
+    with manager.batch() as batch:
+        manager.add(Task("c"))
+        # Moves c to the position of a
+        manager.delete(Task("a", id=1))
+        manager.add(Task("d"))
+        manager.rename(Task("d", id=4), "e")
+        manager.delete(Task("e", id=4))
+        # Moves b to the position of c
+        manager.delete(Task("c", id=3))
+    assert batch.changes == ChangeSet([], [Task("a")], [])
+    assert manager.tasks() == [Task("b")]
@@ -0,0 +1,192 @@
+import os
+from datetime import date
+from typing import Optional
+
+import pytest
+
+# Runs without a display, e.g. in CI
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+from task import Task  # noqa: E402
+from tasksview import Column, TaskModel, _row_ranges  # noqa: E402
+
+_TODAY = date(2021, 6, 1)
+_COLUMNS = [Column.Name, Column.Due]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def application() -> QtWidgets.QApplication:
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+class _Signals:
+    """Records rows inserted, removed and changed as (first, last) ranges"""
+
+    def __init__(self, model: TaskModel) -> None:
+        self.inserted: list[tuple[int, int]] = []
+        self.removed: list[tuple[int, int]] = []
+        self.changed: list[tuple[int, int]] = []
+        self.resets = 0
+        model.rowsInserted.connect(
+            lambda _, first, last: self.inserted.append((first, last)))
+        model.rowsRemoved.connect(
+            lambda _, first, last: self.removed.append((first, last)))
+        model.dataChanged.connect(
+            lambda top, bottom, *_: self.changed.append(
+                (top.row(), bottom.row())))
+        model.modelReset.connect(self._count_reset)
+
+    def _count_reset(self) -> None:
+        self.resets += 1
+
+
+def _names(model: TaskModel) -> list[str]:
+    return [model.index(row, 0).data() for row in range(model.rowCount())]
+
+
+def _tasks(*names: str) -> list[Task]:
+    return [Task(name, id=id_) for id_, name in enumerate(names, 1)]
+
+
+def _model(
+        tasks: list[Task],
+        page_size: Optional[int] = None) -> tuple[TaskModel, _Signals]:
+    model = TaskModel(_COLUMNS, page_size=page_size)
+    model.set_tasks(tasks, _TODAY)
+    return model, _Signals(model)
+
+
+def test_row_ranges() -> None:
+    assert list(_row_ranges([])) == []
+    assert list(_row_ranges([7, 6, 5, 3, 1, 0])) == [(5, 7), (3, 3), (0, 1)]
+
+
+def test_set_tasks_first_time_resets_model() -> None:
+    model = TaskModel(_COLUMNS)
+    signals = _Signals(model)
+    model.set_tasks(_tasks("a", "b"), _TODAY)
+    assert signals.resets == 1
+    assert _names(model) == ["a", "b"]
+    assert model.task_at(1) == Task("b")
+
+
+def test_set_tasks_inserts_new_tasks() -> None:
+    tasks = _tasks("a", "b")
+    model, signals = _model(tasks)
+    model.set_tasks(tasks + [Task("c", id=3)], _TODAY)
+    assert _names(model) == ["a", "b", "c"]
+    assert signals.inserted == [(2, 2)]
+    assert signals.removed == signals.changed == []
+    assert signals.resets == 0
+
+
+def test_set_tasks_removes_ranges_in_descending_order() -> None:
+    tasks = _tasks("a", "b", "c", "d", "e", "f")
+    model, signals = _model(tasks)
+    kept = [tasks[0], tasks[3], tasks[5]]
+    model.set_tasks(kept, _TODAY)
+    assert _names(model) == ["a", "d", "f"]
+    assert signals.removed == [(4, 4), (1, 2)]
+    # Rows after the removed ones are found at their new position
+    model.set_tasks([kept[0], kept[1], Task("g", id=6)], _TODAY)
+    assert _names(model) == ["a", "d", "g"]
+    assert signals.changed == [(2, 2)]
+
+
+def test_set_tasks_replaces_changed_tasks() -> None:
+    tasks = _tasks("a", "b", "c")
+    model, signals = _model(tasks)
+    model.set_tasks([tasks[0], Task("x", id=2), tasks[2]], _TODAY)
+    assert _names(model) == ["a", "x", "c"]
+    assert signals.changed == [(1, 1)]
+    assert signals.inserted == signals.removed == []
+
+
+def test_set_tasks_on_new_day_changes_all_rows() -> None:
+    tasks = _tasks("a", "b", "c")
+    model, signals = _model(tasks)
+    model.set_tasks(tasks, _TODAY)
+    assert signals.changed == []
+    model.set_tasks(tasks, date(2021, 6, 2))
+    assert signals.changed == [(0, 2)]
+
+
+def test_set_tasks_without_ids_resets_model() -> None:
+    model, signals = _model(_tasks("a", "b"))
+    model.set_tasks([Task("c"), Task("d")], _TODAY)
+    assert signals.resets == 1
+    assert _names(model) == ["c", "d"]
+
+
+def test_update_tasks_touches_only_changed_rows() -> None:
+    tasks = _tasks("a", "b", "c", "d")
+    model, signals = _model(tasks)
+    model.update_tasks(
+        [tasks[0], Task("x", id=3), tasks[3], Task("e", id=5)],
+        {2, 3, 5},
+        _TODAY)
+    assert _names(model) == ["a", "x", "d", "e"]
+    assert signals.removed == [(1, 1)]
+    assert signals.changed == [(1, 1)]
+    assert signals.inserted == [(3, 3)]
+
+
+def test_update_tasks_keeps_rows_of_unchanged_ids() -> None:
+    tasks = _tasks("a", "b")
+    model, signals = _model(tasks)
+    # Tasks of unchanged ids may be left out, e.g. when only changes are
+    # passed
+    model.update_tasks([Task("c", id=3)], {3}, _TODAY)
+    assert _names(model) == ["a", "b", "c"]
+    assert signals.removed == []
+
+
+def test_set_data_requests_edit() -> None:
+    tasks = _tasks("a")
+    model, _ = _model(tasks)
+    edits = []
+    model.task_edited.connect(
+        lambda task, column, value: edits.append((task, column, value)))
+    assert model.setData(model.index(0, 0), "b")
+    assert edits == [(tasks[0], Column.Name, "b")]
+    assert _names(model) == ["a"]
+
+
+def test_paged_model_fetches_pages() -> None:
+    tasks = _tasks(*"abcde")
+    model, signals = _model(tasks, page_size=2)
+    assert _names(model) == ["a", "b"]
+    parent = model.index(-1, -1)
+    assert model.canFetchMore(parent)
+    model.fetchMore(parent)
+    assert signals.inserted == [(2, 3)]
+    model.fetchMore(parent)
+    assert _names(model) == list("abcde")
+    assert not model.canFetchMore(parent)
+
+
+def test_paged_model_updates_unfetched_rows_silently() -> None:
+    tasks = _tasks(*"abcde")
+    model, signals = _model(tasks, page_size=2)
+    model.set_tasks(
+        [tasks[0], tasks[1], Task("x", id=3), tasks[4]], _TODAY)
+    assert signals.changed == signals.removed == []
+    model.fetchMore(model.index(-1, -1))
+    assert _names(model) == ["a", "b", "x", "e"]
+
+
+def test_paged_model_shows_new_tasks_on_top() -> None:
+    # Like the archive with many pages left when a task is completed
+    tasks = [Task(str(id_), id=id_) for id_ in range(1, 1001)]
+    model, signals = _model(tasks, page_size=200)
+    completed = Task("new", completed=_TODAY, id=1001)
+    model.update_tasks(tasks + [completed], {1001}, _TODAY)
+    assert signals.inserted == [(0, 0)]
+    assert model.rowCount() == 201
+    assert model.task_at(0) == completed
+    model.set_tasks(tasks + [completed], _TODAY)
+    assert signals.changed == []
+    model.set_tasks(tasks[1:] + [completed], _TODAY)
+    assert signals.removed == [(1, 1)]
+    assert _names(model)[:2] == ["new", "2"]
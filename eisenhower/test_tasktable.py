@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+import pytest
+
+from task import Task, Importance
+from tasktable import TaskTable, numpy
+
+_today = date(2021, 6, 15)
+
+backends = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(
+        numpy is None, reason="NumPy is not installed"))]
+
+
+@pytest.mark.parametrize("use_numpy", backends)
+def test_classify(use_numpy: bool) -> None:
+    tasks = [
+        Task("do", Importance.Important, due=_today),
+        Task("decide", Importance.Important),
+        Task("delegate", due=_today + timedelta(days=13)),
+        Task("drop", due=_today + timedelta(days=14)),
+        Task("snoozed", snooze=_today + timedelta(days=1)),
+        Task("snooze over", snooze=_today),
+        Task("completed", Importance.Important, date(1, 1, 1), _today)]
+    table = TaskTable(tasks, use_numpy)
+    classification = table.classify(_today)
+    assert list(classification.do) == [0]
+    assert list(classification.decide) == [1]
+    assert list(classification.delegate) == [2]
+    assert list(classification.drop) == [3, 4, 5]
+    assert list(classification.snoozed) == [4]
+    assert list(classification.completed) == [6]
+    assert table.tasks_at(classification.snoozed) == [tasks[4]]
+
+
+@pytest.mark.parametrize("use_numpy", backends)
+def test_classify_without_tasks(use_numpy: bool) -> None:
+    classification = TaskTable([], use_numpy).classify(_today)
+    assert all(len(positions) == 0 for positions in classification)
+
+
+@pytest.mark.parametrize("use_numpy", backends)
+def test_classify_snoozed_completed_task(use_numpy: bool) -> None:
+    tasks = [Task(completed=_today, snooze=_today + timedelta(days=3))]
+    classification = TaskTable(tasks, use_numpy).classify(_today)
+    assert list(classification.snoozed) == []
+    assert list(classification.completed) == [0]
@@ -0,0 +1,44 @@
+import json
+from threading import Thread
+
+from tracing import mark, span, start_tracing, stop_tracing, traced
+
+
+@traced
+def _traced_function(value: int) -> int:
+    with span("inner"):
+        return value + 1
+
+
+def test_disabled_tracing_writes_nothing(tmp_path) -> None:
+    with span("unused"):
+        assert _traced_function(1) == 2
+    stop_tracing()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spans_are_written_as_chrome_trace(tmp_path) -> None:
+    path = tmp_path / "trace.json"
+    start_tracing(path)
+    try:
+        assert _traced_function(2) == 3
+        thread = Thread(target=_traced_function, args=(3,), name="worker")
+        thread.start()
+        thread.join()
+        mark("done")
+    finally:
+        stop_tracing()
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [event["name"] for event in spans] \
+        == ["inner", "_traced_function"] * 2
+    inner, outer = spans[:2]
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert spans[0]["tid"] != spans[2]["tid"]
+    thread_names = {event["args"]["name"] for event in events
+                    if event["ph"] == "M"}
+    assert "worker" in thread_names
+    instants = [event for event in events if event["ph"] == "i"]
+    assert [event["name"] for event in instants] == ["done"]
+    assert instants[0]["ts"] >= spans[-1]["ts"] + spans[-1]["dur"]
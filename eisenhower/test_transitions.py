@@ -0,0 +1,32 @@
+from datetime import date
+
+from task import Task
+from taskdiff import ChangeSet
+from transitions import TransitionSchedule
+
+
+def test_pop_transitioned_returns_tasks_whose_day_came() -> None:
+    urgent_soon = Task("qwe", due=date(2021, 1, 20), id=1)
+    snoozed = Task("asd", snooze=date(2021, 1, 3), id=2)
+    unchanging = Task("zxc", id=3)
+    schedule = TransitionSchedule()
+    schedule.reset([urgent_soon, snoozed, unchanging], date(2021, 1, 1))
+    assert schedule.next_transition() == date(2021, 1, 3)
+    assert schedule.pop_transitioned(date(2021, 1, 2)) == []
+    assert schedule.pop_transitioned(date(2021, 1, 7)) \
+        == [snoozed, urgent_soon]
+    assert schedule.next_transition() == date(2021, 1, 20)
+    assert schedule.pop_transitioned(date(2021, 1, 20)) == [urgent_soon]
+    assert schedule.next_transition() is None
+
+
+def test_apply_replaces_scheduled_tasks() -> None:
+    snoozed = Task("rty", snooze=date(2021, 1, 3), id=1)
+    removed = Task("fgh", snooze=date(2021, 1, 2), id=2)
+    schedule = TransitionSchedule()
+    schedule.reset([snoozed, removed], date(2021, 1, 1))
+    later = Task("rty", snooze=date(2021, 1, 5), id=1)
+    schedule.apply(
+        ChangeSet([], [removed], [(snoozed, later)]), date(2021, 1, 1))
+    assert schedule.next_transition() == date(2021, 1, 5)
+    assert schedule.pop_transitioned(date(2021, 1, 5)) == [later]
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+
+from jsonserializer import JsonSerializer
+from journalserializer import JournalSerializer
+from task import Task
+from taskdiff import ChangeSet
+from workspaceserializer import WorkspaceSerializer, workspace_paths
+
+
+def test_workspace_paths_lists_task_files_of_directories(
+        tmp_path: Path) -> None:
+    (tmp_path / "b.json").write_text("[]")
+    (tmp_path / "a.json").write_text("[]")
+    (tmp_path / "notes.txt").write_text("")
+    other = tmp_path / "other.dat"
+    assert workspace_paths([tmp_path, other]) \
+        == [tmp_path / "a.json", tmp_path / "b.json", other]
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    with pytest.raises(FileNotFoundError):
+        workspace_paths([empty])
+
+
+def test_load_gives_ids_unique_across_files(tmp_path: Path) -> None:
+    first = tmp_path / "first.json"
+    second = tmp_path / "second.json"
+    JsonSerializer(first).save([Task("ant", id=1), Task("bee", id=2)])
+    JsonSerializer(second).save([Task("cat", id=1)])
+    workspace = WorkspaceSerializer([first, second], JsonSerializer)
+    tasks = workspace.load()
+    assert tasks == [Task("ant"), Task("bee"), Task("cat")]
+    assert len({task.id for task in tasks}) == 3
+    assert [workspace.source(task) for task in tasks] \
+        == [first, first, second]
+
+
+def test_edits_are_saved_to_their_source_file(tmp_path: Path) -> None:
+    first = tmp_path / "first.json"
+    second = tmp_path / "second.json"
+    JsonSerializer(first).save([Task("dog", id=1)])
+    JsonSerializer(second).save([Task("eel", id=1), Task("fox", id=2)])
+    workspace = WorkspaceSerializer([first, second], JsonSerializer)
+    dog, eel, fox = workspace.load()
+    first_modified = first.stat().st_mtime_ns
+    workspace.save_changes(ChangeSet(
+        [Task("gnu", id=10)], [fox], [(eel, Task("elk", id=eel.id))]))
+    assert JsonSerializer(second).load() == [Task("elk", id=1)]
+    assert JsonSerializer(first).load() == [Task("dog"), Task("gnu")]
+    assert first.stat().st_mtime_ns != first_modified
+    # Undoing the deletion restores the task to its file and id
+    workspace.save_changes(ChangeSet([fox], [Task("gnu", id=10)], []))
+    assert JsonSerializer(first).load() == [Task("dog", id=1)]
+    assert JsonSerializer(second).load() \
+        == [Task("elk", id=1), Task("fox", id=2)]
+    assert [task.id for task in JsonSerializer(second).load()] == [1, 2]
+
+
+def test_changes_are_passed_on_with_ids_of_the_file(tmp_path: Path) -> None:
+    first = tmp_path / "first.journal"
+    second = tmp_path / "second.journal"
+    JournalSerializer(first).save([Task("hen", id=3)])
+    JournalSerializer(second).save([Task("ibis", id=3)])
+    workspace = WorkspaceSerializer([first, second], JournalSerializer)
+    _, ibis = workspace.load()
+    workspace.save_changes(
+        ChangeSet([], [], [(ibis, Task("jay", id=ibis.id))]))
+    workspace.close()
+    assert JournalSerializer(second).load() == [Task("jay", id=3)]
+    assert [task.id for task in JournalSerializer(second).load()] == [3]
+    assert JournalSerializer(first).load() == [Task("hen", id=3)]
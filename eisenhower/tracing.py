@@ -0,0 +1,138 @@
+"""Opt-in timing of spans written as a Chrome trace
+
+Open the written file in chrome://tracing or https://ui.perfetto.dev. While
+tracing is off span() and functions decorated with traced() only cost a
+check of a global.
+"""
+import json
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar, cast
+
+ENVIRONMENT_VARIABLE = "EISENHOWER_TRACE"
+
+_Function = TypeVar("_Function", bound=Callable[..., Any])
+
+
+class _Trace:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.events: list[dict] = []
+        self.start = time.perf_counter_ns()
+        self.thread_names: dict[int, str] = {}
+
+    def timestamp(self) -> float:
+        """Microseconds since the start of the trace"""
+        return (time.perf_counter_ns() - self.start) / 1000
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self._add_event({"name": name, "ph": "X", "ts": start,
+                         "dur": end - start})
+
+    def add_instant(self, name: str) -> None:
+        self._add_event({"name": name, "ph": "i", "s": "p",
+                         "ts": self.timestamp()})
+
+    def _add_event(self, event: dict) -> None:
+        thread = threading.current_thread()
+        self.thread_names.setdefault(thread.ident or 0, thread.name)
+        event["pid"] = os.getpid()
+        event["tid"] = thread.ident or 0
+        # Appending to a list is atomic, spans may end on other threads
+        self.events.append(event)
+
+    def write(self) -> None:
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+             "args": {"name": name}}
+            for tid, name in self.thread_names.items()]
+        with open(self.path, "w") as file:
+            json.dump(
+                {"traceEvents": metadata + self.events,
+                 "displayTimeUnit": "ms"},
+                file)
+
+
+_trace: Optional[_Trace] = None
+
+
+class _Span:
+    __slots__ = ("_name", "_start")
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        if _trace is not None:
+            self._start = _trace.timestamp()
+
+    def __exit__(self, _, _2, _3) -> None:
+        if _trace is not None:
+            _trace.add(self._name, self._start, _trace.timestamp())
+
+
+class _NoSpan:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, _, _2, _3) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def start_tracing(path: Path) -> None:
+    """Records spans until stop_tracing() writes them to path"""
+    global _trace
+    _trace = _Trace(path)
+
+
+def start_tracing_from_environment() -> None:
+    """Starts tracing to the file named by EISENHOWER_TRACE if it is set"""
+    path = os.environ.get(ENVIRONMENT_VARIABLE)
+    if path:
+        start_tracing(Path(path))
+
+
+def stop_tracing() -> None:
+    global _trace
+    trace = _trace
+    _trace = None
+    if trace is not None:
+        trace.write()
+
+
+def is_tracing() -> bool:
+    return _trace is not None
+
+
+def mark(name: str) -> None:
+    """Records an instant event, such as the first paint of a window"""
+    if _trace is not None:
+        _trace.add_instant(name)
+
+
+def span(name: str) -> Any:
+    """Context manager timing its block as a span called name"""
+    if _trace is None:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def traced(function: _Function) -> _Function:
+    """Times calls as spans named after the qualified function name"""
+    name = function.__qualname__
+
+    @wraps(function)
+    def traced_function(*args, **kwargs):
+        if _trace is None:
+            return function(*args, **kwargs)
+        with _Span(name):
+            return function(*args, **kwargs)
+
+    return cast(_Function, traced_function)
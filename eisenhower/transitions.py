@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Iterable, Optional, Protocol
+
+from task import Task, next_transition
+from taskdiff import ChangeSet
+
+
+class Clock(Protocol):
+    def now(self) -> datetime: ...
+
+
+class SystemClock:
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class TransitionSchedule:
+    """Min-heap of the days on which tasks show differently
+
+    Only tasks with ids are scheduled. Entries of replaced or removed tasks
+    stay in the heap until they are popped and skipped.
+    """
+
+    def __init__(self) -> None:
+        # Entries are (day, sequence number, task), the sequence number
+        # keeps tasks from being compared
+        self._heap: list[tuple[date, int, Task]] = []
+        self._tasks: dict[int, Task] = {}
+        self._sequence = count()
+
+    def reset(self, tasks: Iterable[Task], today: date) -> None:
+        self._tasks = {
+            task.id: task for task in tasks if task.id is not None}
+        self._heap = [
+            (transition, next(self._sequence), task)
+            for task in self._tasks.values()
+            if (transition := next_transition(task, today)) is not None]
+        heapify(self._heap)
+
+    def apply(self, changes: ChangeSet, today: date) -> None:
+        for id_ in changes.removed_ids():
+            self._tasks.pop(id_, None)
+        for task in changes.put():
+            if task.id is not None:
+                self._tasks[task.id] = task
+                self._push(task, today)
+
+    def next_transition(self) -> Optional[date]:
+        heap = self._heap
+        while heap and not self._is_current(heap[0][2]):
+            heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_transitioned(self, today: date) -> list[Task]:
+        """Tasks that show differently since a day up to today"""
+        heap = self._heap
+        transitioned = {}
+        while heap and heap[0][0] <= today:
+            task = heappop(heap)[2]
+            if self._is_current(task):
+                transitioned[task.id] = task
+        for task in transitioned.values():
+            self._push(task, today)
+        return list(transitioned.values())
+
+    def _is_current(self, task: Task) -> bool:
+        return self._tasks.get(task.id) is task
+
+    def _push(self, task: Task, today: date) -> None:
+        transition = next_transition(task, today)
+        if transition is not None:
+            heappush(self._heap, (transition, next(self._sequence), task))
@@ -1,25 +1,73 @@
 import sys
-from argparse import ArgumentParser
+import time
+from argparse import ArgumentParser, Namespace
 from pathlib import Path
-from typing import Optional
-from PySide6 import QtWidgets
-from mainwindowqt import MainWindowQt
+from historyfile import DEFAULT_HISTORY_STEPS
+from tracing import start_tracing, start_tracing_from_environment, \
+    stop_tracing, span, ENVIRONMENT_VARIABLE
 
+# Qt and the windows are imported later to measure and trace their startup
+_START = time.perf_counter()
 
-def _parse_argv() -> Optional[Path]:
+
+def _parse_argv() -> Namespace:
     parser = ArgumentParser()
-    parser.add_argument("path", type=str, nargs="?")
-    args = parser.parse_args()
-    if args.path is None:
-        return None
-    return Path(args.path)
+    parser.add_argument(
+        "paths",
+        type=Path,
+        nargs="*",
+        help="task file, several files or directories open a workspace")
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        help="write timed spans as a Chrome trace to this file, "
+             f"alternatively set {ENVIRONMENT_VARIABLE}")
+    parser.add_argument(
+        "--history-steps",
+        type=int,
+        default=DEFAULT_HISTORY_STEPS,
+        help="undo steps kept next to the task file across restarts, "
+             "0 keeps none")
+    parser.add_argument(
+        "--compact-tasks",
+        action="store_true",
+        help="load tasks in a compact form taking less than half the "
+             "memory, for very large files")
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="print the time until the window is first painted")
+    return parser.parse_args()
+
+
+def _print_startup_time() -> None:
+    milliseconds = (time.perf_counter() - _START) * 1000
+    print(f"First paint after {milliseconds:.0f} ms", file=sys.stderr)
 
 
 if __name__ == "__main__":
+    args = _parse_argv()
+    if args.trace is not None:
+        start_tracing(args.trace)
+    else:
+        start_tracing_from_environment()
+    with span("import"):
+        from PySide6 import QtWidgets
+        from mainwindowqt import MainWindowQt
     app = QtWidgets.QApplication(sys.argv)
-    main_window = MainWindowQt()
-    path = _parse_argv()
-    if path is not None:
-        main_window.load_from_file(path)
+    with span("MainWindowQt.__init__"):
+        main_window = MainWindowQt(
+            history_steps=args.history_steps,
+            compact_tasks=args.compact_tasks)
+    if args.startup_time:
+        main_window.first_painted.connect(_print_startup_time)
+    # The window is shown while the file is still loading
     main_window.show()
-    app.exec()
+    if len(args.paths) == 1:
+        main_window.load_from_file(args.paths[0])
+    elif args.paths:
+        main_window.load_workspace(args.paths)
+    try:
+        app.exec()
+    finally:
+        stop_tracing()
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from task import Task, with_unique_ids
+from taskdiff import ChangeSet
+from tracing import traced
+
+# Files of a directory opened as workspace
+WORKSPACE_PATTERN = "*.json"
+
+
+def workspace_paths(
+        paths: Iterable[Path],
+        pattern: str = WORKSPACE_PATTERN) -> list[Path]:
+    """Task files of the given files and directories"""
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(
+                file for file in path.glob(pattern) if file.is_file()))
+        else:
+            files.append(path)
+    if not files:
+        raise FileNotFoundError("No task files in workspace")
+    return files
+
+
+class _SourceFile:
+    def __init__(self, path: Path, serializer: Any) -> None:
+        self.path = path
+        self.serializer = serializer
+        # Tasks by their id within the file
+        self.tasks: dict[int, Task] = {}
+        self.next_id = 1
+
+    def put(self, task: Task) -> int:
+        id_ = self.next_id if task.id is None else task.id
+        self.next_id = max(self.next_id, id_ + 1)
+        self.tasks[id_] = replace(task, id=id_)
+        return id_
+
+    def save(self, changes: ChangeSet) -> None:
+        save_changes = getattr(self.serializer, "save_changes", None)
+        if save_changes is None:
+            self.serializer.save(list(self.tasks.values()))
+        else:
+            save_changes(changes)
+
+
+class WorkspaceSerializer:
+    """Serializes tasks of several files as if they were a single one
+
+    Files are loaded in parallel. Tasks get ids unique across the workspace,
+    while each edit is saved only to the file its task came from, with the
+    id of the task within that file. New tasks are saved to the first file.
+    """
+
+    def __init__(
+            self,
+            paths: Sequence[Path],
+            serializer_type: Callable[[Path], Any]) -> None:
+        if not paths:
+            raise ValueError("Workspace needs at least one file")
+        self._files = [
+            _SourceFile(path, serializer_type(path)) for path in paths]
+        # Source file and id within it by workspace id, kept after deletion
+        # so that undoing it restores the task to its file
+        self._sources: dict[Optional[int], tuple[_SourceFile, int]] = {}
+
+    def paths(self) -> list[Path]:
+        return [file.path for file in self._files]
+
+    def source(self, task: Task) -> Optional[Path]:
+        """File a task was loaded from or is saved to"""
+        source = self._sources.get(task.id)
+        return None if source is None else source[0].path
+
+    @traced
+    def load(self) -> list[Task]:
+        with ThreadPoolExecutor() as executor:
+            loaded = list(executor.map(
+                lambda file: with_unique_ids(file.serializer.load()),
+                self._files))
+        tasks = []
+        for file, file_tasks in zip(self._files, loaded):
+            for task in file_tasks:
+                id_ = len(self._sources) + 1
+                self._sources[id_] = (file, file.put(task))
+                tasks.append(replace(task, id=id_))
+        return tasks
+
+    @traced
+    def save(self, tasks: Sequence[Task]) -> None:
+        for file in self._files:
+            file.tasks.clear()
+        for task in tasks:
+            self._put(task)
+        for file in self._files:
+            file.serializer.save(list(file.tasks.values()))
+
+    @traced
+    def save_changes(self, changes: ChangeSet) -> None:
+        file_changes: dict[_SourceFile, ChangeSet] = {}
+
+        def changes_of(file: _SourceFile) -> ChangeSet:
+            return file_changes.setdefault(file, ChangeSet([], [], []))
+
+        for task in changes.removed:
+            file, id_ = self._sources[task.id]
+            del file.tasks[id_]
+            changes_of(file).removed.append(replace(task, id=id_))
+        for task in changes.added:
+            file, id_ = self._put(task)
+            changes_of(file).added.append(file.tasks[id_])
+        for old, new in changes.replaced:
+            file, id_ = self._put(new)
+            changes_of(file).replaced.append(
+                (replace(old, id=id_), file.tasks[id_]))
+        for file, changes_of_file in file_changes.items():
+            file.save(changes_of_file)
+
+    def close(self) -> None:
+        for file in self._files:
+            close = getattr(file.serializer, "close", None)
+            if close is not None:
+                close()
+
+    def _put(self, task: Task) -> tuple[_SourceFile, int]:
+        source = self._sources.get(task.id)
+        if source is None:
+            file = self._files[0]
+            source = self._sources[task.id] = (
+                file, file.put(replace(task, id=None)))
+        else:
+            file, id_ = source
+            file.put(replace(task, id=id_))
+        return source